@@ -5,9 +5,13 @@ Created on Wed Aug  6 09:13:21 2025
 @author: KRHE
 """
 
+import numpy as np
+import shapely
 from shapely import wkt
 from datetime import datetime
 
+CHUNK_SIZE = 5000  # antall objekter per tekstbit ved strømming
+
 def extract_coords(geometry_str):
     try:
         point = wkt.loads(geometry_str)
@@ -19,6 +23,15 @@ def format_amrisk_coord(value):
     """Format coordinate with 8 decimals and 3-digit exponent."""
     return f"{value:.8E}".replace("E+0", "E+00").replace("E+1", "E+01").replace("E+2", "E+02")
 
+def format_amrisk_coords(values):
+    """Same format as format_amrisk_coord for a whole array at once. The numbers are joined
+    into one string so the exponent replacements run once instead of once per value."""
+    values = np.asarray(values, dtype=float).ravel()
+    if values.size == 0:
+        return []
+    text = "\n".join(map("{:.8E}".format, values.tolist()))
+    return text.replace("E+0", "E+00").replace("E+1", "E+01").replace("E+2", "E+02").split("\n")
+
 def calculate_charge_data(q_kg):
     """
     Given Q in kg, returns a formatted string of 3 values for 'Charge data in mag':
@@ -36,13 +49,84 @@ def calculate_charge_data(q_kg):
         format_amrisk_coord(P)
     ])
 
-def generate_amrisk_base_file(coord_x, coord_y, charge_kg, storage_name="Tanogs Export"):
-    mag_x = format_amrisk_coord(coord_x)
-    mag_y = format_amrisk_coord(coord_y)
-    charge_data_fmt = calculate_charge_data(charge_kg)
-    now = datetime.now()
+# Default magazine: one BNS 20 ft container. Any key can be overridden per magazine.
+BNS_20_FOT = {
+    "name": None,
+    "type": "FS",
+    "remarks": "BNS 20 fot",
+    "length": 6.058,
+    "width": 2.438,
+    "height": 2.591,
+    "cross_section": 6.316858,
+    "debris_mass": 4.8,
+    "volume": 38.2675258,
+    "cover_depth": 0.0,
+}
 
-    return f"""\
+def _magazine(nr, magazine):
+    """Fills in defaults for one magazine dict. When other dimensions than the default
+    container are given, cross section and volume are computed from them unless set."""
+    mag = {**BNS_20_FOT, **magazine}
+    if any(k in magazine for k in ("length", "width", "height")):
+        if "cross_section" not in magazine:
+            mag["cross_section"] = mag["width"] * mag["height"]
+        if "volume" not in magazine:
+            mag["volume"] = mag["length"] * mag["width"] * mag["height"]
+        if "remarks" not in magazine:
+            mag["remarks"] = ""
+    if mag["name"] is None:
+        mag["name"] = f"Magazine {nr}"
+    if "charges" not in mag:
+        mag["charges"] = [mag["charge_kg"]]
+    return mag
+
+def generate_magazine_block(nr, magazine):
+    """
+    Magazine block for magazine number nr. magazine is a dict with x, y and either
+    charge_kg or a list of charges in kg; the rest defaults to BNS_20_FOT.
+    """
+    mag = _magazine(nr, magazine)
+    lines = [
+        f"Magazin name        {nr:>3}           {mag['name']}",
+        f" Magazine type                  {mag['type']}",
+        " Ammunition type                   ",
+        f" Remarks on mag                 {mag['remarks']:<20}",
+        f" Length of mag        {format_amrisk_coord(mag['length'])}",
+        f" Width of mag         {format_amrisk_coord(mag['width'])}",
+        f" Height of mag        {format_amrisk_coord(mag['height'])}",
+        f" Cross section        {format_amrisk_coord(mag['cross_section'])}",
+        f" Magazine debris mas  {format_amrisk_coord(mag['debris_mass'])}",
+        f" Magazine volume      {format_amrisk_coord(mag['volume'])}",
+        f" Cover depth          {format_amrisk_coord(mag['cover_depth'])}",
+        " Front thickness      0.00000000E+00",
+        " Back  thickness      0.00000000E+00",
+        " Roof thickness       0.00000000E+00",
+        " Wall thickness       0.00000000E+00",
+        " Density              0.00000000E+00",
+        " Chamber lining                    ",
+        f"Coordinates x, y         {format_amrisk_coord(mag['x'])}     {format_amrisk_coord(mag['y'])}     0.00000000E+000",
+        "Altitude & velocity      0.00000000E+000     0.00000000E+000",
+        "Magazin direction        0.00000000E+000     0.00000000E+000",
+        "Crater coordinats       0.0000000000E+00    0.0000000000E+00    0.0000000000E+00",
+        "Crater 2nd point        0.0000000000E+00    0.0000000000E+00    0.0000000000E+00",
+        "Block volume, b-area    0.0000000000E+00    0.0000000000E+00",
+        "close dist,by-pass,t    0.0000000000E+00    0.0000000000E+00    0.0000000000E+00",
+        " Tunnel data          0",
+        f"Number of charges   {nr:>3}{len(mag['charges']):>3}",
+    ]
+    for charge_kg in mag["charges"]:
+        lines.extend([
+            f"Charge data in mag  {nr:>3}     {calculate_charge_data(charge_kg)}",
+            "Probability calcul              U 11",
+            "Remarks on charge   ",
+            " Charge = chg ind r ",
+        ])
+    return "\n".join(lines) + "\n"
+
+def generate_depot_base_file(magazines, storage_name="Tanogs Export"):
+    """Base file for a storage area with several magazines, see generate_magazine_block."""
+    now = datetime.now()
+    header = f"""\
  Flilename                      Exported from AMRISK 2.5
  Storage area name              {storage_name}
  Storage area number            
@@ -51,70 +135,92 @@ def generate_amrisk_base_file(coord_x, coord_y, charge_kg, storage_name="Tanogs
  User name                      
  User reference                 
  Global coordinates   0.00000000E+00 0.00000000E+00
- Number of magazines  1
-Magazin name          1           Magazine 1
- Magazine type                  FS
- Ammunition type                   
- Remarks on mag                 BNS 20 fot          
- Length of mag        6.05800000E+000
- Width of mag         2.43800000E+000
- Height of mag        2.59100000E+000
- Cross section        6.31685800E+000
- Magazine debris mas  4.80000000E+000
- Magazine volume      3.82675258E+001
- Cover depth          0.00000000E+000
- Front thickness      0.00000000E+00
- Back  thickness      0.00000000E+00
- Roof thickness       0.00000000E+00
- Wall thickness       0.00000000E+00
- Density              0.00000000E+00
- Chamber lining                    
-Coordinates x, y         {mag_x}     {mag_y}     0.00000000E+000
-Altitude & velocity      0.00000000E+000     0.00000000E+000
-Magazin direction        0.00000000E+000     0.00000000E+000
-Crater coordinats       0.0000000000E+00    0.0000000000E+00    0.0000000000E+00
-Crater 2nd point        0.0000000000E+00    0.0000000000E+00    0.0000000000E+00
-Block volume, b-area    0.0000000000E+00    0.0000000000E+00
-close dist,by-pass,t    0.0000000000E+00    0.0000000000E+00    0.0000000000E+00
- Tunnel data          0
-Number of charges     1  1
-Charge data in mag    1     {charge_data_fmt}
-Probability calcul              U 11
-Remarks on charge   
- Charge = chg ind r 
+ Number of magazines{len(magazines):>3}
+"""
+    situations = """\
  Defined situations   4
 Defined situations       3.75000000E-001 Night        N O
 Defined situations       2.97600000E-001 Day          D O
 Defined situations       1.48800000E-001 Evening      E O
 Defined situations       1.78600000E-001 Weekend      W O
 """
+    blocks = [generate_magazine_block(nr, mag) for nr, mag in enumerate(magazines, start=1)]
+    return header + "".join(blocks) + situations
 
-def generate_exposed_objects(df):
-    object_lines = []
-    object_lines.append(f" Exposed objects       {len(df)}")
-
-    for idx, row in df.iterrows():
-        x, y = extract_coords(row["geometry"])
-        x_fmt = format_amrisk_coord(x)
-        y_fmt = format_amrisk_coord(y)
-        base_name = str(row["Navn"]).replace(" ", "_")[:50]
-        object_name = f"{base_name}_{idx}"
-
-        object_lines.extend([
-            f"Object name            {idx+1}  {object_name} Exposed object ",
-            " Object ,person type            BNPF           NI                  ",
-            " Number of persons       0.00000000E+000",
-            " Max precence            0.00000000E+000",
-            " Width of area           0.00000000E+000",
-            " Length of train         0.00000000E+000",
-            " Number trains/week      0.00000000E+000",
-            " Velocity of object      0.00000000E+000",
-            " Remarks on object",
-            " Nr object points     1",
-            f"Object points       NDNF   {x_fmt}     {y_fmt}     0.00000000E+000",
-            " Average precense               N 0.00000000E+000",
-            " Average precense               D 0.00000000E+000",
-            " Average precense               E 0.00000000E+000",
-            " Average precense               W 0.00000000E+000",
+def generate_amrisk_base_file(coord_x, coord_y, charge_kg, storage_name="Tanogs Export"):
+    return generate_depot_base_file([{"x": coord_x, "y": coord_y, "charge_kg": charge_kg}], storage_name)
+
+_OBJECT_TEMPLATE = "\n" + "\n".join([
+    "Object name            %s  %s_%s Exposed object ",
+    " Object ,person type            BNPF           NI                  ",
+    " Number of persons       %s",
+    " Max precence            0.00000000E+000",
+    " Width of area           0.00000000E+000",
+    " Length of train         0.00000000E+000",
+    " Number trains/week      0.00000000E+000",
+    " Velocity of object      0.00000000E+000",
+    " Remarks on object",
+    " Nr object points     1",
+    "Object points       NDNF   %s     %s     0.00000000E+000",
+    " Average precense               N 0.00000000E+000",
+    " Average precense               D 0.00000000E+000",
+    " Average precense               E 0.00000000E+000",
+    " Average precense               W 0.00000000E+000",
+])
+
+def iter_exposed_objects(x, y, navn, index=None, chunk_size=CHUNK_SIZE, personer=None):
+    """
+    Yields the exposed objects block as text chunks of chunk_size objects each.
+    x, y and navn are arrays of equal length; index gives the object numbers
+    (defaults to 0..n-1, like a DataFrame with a RangeIndex). personer gives
+    the number of persons per object (defaults to 0).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    personer = np.zeros(len(x)) if personer is None else np.asarray(personer, dtype=float)
+    names = [str(n).replace(" ", "_")[:50] for n in navn]
+    index = list(range(len(x))) if index is None else list(index)
+
+    yield f" Exposed objects       {len(x)}"
+    for start in range(0, len(x), chunk_size):
+        stop = start + chunk_size
+        x_fmt = format_amrisk_coords(x[start:stop])
+        y_fmt = format_amrisk_coords(y[start:stop])
+        p_fmt = format_amrisk_coords(personer[start:stop])
+        yield "".join([
+            _OBJECT_TEMPLATE % (idx + 1, name, idx, pf, xf, yf)
+            for idx, name, pf, xf, yf in zip(index[start:stop], names[start:stop], p_fmt, x_fmt, y_fmt)
         ])
-    return "\n".join(object_lines)
\ No newline at end of file
+
+def write_exposed_objects(f, x, y, navn, index=None, chunk_size=CHUNK_SIZE, personer=None):
+    """Writes the exposed objects block to the text file-like object f."""
+    for chunk in iter_exposed_objects(x, y, navn, index, chunk_size, personer):
+        f.write(chunk)
+
+def iter_depot_file(magazines, x, y, navn, index=None, storage_name="Tanogs Export", personer=None):
+    """Yields a complete AMRISK 2.5 file for several magazines as text chunks. The exposed
+    objects are written once for the whole storage area."""
+    yield generate_depot_base_file(magazines, storage_name)
+    yield "\n"
+    yield from iter_exposed_objects(x, y, navn, index, personer=personer)
+
+def iter_amrisk_file(coord_x, coord_y, charge_kg, x, y, navn, index=None, storage_name="Tanogs Export", personer=None):
+    """Yields a complete AMRISK 2.5 file (base file and exposed objects) as text chunks."""
+    magazines = [{"x": coord_x, "y": coord_y, "charge_kg": charge_kg}]
+    yield from iter_depot_file(magazines, x, y, navn, index, storage_name, personer)
+
+def write_amrisk_file(f, *args, **kwargs):
+    """Writes a complete AMRISK 2.5 file to the text file-like object f, see iter_amrisk_file."""
+    for chunk in iter_amrisk_file(*args, **kwargs):
+        f.write(chunk)
+
+def exposed_object_columns(df):
+    """x, y, navn and index from a DataFrame with Navn and a geometry column that
+    holds either shapely points or WKT text."""
+    geometry = df["geometry"].to_numpy()
+    if len(geometry) and isinstance(geometry[0], str):
+        geometry = shapely.from_wkt(geometry)
+    return shapely.get_x(geometry), shapely.get_y(geometry), df["Navn"].to_numpy(), df.index.tolist()
+
+def generate_exposed_objects(df):
+    return "".join(iter_exposed_objects(*exposed_object_columns(df)))
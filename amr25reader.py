@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Leser AMRISK 2.5-filer (.amr25) til DataFrames: grunndata for lagerområdet, magasiner,
+ladninger, definerte situasjoner og eksponerte objekter med punkter. Filen leses linje
+for linje, så store filer lastes aldri inn i minnet i sin helhet.
+
+Hver linje har en ledetekst på LABEL_WIDTH tegn og verdien etter den, slik
+amr25filecreator skriver dem. Mange filer kan leses parallelt:
+
+    python amr25reader.py prosjekter/ --out tabeller --sites sites.csv
+
+--sites skriver magasinene med samlet NEI som inndata til batch.py.
+"""
+
+import os
+import glob
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+LABEL_WIDTH = 20  # ledeteksten står i de første 20 tegnene på hver linje
+OBJEKT_BESKRIVELSE = 'Exposed object'  # står etter navnet på linjen Object name
+
+Amr25 = namedtuple('Amr25', ['info', 'magasiner', 'ladninger', 'situasjoner', 'objekter', 'objektpunkter'])
+
+
+def _verdi(tekst):
+    """Ett tall som float, flere tall som tuple og ellers teksten uten blanke i endene."""
+    try:
+        return float(tekst)
+    except ValueError:
+        pass
+    deler = tekst.split()
+    try:
+        tall = tuple(float(d) for d in deler)
+    except ValueError:
+        return tekst.strip()
+    if len(tall) == 1:
+        return tall[0]
+    return tall if tall else ''
+
+
+def parse_lines(lines):
+    """Parser linjene i en .amr25-fil (hvilken som helst iterable av tekstlinjer)."""
+    info = {}
+    magasiner, ladninger, situasjoner, objekter, punkter = [], [], [], [], []
+    magasin = objekt = None
+
+    for line in lines:
+        line = line.rstrip('\r\n')
+        label, verdi = line[:LABEL_WIDTH].strip(), line[LABEL_WIDTH:]
+        if not label:
+            continue
+        if label == 'Object points':
+            punkttype, x, y, z = verdi.split()
+            punkter.append((objekt['nr'], punkttype, float(x), float(y), float(z)))
+        elif label == 'Object name':
+            nr, navn = verdi.split(None, 1)
+            navn, beskrivelse = navn.strip(), ''
+            if navn.endswith(OBJEKT_BESKRIVELSE):  # navnet kan ha mellomrom, så det går fram til beskrivelsen
+                navn, beskrivelse = navn[:-len(OBJEKT_BESKRIVELSE)].rstrip(), OBJEKT_BESKRIVELSE
+            objekt = {'nr': int(nr), 'Navn': navn, 'beskrivelse': beskrivelse}
+            objekter.append(objekt)
+        elif objekt is not None:
+            if label == 'Average precense':
+                kode, andel = verdi.split()
+                objekt[f'{label} {kode}'] = float(andel)
+            else:
+                objekt[label] = _verdi(verdi)
+        elif label == 'Magazin name':
+            nr, navn = verdi.split(None, 1)
+            magasin = {'magasin': int(nr), 'navn': navn.strip()}
+            magasiner.append(magasin)
+        elif label == 'Coordinates x, y':
+            magasin['x'], magasin['y'], magasin['z'] = (float(d) for d in verdi.split())
+        elif label == 'Charge data in mag':
+            nr, *tall = verdi.split()
+            q_debris, q_ton, P = (float(d) for d in tall[:3])
+            ladninger.append({'magasin': int(nr), 'Q med debris t': q_debris, 'Q t': q_ton, 'P': P,
+                              'NEI': q_ton * 1000})
+        elif label == 'Defined situations' and not line.startswith(' '):
+            andel, navn, kode, *flagg = verdi.split()
+            situasjoner.append({'situasjon': navn, 'kode': kode, 'andel': float(andel), 'flagg': ' '.join(flagg)})
+        elif magasin is not None and label not in ('Defined situations', 'Exposed objects'):
+            magasin[label] = _verdi(verdi)
+        else:
+            info[label] = _verdi(verdi)
+
+    punkter = pd.DataFrame(punkter, columns=['nr', 'punkttype', 'x', 'y', 'z'])
+    objekter = pd.DataFrame(objekter, columns=None if objekter else ['nr', 'Navn', 'beskrivelse'])
+    # første punkt per objekt gir x og y for objektet, som generate_exposed_objects skriver dem
+    forste = punkter.drop_duplicates('nr').set_index('nr')[['x', 'y', 'z']]
+    objekter = objekter.join(forste, on='nr')
+    return Amr25(
+        info=pd.DataFrame([info]),
+        magasiner=pd.DataFrame(magasiner, columns=None if magasiner else ['magasin', 'navn', 'x', 'y', 'z']),
+        ladninger=pd.DataFrame(ladninger, columns=['magasin', 'Q med debris t', 'Q t', 'P', 'NEI']),
+        situasjoner=pd.DataFrame(situasjoner, columns=['situasjon', 'kode', 'andel', 'flagg']),
+        objekter=objekter,
+        objektpunkter=punkter,
+    )
+
+
+def read_amr25(path, encoding='utf-8'):
+    """Leser én .amr25-fil."""
+    with open(path, encoding=encoding, newline='') as f:
+        return parse_lines(f)
+
+
+def read_amr25_files(paths, workers=os.cpu_count()):
+    """Leser mange filer parallelt og slår sammen tabellene, med filnavnet i kolonnen fil."""
+    paths = list(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        resultater = list(pool.map(read_amr25, paths, chunksize=max(1, len(paths) // (4 * (workers or 1)))))
+    tabeller = {}
+    for felt in Amr25._fields:
+        deler = [getattr(r, felt).assign(fil=os.path.basename(p)) for p, r in zip(paths, resultater)]
+        tabeller[felt] = pd.concat(deler, ignore_index=True) if deler else pd.DataFrame()
+    return Amr25(**tabeller)
+
+
+def read_amr25_dir(mappe, pattern='*.amr25', workers=os.cpu_count()):
+    """Leser alle .amr25-filer i en mappe (og undermapper) parallelt."""
+    return read_amr25_files(sorted(glob.glob(os.path.join(mappe, '**', pattern), recursive=True)), workers)
+
+
+def sites(resultat):
+    """Magasinene som lagersteder for batch.py: id, oesting, nording og samlet NEI per magasin."""
+    NEI = resultat.ladninger.groupby([c for c in ('fil', 'magasin') if c in resultat.ladninger])['NEI'].sum()
+    magasiner = resultat.magasiner.join(NEI, on=NEI.index.names)
+    navn = magasiner['fil'].str.rsplit('.', n=1).str[0] + '_' if 'fil' in magasiner else ''
+    return pd.DataFrame({
+        'id': navn + magasiner['magasin'].astype(str),
+        'oesting': magasiner['x'],
+        'nording': magasiner['y'],
+        'NEI': magasiner['NEI'],
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Les AMRISK 2.5-filer (.amr25) til tabeller.")
+    parser.add_argument('mappe', help="mappe med .amr25-filer")
+    parser.add_argument('--out', default='amrisk_tabeller', help="mappe for CSV-tabellene")
+    parser.add_argument('--sites', help="skriv også magasinene som sites.csv for batch.py hit")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="antall prosesser")
+    args = parser.parse_args(argv)
+
+    resultat = read_amr25_dir(args.mappe, workers=args.workers)
+    os.makedirs(args.out, exist_ok=True)
+    for felt in Amr25._fields:
+        getattr(resultat, felt).to_csv(os.path.join(args.out, f'{felt}.csv'), index=False, encoding='utf-8-sig')
+    print(f"{len(resultat.info)} filer, {len(resultat.magasiner)} magasiner og {len(resultat.objekter)} objekter "
+          f"skrevet til {args.out}")
+    if args.sites:
+        sites(resultat).to_csv(args.sites, index=False)
+        print(f"Lagersteder skrevet til {args.sites}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Batch-kjøring av mange lagersteder uten UI.
+
+    python batch.py sites.csv --out resultater --workers 4
+
+Inndata er CSV (kolonnene oesting, nording, NEI og eventuelt id) eller GeoPackage med
+punktgeometri og NEI. For hvert sted skrives en tabell over eksponerte bygg til
+<out>/sites/<id>.csv (tegn som ikke kan stå i filnavn byttes med _), statistikk per
+QD-sone og trykkbånd (bygg per kategori, veilengde og kjøretøy til stede) til
+<out>/sites/<id>_soner.csv, og en oppsummering til <out>/summary.csv. Ferdige steder
+logges i <out>/checkpoint.jsonl, slik at en avbrutt kjøring kan startes på nytt og
+fortsetter der den slapp; hvert sted logges så snart det er ferdig. Et sted som feiler
+(også i hentingen fra WFS eller NVDB) logges ikke og hindrer ikke de andre i å bli
+lagret. Med --depot skrives i tillegg <out>/depot.csv med styrende anlegg og maks trykk
+per bygg over alle stedene samlet, og med --amrisk én AMRISK-fil <out>/depot.amr25 med
+alle stedene som magasiner, hvert eksponert bygg én gang og veisegmentene innenfor QD_vei.
+Kolonnene lengde, bredde, hoyde og magasintype i inndata brukes da for magasinene.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import math
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from pipeline import analyse_site
+from sonestatistikk import sonestatistikk
+from site_index import depot_exposure, depot_veger, write_depot_amrisk, MAGASIN_KOLONNER
+from tile_cache import TILE_SIZE
+
+CLUSTER_SIZE = 5 * TILE_SIZE  # steder i samme rute kjøres etter hverandre i samme prosess
+
+def read_sites(path):
+    """Leser lagersteder til en DataFrame med kolonnene id, oesting, nording og NEI."""
+    if path.lower().endswith(('.gpkg', '.shp', '.geojson')):
+        gdf = gpd.read_file(path).to_crs('EPSG:32633')
+        sites = pd.DataFrame({'oesting': gdf.geometry.x, 'nording': gdf.geometry.y, 'NEI': gdf['NEI']})
+        for kolonne in ['id', *MAGASIN_KOLONNER]:
+            if kolonne in gdf:
+                sites[kolonne] = gdf[kolonne]
+    else:
+        sites = pd.read_csv(path, sep=None, engine='python')
+    if 'id' not in sites:
+        sites['id'] = range(1, len(sites) + 1)
+    sites['id'] = sites['id'].astype(str)
+    if sites['id'].duplicated().any():
+        raise ValueError("Kolonnen id må være unik")
+    if sites['id'].map(filnavn).duplicated().any():
+        raise ValueError("Kolonnen id må være unik også etter at tegn som ikke kan stå i filnavn er byttet ut")
+    for kolonne in ('oesting', 'nording', 'NEI'):
+        sites[kolonne] = pd.to_numeric(sites[kolonne], errors='coerce')
+    ugyldig = ~(np.isfinite(sites['oesting']) & np.isfinite(sites['nording']) & (sites['NEI'] > 0))
+    if ugyldig.any():
+        raise ValueError("Steder uten gyldige koordinater eller med NEI <= 0: " + ', '.join(sites.loc[ugyldig, 'id']))
+    return sites[['id', 'oesting', 'nording', 'NEI'] + [k for k in MAGASIN_KOLONNER if k in sites]]
+
+
+def filnavn(site_id):
+    """id som trygt filnavn: bare bokstaver, tall, punktum, bindestrek og understrek."""
+    return re.sub(r'[^\w.-]', '_', site_id).lstrip('.') or '_'
+
+
+def read_checkpoint(path):
+    """Oppsummeringer for steder som allerede er ferdige, med id som nøkkel. En halvskrevet
+    siste linje (kjøringen ble avbrutt midt i skrivingen) hoppes over."""
+    done = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        summary = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    done[summary['id']] = summary
+    return done
+
+
+def write_checkpoint(path, summary):
+    """Legger til ett ferdig sted i checkpoint-fila. Linjen skrives med ett kall i append-modus,
+    så prosessene kan skrive til samme fil uten å blande linjene."""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(summary, ensure_ascii=False) + '\n')
+
+
+def summarize(site, output, veg_data, statistikk=None):
+    """Én rad i oppsummeringen for et sted. Med statistikk (sonestatistikk.sonestatistikk) tas
+    antall bygg per QD-sone og veilengde og kjøretøy til stede innenfor QD_vei med."""
+    summary = {
+        'id': site['id'],
+        'oesting': site['oesting'],
+        'nording': site['nording'],
+        'NEI': site['NEI'],
+        'antall bygg': len(output),
+        'maks trykk kPa': float(output['trykk kPa'].max()) if len(output) else None,
+        'min avstand m': float(output['avstand m'].min()) if len(output) else None,
+        'antall vegsegmenter': len(veg_data),
+    }
+    for k in range(1, 10):
+        summary[f'bygg kategori {k}'] = int((output['kategori'] == k).sum())
+    if statistikk is not None:
+        soner = statistikk[statistikk['gruppe'] == 'sone'].set_index('verdi')
+        for sone, antall in soner['antall bygg'].items():
+            summary[f'bygg {sone}'] = int(antall)
+        summary['veglengde QD_vei m'] = float(soner.loc['QD_vei', 'lengde m'])
+        summary['kjøretøy til stede QD_vei'] = float(soner.loc['QD_vei', 'kjøretøy til stede'])
+    return summary
+
+
+def run_cluster(sites, out_dir, checkpoint_path=None):
+    """Kjører en gruppe nærliggende steder i én prosess. Flisene de deler hentes
+    bare én gang og leses deretter fra den felles diskcachen. Hvert sted skrives til
+    checkpoint_path så snart det er ferdig. Returnerer (oppsummeringer, feil) der feil er
+    (id, melding) for steder som feilet, slik at resten likevel lagres."""
+    summaries, feil = [], []
+    for site in sites:
+        try:
+            summary = run_site(site, out_dir)
+        except Exception as err:
+            feil.append((site['id'], f"{type(err).__name__}: {err}"))
+            continue
+        if checkpoint_path:
+            write_checkpoint(checkpoint_path, summary)
+        summaries.append(summary)
+    return summaries, feil
+
+
+def run_site(site, out_dir):
+    """Beregner ett sted og skriver tabellene for det. Returnerer oppsummeringen. Feiler
+    hentingen av bygg eller veier, kastes feilen, slik at stedet ikke lagres som tomt."""
+    output, veg_data = analyse_site(site['oesting'], site['nording'], site['NEI'], kast_feil=True)
+    path = os.path.join(out_dir, 'sites', f"{filnavn(site['id'])}.csv")
+    tabell = pd.DataFrame(output)
+    tabell['geometry'] = tabell['geometry'].astype(str)
+    tabell.to_csv(path + '.tmp', index=False, encoding='utf-8-sig')
+    os.replace(path + '.tmp', path)
+    statistikk = sonestatistikk(output, veg_data, site['oesting'], site['nording'], site['NEI'])
+    path = os.path.join(out_dir, 'sites', f"{filnavn(site['id'])}_soner.csv")
+    statistikk.to_csv(path + '.tmp', index=False, encoding='utf-8-sig')
+    os.replace(path + '.tmp', path)
+    return summarize(site, output, veg_data, statistikk)
+
+
+def clusters(sites, size=CLUSTER_SIZE):
+    """Grupperer steder i ruter på size x size meter."""
+    key = (sites['oesting'] // size).astype(int).astype(str) + '_' + (sites['nording'] // size).astype(int).astype(str)
+    return [group.to_dict('records') for _, group in sites.groupby(key, sort=True)]
+
+
+def run_batch(sites_path, out_dir, workers=os.cpu_count()):
+    sites = read_sites(sites_path)
+    os.makedirs(os.path.join(out_dir, 'sites'), exist_ok=True)
+    checkpoint_path = os.path.join(out_dir, 'checkpoint.jsonl')
+    done = read_checkpoint(checkpoint_path)
+
+    todo = sites[~sites['id'].isin(done)]
+    print(f"{len(sites)} steder, {len(done)} ferdige fra før, {len(todo)} gjenstår")
+
+    start = time.time()
+    n_done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_cluster, cluster, out_dir, checkpoint_path): cluster for cluster in clusters(todo)}
+        for future in as_completed(futures):
+            try:
+                summaries, feil = future.result()
+            except Exception as err:
+                ids = ', '.join(site['id'] for site in futures[future])
+                print(f"Feil for steder {ids}: {err}", file=sys.stderr)
+                continue
+            for site_id, melding in feil:
+                print(f"Feil for sted {site_id}: {melding}", file=sys.stderr)
+            for summary in summaries:
+                done[summary['id']] = summary
+            n_done += len(summaries) + len(feil)
+            elapsed = time.time() - start
+            eta = elapsed / n_done * (len(todo) - n_done)
+            print(f"[{len(done)}/{len(sites)}] {elapsed:.0f} s brukt, ca. {math.ceil(eta)} s igjen")
+
+    summary = pd.DataFrame([done[i] for i in sites['id'] if i in done])
+    summary.to_csv(os.path.join(out_dir, 'summary.csv'), index=False, encoding='utf-8-sig')
+    print(f"Oppsummering skrevet til {os.path.join(out_dir, 'summary.csv')}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Beregn eksponerte bygg for mange lagersteder.")
+    parser.add_argument('sites', help="CSV eller GeoPackage med lagersteder")
+    parser.add_argument('--out', default='resultater', help="mappe for resultater og checkpoint")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="antall prosesser")
+    parser.add_argument('--depot', action='store_true', help="skriv også samlet worst case per bygg for alle stedene")
+    parser.add_argument('--amrisk', action='store_true', help="skriv også én AMRISK-fil med alle stedene som magasiner")
+    args = parser.parse_args(argv)
+    run_batch(args.sites, args.out, args.workers)
+    if args.depot or args.amrisk:
+        sites = read_sites(args.sites)
+        eksponering = depot_exposure(sites)
+    if args.depot:
+        depot = pd.DataFrame(eksponering).assign(geometry=lambda d: d['geometry'].astype(str))
+        depot.to_csv(os.path.join(args.out, 'depot.csv'), index=False, encoding='utf-8-sig')
+        print(f"Samlet eksponering skrevet til {os.path.join(args.out, 'depot.csv')}")
+    if args.amrisk:
+        path = os.path.join(args.out, 'depot.amr25')
+        with open(path + '.tmp', 'w', encoding='utf-8', newline='') as f:
+            write_depot_amrisk(f, sites, eksponering, veger=depot_veger(sites))
+        os.replace(path + '.tmp', path)
+        print(f"AMRISK-fil med {len(sites)} magasiner skrevet til {path}")
+
+
+if __name__ == '__main__':
+    main()
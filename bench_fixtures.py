@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Testdata og lokal testserver for benchmark.py. Svarene fra Geonorge WFS (GML) og NVDB
+(JSON) er enten syntetiske eller spilt inn fra de ekte tjenestene, og serveres fra en
+lokal HTTP-server med samme spørringer (bbox, kartutsnitt og sider), slik at hele
+beregningen kan kjøres uten nett.
+
+Innspilling av ekte svar rundt et anlegg (krever nett):
+
+    python bench_fixtures.py fixtures/eksempel --oesting 262000 --nording 6649000 --NEI 1000
+"""
+
+import os
+import re
+import json
+import shutil
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+
+import numpy as np
+import shapely
+
+import http_fetch
+import get_matrikkel_data
+import get_veg_data
+from pipeline import QD_func
+from tile_cache import TileCache
+
+GML_HEAD = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<wfs:FeatureCollection xmlns:wfs="http://www.opengis.net/wfs/2.0" xmlns:gml="http://www.opengis.net/gml/3.2" '
+            'xmlns:app="http://skjema.geonorge.no/SOSI/produktspesifikasjon/Matrikkelen-Bygningspunkt" '
+            'numberMatched="{n}" numberReturned="{n}">\n')
+GML_TAIL = '</wfs:FeatureCollection>\n'
+GML_MEMBER = ('<wfs:member><app:Bygning gml:id="bygning.{i}"><app:identifikasjon><app:Identifikasjon>'
+              '<app:lokalId>{i}</app:lokalId><app:navnerom>https://data.geonorge.no/sosi/matrikkelen</app:navnerom>'
+              '<app:versjonId>1</app:versjonId></app:Identifikasjon></app:identifikasjon>'
+              '<app:datafangstdato>2010-01-01T00:00:00</app:datafangstdato><app:oppdateringsdato>2024-01-01T00:00:00</app:oppdateringsdato>'
+              '<app:kommunenummer>0301</app:kommunenummer><app:bygningsnummer>{i}</app:bygningsnummer>'
+              '<app:bygningstype>{t}</app:bygningstype><app:bygningsstatus>TB</app:bygningsstatus>'
+              '<app:harKulturminne>false</app:harKulturminne><app:representasjonspunkt><gml:Point gml:id="p{i}" '
+              'srsName="http://www.opengis.net/def/crs/EPSG/0/32633" srsDimension="2"><gml:pos>{x:.2f} {y:.2f}</gml:pos>'
+              '</gml:Point></app:representasjonspunkt></app:Bygning></wfs:member>\n')
+VEGTYPER = ('540', '105')  # ÅDT og fartsgrense
+
+_MEMBER_RE = re.compile(r'<wfs:member>.*?</wfs:member>', re.S)
+_POS_RE = re.compile(r'<gml:pos[^>]*>\s*([-\d.eE+]+)\s+([-\d.eE+]+)')
+
+
+class Fixtures:
+    """Bygg som GML-medlemmer med koordinater og vegobjekter per type, med anlegget de er laget rundt."""
+
+    def __init__(self, members, vegobjekter, oesting, nording, NEI):
+        self.members = np.asarray(members, dtype=object)
+        pos = [_POS_RE.search(m).groups() for m in members]
+        self.x = np.array([float(p[0]) for p in pos])
+        self.y = np.array([float(p[1]) for p in pos])
+        self.vegobjekter = {typ: list(vegobjekter.get(typ, [])) for typ in VEGTYPER}
+        self._vegbounds = {typ: shapely.bounds(shapely.from_wkt([o['geometri']['wkt'] for o in objekter]))
+                           if objekter else np.empty((0, 4)) for typ, objekter in self.vegobjekter.items()}
+        self.oesting, self.nording, self.NEI = oesting, nording, NEI
+
+    def gml(self, minx, miny, maxx, maxy):
+        """GML-svar med byggene innenfor bboxen, som fra WFS GetFeature."""
+        treff = (self.x >= minx) & (self.x <= maxx) & (self.y >= miny) & (self.y <= maxy)
+        return (GML_HEAD.format(n=int(treff.sum())) + ''.join(self.members[treff]) + GML_TAIL).encode('utf-8')
+
+    def nvdb(self, typ, minx, miny, maxx, maxy, start=0, antall=1000):
+        """Én side med vegobjekter av typen typ som krysser bboxen, som fra NVDB API Les."""
+        b = self._vegbounds[typ]
+        treff = np.flatnonzero((b[:, 2] >= minx) & (b[:, 0] <= maxx) & (b[:, 3] >= miny) & (b[:, 1] <= maxy))
+        side = treff[start:start + antall]
+        return {'objekter': [self.vegobjekter[typ][i] for i in side],
+                'metadata': {'returnert': len(side), 'sidestørrelse': antall, 'neste': {'start': start + len(side)}}}
+
+    def save(self, mappe):
+        os.makedirs(mappe, exist_ok=True)
+        with open(os.path.join(mappe, 'matrikkel.gml'), 'w', encoding='utf-8') as f:
+            f.write(GML_HEAD.format(n=len(self.members)) + ''.join(self.members) + GML_TAIL)
+        for typ in VEGTYPER:
+            with open(os.path.join(mappe, f'nvdb_{typ}.json'), 'w', encoding='utf-8') as f:
+                json.dump(self.vegobjekter[typ], f, ensure_ascii=False)
+        with open(os.path.join(mappe, 'anlegg.json'), 'w', encoding='utf-8') as f:
+            json.dump({'oesting': self.oesting, 'nording': self.nording, 'NEI': self.NEI}, f)
+
+    @classmethod
+    def load(cls, mappe):
+        with open(os.path.join(mappe, 'matrikkel.gml'), encoding='utf-8') as f:
+            members = [m + '\n' for m in _MEMBER_RE.findall(f.read())]
+        vegobjekter = {}
+        for typ in VEGTYPER:
+            with open(os.path.join(mappe, f'nvdb_{typ}.json'), encoding='utf-8') as f:
+                vegobjekter[typ] = json.load(f)
+        with open(os.path.join(mappe, 'anlegg.json'), encoding='utf-8') as f:
+            anlegg = json.load(f)
+        return cls(members, vegobjekter, **anlegg)
+
+
+def synthetic(n_bygg, n_veg=None, oesting=262000, nording=6649000, NEI=1000, seed=0):
+    """Syntetiske testdata: n_bygg bygg jevnt fordelt i bboxen til QD_syk og n_veg vegsegmenter
+    (standard like mange) i bboxen til QD_vei. Annethvert segment har to fartsgrenser."""
+    rng = np.random.default_rng(seed)
+    QD_syk, QD_bolig, QD_vei = QD_func(NEI)
+    x = rng.uniform(oesting - QD_syk, oesting + QD_syk, n_bygg)
+    y = rng.uniform(nording - QD_syk, nording + QD_syk, n_bygg)
+    typer = rng.choice([111, 121, 131, 161, 181, 211, 311, 419, 511, 611, 719, 829, 999], n_bygg)
+    members = [GML_MEMBER.format(i=i, t=t, x=xi, y=yi) for i, (t, xi, yi) in enumerate(zip(typer, x, y))]
+
+    n_veg = n_bygg if n_veg is None else n_veg
+    x1 = rng.uniform(oesting - QD_vei, oesting + QD_vei, n_veg)
+    y1 = rng.uniform(nording - QD_vei, nording + QD_vei, n_veg)
+    vinkel = rng.uniform(0, 2 * np.pi, n_veg)
+    lengde = rng.uniform(20, 60, n_veg)
+    x2, y2 = x1 + lengde * np.cos(vinkel), y1 + lengde * np.sin(vinkel)
+
+    def linje(ax, ay, bx, by):
+        return f'LINESTRING Z({ax:.2f} {ay:.2f} 10, {bx:.2f} {by:.2f} 10)'
+
+    def objekt(oid, egenskaper, wkt, lenke, start, slutt):
+        return {'id': oid, 'egenskaper': egenskaper, 'geometri': {'wkt': wkt, 'srid': 5973},
+                'lokasjon': {'stedfestinger': [{'veglenkesekvensid': lenke, 'startposisjon': start, 'sluttposisjon': slutt}]}}
+
+    adt, fart = [], []
+    for i in range(n_veg):
+        lenke = 100000 + i
+        adt.append(objekt(10_000_000 + i, [{'id': 4621, 'verdi': 2024}, {'id': 4623, 'verdi': int(rng.integers(100, 20000))},
+                                           {'id': 4625, 'verdi': 'Manuelt'}],
+                          linje(x1[i], y1[i], x2[i], y2[i]), lenke, 0.0, 1.0))
+        if i % 2:
+            mx, my = (x1[i] + x2[i]) / 2, (y1[i] + y2[i]) / 2
+            fart.append(objekt(20_000_000 + 2 * i, [{'id': 2021, 'verdi': 50}], linje(x1[i], y1[i], mx, my), lenke, 0.0, 0.5))
+            fart.append(objekt(20_000_001 + 2 * i, [{'id': 2021, 'verdi': 80}], linje(mx, my, x2[i], y2[i]), lenke, 0.5, 1.0))
+        else:
+            fart.append(objekt(20_000_000 + 2 * i, [{'id': 2021, 'verdi': 60}], linje(x1[i], y1[i], x2[i], y2[i]), lenke, 0.0, 1.0))
+    return Fixtures(members, {'540': adt, '105': fart}, oesting, nording, NEI)
+
+
+def record(mappe, oesting, nording, NEI):
+    """Spiller inn ekte svar fra WFS og NVDB for QD-sonene rundt et anlegg og lagrer dem i mappe."""
+    QD_syk, QD_bolig, QD_vei = QD_func(NEI)
+    params = {'service': 'WFS', 'version': '2.0.0', 'request': 'GetFeature', 'typename': 'app:Bygning',
+              'srsname': 'EPSG:32633', 'outputformat': 'application/gml+xml; version=3.2',
+              'bbox': f'{oesting - QD_syk},{nording - QD_syk},{oesting + QD_syk},{nording + QD_syk},EPSG:32633'}
+    response = http_fetch.get(get_matrikkel_data.WFS_URL, params=params)
+    response.raise_for_status()
+    members = [m + '\n' for m in _MEMBER_RE.findall(response.text)]
+
+    vegobjekter = {}
+    for typ in VEGTYPER:
+        url = f'{get_veg_data.NVDB_URL}/vegobjekter/{typ}'
+        bbox = (oesting - QD_vei, nording - QD_vei, oesting + QD_vei, nording + QD_vei)
+        vegobjekter[typ] = [obj for side in get_veg_data.iter_vegobjekter(url, *bbox) for obj in side]
+
+    fixtures = Fixtures(members, vegobjekter, oesting, nording, NEI)
+    fixtures.save(mappe)
+    return fixtures
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        fixtures = self.server.fixtures
+        if url.path.startswith('/wfs'):
+            body = fixtures.gml(*[float(v) for v in query['bbox'].split(',')[:4]])
+            content_type = 'application/gml+xml'
+        else:
+            typ = url.path.rstrip('/').split('/')[-1]
+            side = fixtures.nvdb(typ, *[float(v) for v in query['kartutsnitt'].split(',')],
+                                 start=int(query.get('start', 0)), antall=int(query.get('antall', 1000)))
+            query['start'] = side['metadata']['neste']['start']
+            side['metadata']['neste']['href'] = f'http://127.0.0.1:{self.server.server_port}{url.path}?{urlencode(query)}'
+            body = json.dumps(side, ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json'
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.bytes += len(body)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer:
+    """Lokal HTTP-server som svarer som WFS (/wfs) og NVDB (/vegobjekter/<type>) fra fixtures.
+    Teller antall kall og bytes som er sendt."""
+
+    def __init__(self, fixtures):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.fixtures = fixtures
+        self.server.lock = threading.Lock()
+        self.server.requests = self.server.bytes = 0
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.wfs_url = f'{self.url}/wfs?'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    @property
+    def bytes(self):
+        return self.server.bytes
+
+
+@contextmanager
+def offline(server):
+    """Peker get_matrikkel_data og get_veg_data mot testserveren, med en tom flis-cache i en
+    midlertidig mappe. Alt settes tilbake etterpå."""
+    cache_dir = tempfile.mkdtemp(prefix='tangos-bench-')
+    lagret = (get_matrikkel_data.WFS_URL, get_veg_data.NVDB_URL, get_matrikkel_data._matrikkel_cache)
+    get_matrikkel_data.WFS_URL = server.wfs_url
+    get_veg_data.NVDB_URL = server.url
+    get_matrikkel_data._matrikkel_cache = TileCache('matrikkel', get_matrikkel_data.fetch_matrikkel_bbox,
+                                                    id_column='gml_id', cache_dir=cache_dir)
+    try:
+        yield get_matrikkel_data._matrikkel_cache
+    finally:
+        get_matrikkel_data.WFS_URL, get_veg_data.NVDB_URL, get_matrikkel_data._matrikkel_cache = lagret
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spill inn WFS- og NVDB-svar rundt et anlegg til bruk i benchmark.py.")
+    parser.add_argument('mappe', help="mappe for de innspilte svarene")
+    parser.add_argument('--oesting', type=float, required=True)
+    parser.add_argument('--nording', type=float, required=True)
+    parser.add_argument('--NEI', type=float, required=True)
+    args = parser.parse_args(argv)
+    fixtures = record(args.mappe, args.oesting, args.nording, args.NEI)
+    print(f"{len(fixtures.members)} bygg og {len(fixtures.vegobjekter['540'])} ÅDT-objekter lagret i {args.mappe}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Enkle ytelsestester for tangos. Kjøres med: python benchmark.py [navn ...]
+
+pipeline kjører hele beregningen for ett anlegg mot en lokal testserver med syntetiske
+eller innspilte svar (bench_fixtures.py), og måler tid og maks minne per steg. Resultatet
+kan lagres som baseline og sjekkes mot senere, f.eks. før en endring slås sammen:
+
+    python benchmark.py pipeline --save-baseline baseline.json
+    python benchmark.py pipeline --check baseline.json --threshold 0.25
+
+--check avslutter med kode 1 hvis et steg er mer enn threshold tregere eller bruker mer minne.
+"""
+
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import folium
+
+from blast_model import incident_pressure, incident_pressure_array, distance_for_pressure
+from get_veg_data import get_veg_data, join_fartsgrense
+from kart import add_building_layers, CLUSTER_THRESHOLD
+from scenario import Scenario
+from pipeline import qd_soner, klassifiser_soner, eksponerte_bygg, sone_bbox, QD_func
+from sonestatistikk import sonestatistikk
+from get_matrikkel_data import get_matrikkel_data
+from amr25filecreator import extract_coords, format_amrisk_coord, iter_exposed_objects, write_exposed_objects
+from wfs_gml import read_points
+import bygningstyper
+import bench_fixtures
+
+
+def _best_of(func, repeat=3):
+    """Returnerer beste veggtid (s) av repeat kjøringer."""
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_incident_pressure(sizes=(10_000, 100_000, 1_000_000), NEI=1000):
+    """Series.apply(incident_pressure) mot incident_pressure_array."""
+    rng = np.random.default_rng(0)
+    print(f"incident_pressure, NEI={NEI} kg")
+    print(f"{'n':>10} {'apply s':>10} {'array s':>10} {'speedup':>8}")
+    for n in sizes:
+        avstand = pd.Series(np.round(rng.uniform(1, 20000, n)))
+        t_apply = _best_of(lambda: avstand.apply(incident_pressure, args=[NEI]), repeat=1)
+        t_array = _best_of(lambda: incident_pressure_array(avstand, NEI))
+        print(f"{n:>10} {t_apply:>10.4f} {t_array:>10.4f} {t_apply / t_array:>7.0f}x")
+
+
+def bench_distance_for_pressure(sizes=(1, 10_000, 1_000_000)):
+    """distance_for_pressure for n tilfeldige (P, NEI)-par, med rundtur-avvik."""
+    rng = np.random.default_rng(0)
+    print("distance_for_pressure")
+    print(f"{'n':>10} {'s':>10} {'us/par':>8} {'maks rel. avvik':>16}")
+    for n in sizes:
+        NEI = rng.uniform(1, 100000, n)
+        avstand = rng.uniform(1, 2000, n) * NEI ** (1/3)
+        P = incident_pressure_array(avstand, NEI)
+        t = _best_of(lambda: distance_for_pressure(P, NEI))
+        avvik = np.nanmax(np.abs(incident_pressure_array(distance_for_pressure(P, NEI), NEI) - P) / P)
+        print(f"{n:>10} {t:>10.4f} {t / n * 1e6:>8.3f} {avvik:>16.1e}")
+
+
+def synthetic_road_network(n_segments, segments_per_link=10, seed=0):
+    """Syntetisk vegnett: rette veglenkesekvenser spredt over et område, delt i ÅDT-segmenter
+    og fartsgrensesegmenter med ulike knekkpunkter. Som i NVDB deler segmentene på samme
+    veglenke de samme knekkpunktene. Returnerer (veg, fart) som i get_veg_data."""
+    rng = np.random.default_rng(seed)
+    n_links = max(1, n_segments // segments_per_link)
+    side = 2000 * np.sqrt(n_links)  # omtrent samme tetthet uansett størrelse
+    start = rng.uniform(0, side, (n_links, 2)) + [200000, 6600000]
+    vinkel = rng.uniform(0, 2 * np.pi, n_links)
+    lengde = rng.uniform(1000, 3000, n_links)
+    retning = np.column_stack([np.cos(vinkel), np.sin(vinkel)]) * lengde[:, None]
+
+    n_fart = max(2, segments_per_link // 2)
+    adt_kutt = np.sort(rng.uniform(0, 1, (n_links, segments_per_link - 1)), axis=1)
+    fart_kutt = np.sort(rng.uniform(0, 1, (n_links, n_fart - 1)), axis=1)
+
+    def segmenter(kutt, verdier):
+        rader = []
+        for link in range(n_links):
+            posisjoner = np.concatenate([[0.0], np.sort(np.concatenate([adt_kutt[link], fart_kutt[link]])), [1.0]])
+            punkter = start[link] + retning[link] * posisjoner[:, None]
+            grenser = np.concatenate([[0.0], kutt[link], [1.0]])
+            for fra, til in zip(grenser[:-1], grenser[1:]):
+                inni = (posisjoner >= fra) & (posisjoner <= til)
+                rader.append((len(rader), rng.choice(verdier), [(link, fra, til)], shapely.LineString(punkter[inni])))
+        return gpd.GeoDataFrame(pd.DataFrame(rader, columns=['Vegobj_id', 'verdi', 'Stedfesting', 'geometry']),
+                                geometry='geometry', crs='EPSG:5973')
+
+    veg = segmenter(adt_kutt, [500, 2000, 8000]).rename(columns={'verdi': 'ÅDT_total'})
+    fart = segmenter(fart_kutt, [50, 60, 80]).rename(columns={'verdi': 'Fartsgrense'})
+    return veg, fart
+
+
+def bench_road_join(sizes=(5_000, 50_000), overlay_max=50_000):
+    """join_fartsgrense (STRtree + lineær referanse) mot gpd.overlay på syntetisk vegnett."""
+    print("fartsgrense-kobling")
+    print(f"{'n':>10} {'overlay s':>10} {'rader':>8} {'join s':>10} {'rader':>8}")
+    for n in sizes:
+        veg, fart = synthetic_road_network(n)
+        joined = join_fartsgrense(veg, fart)
+        t_join = _best_of(lambda: join_fartsgrense(veg, fart))
+        if n <= overlay_max:
+            overlay = gpd.overlay(veg.drop(columns='Stedfesting'), fart[['geometry', 'Fartsgrense']],
+                                  how='intersection', keep_geom_type=True)
+            t_overlay = _best_of(lambda: gpd.overlay(veg.drop(columns='Stedfesting'), fart[['geometry', 'Fartsgrense']],
+                                                     how='intersection', keep_geom_type=True), repeat=1)
+            print(f"{n:>10} {t_overlay:>10.3f} {len(overlay):>8} {t_join:>10.3f} {len(joined):>8}")
+        else:
+            print(f"{n:>10} {'-':>10} {'-':>8} {t_join:>10.3f} {len(joined):>8}")
+
+
+def synthetic_exposed_buildings(n, oesting=262000, nording=6649000, NEI=1000, seed=0):
+    """Syntetisk tabell over eksponerte bygg rundt et anlegg, som fra pipeline.eksponerte_bygg."""
+    rng = np.random.default_rng(seed)
+    koder = bygningstyper.read_csv(bygningstyper.BUNDLED_CSV)['Kodeverdi'].to_numpy()
+    r = 2000 * np.sqrt(rng.uniform(0, 1, n))
+    v = rng.uniform(0, 2 * np.pi, n)
+    output = gpd.GeoDataFrame({'bygningstype': rng.choice(koder, n)},
+                              geometry=gpd.points_from_xy(oesting + r * np.cos(v), nording + r * np.sin(v)), crs='EPSG:32633')
+    output['Navn'] = bygningstyper.navn(output['bygningstype'])
+    output['kategori'] = bygningstyper.kategori(output['bygningstype'])
+    output['avstand m'] = np.round(r)
+    output['trykk kPa'] = incident_pressure_array(output['avstand m'], NEI).round(2)
+    return output
+
+
+def bench_map(sizes=(2_000, 20_000)):
+    """HTML-størrelse og tid for kartet: .explore() per kategori mot add_building_layers."""
+    def explore_per_kategori(output):
+        m = folium.Map(location=[59.9, 10.7])
+        for k in range(1, 10):
+            gruppe = output[output['kategori'] == k]
+            if not gruppe.empty:
+                gruppe.explore(m=m, style_kwds=dict(color='black'), name=str(k))
+        return m.get_root().render()
+
+    def lag(output):
+        m = folium.Map(location=[59.9, 10.7], prefer_canvas=True)
+        add_building_layers(m, output)
+        return m.get_root().render()
+
+    print(f"kart (klynger over {CLUSTER_THRESHOLD} bygg)")
+    print(f"{'n':>10} {'explore s':>10} {'MB':>7} {'lag s':>10} {'MB':>7}")
+    for n in sizes:
+        output = synthetic_exposed_buildings(n)
+        t_explore = _best_of(lambda: explore_per_kategori(output), repeat=1)
+        t_lag = _best_of(lambda: lag(output), repeat=1)
+        mb_explore = len(explore_per_kategori(output)) / 1e6
+        mb_lag = len(lag(output)) / 1e6
+        print(f"{n:>10} {t_explore:>10.3f} {mb_explore:>7.2f} {t_lag:>10.3f} {mb_lag:>7.2f}")
+
+
+def bench_amrisk(sizes=(5_000, 50_000)):
+    """AMRISK-objekter: iterrows med WKT og formatering per verdi mot strømmende skriving fra x/y."""
+    import io
+
+    def per_rad(tabell):
+        lines = [f" Exposed objects       {len(tabell)}"]
+        for idx, row in tabell.iterrows():
+            x, y = extract_coords(row["geometry"])
+            lines.append(f"{idx} {format_amrisk_coord(x)} {format_amrisk_coord(y)}")
+        return "\n".join(lines)
+
+    print("AMRISK exposed objects")
+    print(f"{'n':>10} {'iterrows s':>11} {'strøm s':>10} {'MB':>7}")
+    for n in sizes:
+        output = synthetic_exposed_buildings(n)
+        tabell = pd.DataFrame(output)
+        tabell['geometry'] = tabell['geometry'].astype(str)
+        x, y = output.geometry.x.to_numpy(), output.geometry.y.to_numpy()
+        t_rad = _best_of(lambda: per_rad(tabell), repeat=1)
+        t_strom = _best_of(lambda: write_exposed_objects(io.StringIO(), x, y, output['Navn']))
+        mb = sum(len(chunk) for chunk in iter_exposed_objects(x, y, output['Navn'])) / 1e6
+        print(f"{n:>10} {t_rad:>11.3f} {t_strom:>10.3f} {mb:>7.1f}")
+
+
+def bench_whatif(sizes=(10_000, 100_000), NEI_verdier=(100, 1000, 5000, 10000)):
+    """Hva-om: tid per ny NEI med ferdig sorterte avstander, for tabell, oppsummering og raster."""
+    print("hva-om per oppdatering (ms)")
+    print(f"{'n':>10} {'init s':>8} {'tabell':>8} {'oppsum.':>8} {'raster':>8}")
+    for n in sizes:
+        bygg = synthetic_exposed_buildings(n)[['bygningstype', 'geometry']]
+        t_init = _best_of(lambda: Scenario(bygg, 262000, 6649000, max(NEI_verdier)), repeat=1)
+        scenario = Scenario(bygg, 262000, 6649000, max(NEI_verdier))
+        tider = [max(_best_of(lambda: f(NEI)) for NEI in NEI_verdier) * 1000
+                 for f in (scenario.eksponerte_bygg, scenario.oppsummering, scenario.trykk_raster)]
+        print(f"{n:>10} {t_init:>8.3f} {tider[0]:>8.1f} {tider[1]:>8.1f} {tider[2]:>8.1f}")
+
+
+def bench_soner(sizes=(10_000, 100_000, 1_000_000), NEI=1000):
+    """Sonefordeling: sjoin mot tre bufrede sirkler mot klassifiser_soner på kvadrerte avstander."""
+    gdf, gdf_syk, gdf_bolig, gdf_vei = qd_soner(262000, 6649000, NEI)
+    print(f"QD-soner, NEI={NEI} kg")
+    print(f"{'n':>10} {'sjoin s':>10} {'avstand s':>10} {'speedup':>8}")
+    for n in sizes:
+        bygg = synthetic_exposed_buildings(n)[['bygningstype', 'geometry']]
+        x, y = shapely.get_x(bygg.geometry.values), shapely.get_y(bygg.geometry.values)
+        t_sjoin = _best_of(lambda: [gpd.sjoin(bygg, sone, predicate='within') for sone in (gdf_syk, gdf_bolig, gdf_vei)],
+                           repeat=1)
+        t_avstand = _best_of(lambda: klassifiser_soner(x, y, 262000, 6649000, NEI))
+        print(f"{n:>10} {t_sjoin:>10.4f} {t_avstand:>10.4f} {t_sjoin / t_avstand:>7.0f}x")
+
+
+def bench_gml(sizes=(10_000, 100_000), fixtures=None):
+    """WFS-svar i GML: gpd.read_file mot wfs_gml.read_points med lxml og med xml.etree.
+    Syntetiske svar med n bygg, eller det innspilte svaret i mappen fixtures."""
+    import io
+    from wfs_gml import etree
+
+    if fixtures:
+        svar = [(bench_fixtures.Fixtures.load(fixtures), fixtures)]
+    else:
+        svar = [(bench_fixtures.synthetic(n, 0), f'n={n}') for n in sizes]
+    print("GML-parsing av bygningspunkt")
+    print(f"{'data':>12} {'MB':>6} {'read_file s':>12} {'lxml s':>8} {'etree s':>8} {'rader':>8} {'lik':>4}")
+    for data, etikett in svar:
+        gml = data.gml(-np.inf, -np.inf, np.inf, np.inf)
+        fasit = gpd.read_file(io.BytesIO(gml))
+        t_gdal = _best_of(lambda: gpd.read_file(io.BytesIO(gml)), repeat=1)
+        t_lxml = _best_of(lambda: read_points(gml)) if etree is not None else np.nan
+        t_etree = _best_of(lambda: read_points(gml, use_lxml=False), repeat=1)
+        rask = read_points(gml)
+        lik = (rask['gml_id'].tolist() == fasit['gml_id'].tolist()
+               and (rask['bygningstype'].to_numpy() == fasit['bygningstype'].to_numpy()).all()
+               and rask.geometry.geom_equals(fasit.geometry).all())
+        print(f"{etikett:>12} {len(gml) / 1e6:>6.1f} {t_gdal:>12.3f} {t_lxml:>8.3f} {t_etree:>8.3f} {len(rask):>8} {'ja' if lik else 'NEI':>4}")
+
+
+def _maal(func, repeat=3):
+    """Beste veggtid (s) av repeat kjøringer, og maks allokert minne (MB) målt med tracemalloc
+    i en egen kjøring, slik at sporingen ikke påvirker tiden. Returnerer (resultat, s, MB)."""
+    t = _best_of(func, repeat)
+    tracemalloc.start()
+    try:
+        resultat = func()
+        MB = tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+    return resultat, t, MB
+
+
+def bench_pipeline(sizes=(1_000, 10_000, 100_000), fixtures=None, repeat=3):
+    """Hele beregningen for ett anlegg, steg for steg, mot en lokal WFS/NVDB-testserver.
+    Syntetiske data med n bygg og n/2 vegsegmenter per størrelse, eller innspilte svar fra
+    mappen fixtures. Returnerer {'steg n=..': {'s': .., 'MB': ..}}."""
+    if fixtures:
+        datasett = [(bench_fixtures.Fixtures.load(fixtures), fixtures)]
+    else:
+        datasett = [(bench_fixtures.synthetic(n, n // 2), f'n={n}') for n in sizes]
+
+    resultater = {}
+    print("pipeline per steg")
+    print(f"{'steg':>14} {'data':>12} {'s':>9} {'MB':>8} {'rader':>8}")
+    for data, etikett in datasett:
+        oesting, nording, NEI = data.oesting, data.nording, data.NEI
+        QD_syk, QD_bolig, QD_vei = QD_func(NEI)
+        anlegg = shapely.Point(oesting, nording)
+        with bench_fixtures.StubServer(data) as server, bench_fixtures.offline(server) as cache:
+            def kald():
+                cache.clear()
+                return get_matrikkel_data(sone_bbox(oesting, nording, QD_syk))
+
+            def kart(output):
+                m = folium.Map(location=[59.9, 10.7], prefer_canvas=True)
+                add_building_layers(m, output)
+                return m.get_root().render()
+
+            matrikkel = kald()
+            output = eksponerte_bygg(matrikkel, anlegg, NEI)
+            veg_data = get_veg_data(sone_bbox(oesting, nording, QD_vei))
+            x, y = shapely.get_x(output.geometry.values), shapely.get_y(output.geometry.values)
+            steg = [
+                ('qd_soner', lambda: qd_soner(oesting, nording, NEI)),
+                ('bygg kald', kald),
+                ('bygg varm', lambda: get_matrikkel_data(sone_bbox(oesting, nording, QD_syk))),
+                ('veier', lambda: get_veg_data(sone_bbox(oesting, nording, QD_vei))),
+                ('eksponering', lambda: eksponerte_bygg(matrikkel, anlegg, NEI)),
+                ('sonestatistikk', lambda: sonestatistikk(output, veg_data, oesting, nording, NEI)),
+                ('kart', lambda: kart(output)),
+                ('amrisk', lambda: ''.join(iter_exposed_objects(x, y, output['Navn']))),
+            ]
+            for navn, func in steg:
+                resultat, t, MB = _maal(func, repeat)
+                resultater[f'{navn} {etikett}'] = {'s': round(t, 4), 'MB': round(MB, 2)}
+                print(f"{navn:>14} {etikett:>12} {t:>9.4f} {MB:>8.1f} {len(resultat):>8}")
+    return resultater
+
+
+def check_regressions(resultater, baseline, threshold=0.25, min_s=0.01, min_MB=1.0):
+    """Målinger som er mer enn threshold (andel) dårligere enn baseline. Forskjeller under
+    min_s sekunder eller min_MB MB regnes som støy. Returnerer en liste med beskrivelser."""
+    regresjoner = []
+    for navn, maaling in resultater.items():
+        if navn not in baseline:
+            continue
+        for felt, grense in (('s', min_s), ('MB', min_MB)):
+            ny, gammel = maaling[felt], baseline[navn][felt]
+            if ny > gammel * (1 + threshold) and ny - gammel > grense:
+                regresjoner.append(f"{navn}: {felt} {gammel:g} -> {ny:g} (+{(ny / gammel - 1) * 100 if gammel else np.inf:.0f} %)")
+    return regresjoner
+
+
+BENCHMARKS = {
+    'pressure': bench_incident_pressure,
+    'inverse': bench_distance_for_pressure,
+    'roadjoin': bench_road_join,
+    'map': bench_map,
+    'amrisk': bench_amrisk,
+    'whatif': bench_whatif,
+    'soner': bench_soner,
+    'gml': bench_gml,
+    'pipeline': bench_pipeline,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ytelsestester for tangos.")
+    parser.add_argument('navn', nargs='*', help=f"hvilke tester, blant {', '.join(BENCHMARKS)} (standard alle)")
+    parser.add_argument('--sizes', type=int, nargs='+', help="størrelser i stedet for testenes standard")
+    parser.add_argument('--fixtures', help="mappe med innspilte svar for pipeline og gml (se bench_fixtures.py)")
+    parser.add_argument('--repeat', type=int, default=3, help="antall kjøringer per steg i pipeline")
+    parser.add_argument('--save-baseline', help="lagre målingene fra pipeline som baseline (JSON)")
+    parser.add_argument('--check', help="sammenlign målingene fra pipeline med en baseline (JSON)")
+    parser.add_argument('--threshold', type=float, default=0.25, help="tillatt forverring som andel, standard 0.25")
+    args = parser.parse_args(argv)
+    for name in args.navn:
+        if name not in BENCHMARKS:
+            parser.error(f"ukjent test {name}")
+
+    resultater = {}
+    for name in args.navn or BENCHMARKS:
+        kwargs = {'sizes': args.sizes} if args.sizes else {}
+        if name in ('pipeline', 'gml'):
+            kwargs['fixtures'] = args.fixtures
+        if name == 'pipeline':
+            kwargs['repeat'] = args.repeat
+        resultater.update(BENCHMARKS[name](**kwargs) or {})
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(resultater, f, indent=1, ensure_ascii=False)
+        print(f"Baseline lagret i {args.save_baseline}")
+    if args.check:
+        with open(args.check, encoding='utf-8') as f:
+            regresjoner = check_regressions(resultater, json.load(f), args.threshold)
+        for regresjon in regresjoner:
+            print("REGRESJON", regresjon, file=sys.stderr)
+        if regresjoner:
+            return 1
+        print(f"Ingen regresjoner over {args.threshold:.0%} mot {args.check}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,6 +5,14 @@ Created on Tue Aug 12 10:40:10 2025
 @author: KRHE
 """
 import numpy as np
+import pandas as pd
+
+# Kingery–Bulmash coefficient bands (Swisdak, 1994): upper Z limit, (A, B, C, D, E)
+KB_BANDS = (
+    (2.9, (7.2106, -2.1069, -0.3229, 0.1117, 0.0685)),
+    (23.8, (7.5938, -3.0523, 0.40977, 0.0261, -0.01267)),
+    (np.inf, (6.0536, -1.4066, 0, 0, 0)),
+)
 
 def incident_pressure(D,NEI):
     """
@@ -38,4 +46,95 @@ def incident_pressure(D,NEI):
         Cz = 0
         Dz = 0
         Ez = 0
-    return (np.exp(Az+Bz*np.log(Z) + Cz * (np.log(Z))**2+ Dz * (np.log(Z))**3+ Ez * (np.log(Z))**4))
\ No newline at end of file
+    return (np.exp(Az+Bz*np.log(Z) + Cz * (np.log(Z))**2+ Dz * (np.log(Z))**3+ Ez * (np.log(Z))**4))
+
+def incident_pressure_array(D, NEI):
+    """
+    Vectorized incident_pressure for many distances (and/or charges) at once.
+    Args:
+      D   : distance(s) (m), scalar, array or pandas Series
+      NEI : net explosive content(s) (kg TNT eq), scalar or broadcastable to D
+    Returns:
+      pressure in kPa as ndarray, or as Series with D's index if D is a Series.
+      np.nan element-wise where inputs are invalid (None, NaN, <= 0).
+      Agrees with incident_pressure to floating point rounding (~1e-15 relative).
+    """
+    index = D.index if isinstance(D, pd.Series) else None
+    D = np.asarray(D, dtype=float)
+    NEI = np.asarray(np.nan if NEI is None else NEI, dtype=float)
+    D, NEI = np.broadcast_arrays(D, NEI)
+
+    valid = (D > 0) & (NEI > 0)
+    Z = np.full(D.shape, np.nan)
+    Z[valid] = D[valid] / NEI[valid] ** (1/3)  # scaled distance
+    lnZ = np.log(Z, where=valid, out=np.full(D.shape, np.nan))
+
+    P = np.full(D.shape, np.nan)
+    lower = 0.0
+    for upper, (Az, Bz, Cz, Dz, Ez) in KB_BANDS:
+        band = valid & (Z > lower) & (Z <= upper)
+        L = lnZ[band]
+        P[band] = np.exp(Az + Bz*L + Cz * L**2 + Dz * L**3 + Ez * L**4)
+        lower = upper
+
+    if index is not None:
+        return pd.Series(P, index=index)
+    return P
+
+# Lookup table ln P -> ln Z for the start guess in distance_for_pressure. Where the
+# bands meet, P(Z) is not monotone (small jump up at Z=23.8), so the table holds the
+# running max from the far end: the outermost Z at which P(Z) >= P.
+_LN_Z_TABLE = np.linspace(np.log(0.05), np.log(1e5), 4096)
+_LN_P_TABLE = np.log(incident_pressure_array(np.exp(_LN_Z_TABLE), 1.0))
+_LN_P_TABLE = np.maximum.accumulate(_LN_P_TABLE[::-1])
+_LN_Z_TABLE = _LN_Z_TABLE[::-1]
+
+def distance_for_pressure(P, NEI, newton_steps=3):
+    """
+    Inverse of incident_pressure: distance (m) at which the incident overpressure
+    has fallen to P. Where the banded model is not monotone, the outermost such
+    distance is returned.
+    Args:
+      P   : incident overpressure(s) (kPa), scalar, array or pandas Series
+      NEI : net explosive content(s) (kg TNT eq), scalar or broadcastable to P
+      newton_steps : Newton iterations on the band polynomial after the table lookup
+    Returns:
+      distance in m as ndarray, or as Series with P's index if P is a Series.
+      np.nan element-wise where inputs are invalid or P is above the table range
+      (Z < 0.05 m/kg^1/3).
+    """
+    index = P.index if isinstance(P, pd.Series) else None
+    P = np.asarray(P, dtype=float)
+    NEI = np.asarray(np.nan if NEI is None else NEI, dtype=float)
+    P, NEI = np.broadcast_arrays(P, NEI)
+    shape = P.shape
+    P, NEI = P.ravel(), NEI.ravel()
+
+    valid = (P > 0) & (NEI > 0)
+    lnP = np.log(P, where=valid, out=np.full(P.shape, np.nan))
+    valid &= lnP <= _LN_P_TABLE[-1]
+
+    L0 = np.interp(lnP, _LN_P_TABLE, _LN_Z_TABLE)  # startverdi fra tabellen
+    L = np.full(P.shape, np.nan)
+    todo = valid.copy()
+    lower_edges = [0.0] + [upper for upper, _ in KB_BANDS[:-1]]
+    # fra ytterste bånd og innover: første bånd som har trykk >= P på nedre kant
+    for lower, (upper, (Az, Bz, Cz, Dz, Ez)) in reversed(list(zip(lower_edges, KB_BANDS))):
+        lo = np.log(lower) if lower > 0 else -np.inf
+        if lower > 0:
+            band = todo & (lnP <= Az + Bz*lo + Cz * lo**2 + Dz * lo**3 + Ez * lo**4)
+        else:
+            band = todo
+        Lb = np.clip(L0[band], lo, np.log(upper))
+        for _ in range(newton_steps):
+            g = Az + Bz*Lb + Cz * Lb**2 + Dz * Lb**3 + Ez * Lb**4 - lnP[band]
+            dg = Bz + 2*Cz*Lb + 3*Dz * Lb**2 + 4*Ez * Lb**3
+            Lb = np.clip(Lb - g / dg, lo, np.log(upper))
+        L[band] = Lb
+        todo &= ~band
+
+    D = (np.exp(L) * np.where(valid, NEI, np.nan) ** (1/3)).reshape(shape)
+
+    if index is not None:
+        return pd.Series(D, index=index)
+    return D
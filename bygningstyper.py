@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Kodeliste for bygningstype, lastet én gang per prosess fra bygningstype.csv som følger
+med i repoet. Oppslag kode -> navn og kode -> kategori (første siffer) gjøres vektorisert
+med heltallsindekserte tabeller i stedet for merge og str.startswith.
+
+Kjør `python bygningstyper.py` for å hente en oppdatert kodeliste fra GitHub til den
+lokale cachen. Den brukes da foran filen i repoet.
+"""
+
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+import http_fetch
+from tile_cache import CACHE_DIR
+
+BYGNINGSTYPE_URL = 'https://raw.githubusercontent.com/Freeyolo/tangos/main/bygningstype.csv'
+BUNDLED_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bygningstype.csv')
+REFRESHED_CSV = os.path.join(CACHE_DIR, 'bygningstype.csv')
+
+# kategori = første siffer i bygningstypekoden
+KATEGORIER = {
+    1: 'Boliger',
+    2: 'Industri/lager',
+    3: 'Kontor/forretning',
+    4: 'Samferdsel',
+    5: 'Hotell/restaurant',
+    6: 'Skole/bhg/idrett',
+    7: 'Helse',
+    8: 'Brann/politi',
+    9: 'Annet',
+}
+
+_navn = None
+_lock = threading.Lock()
+
+
+def read_csv(path):
+    """Leser kodelisten (Navn, Kodeverdi) fra en CSV i Geonorge-formatet."""
+    return pd.read_csv(path, index_col=False, sep=';', usecols=['Navn', 'Kodeverdi'], encoding='utf8')
+
+
+def _load():
+    """Tabell kode -> navn som numpy-array med 1000 plasser (tre-sifrede koder)."""
+    kodeliste = None
+    if os.path.exists(REFRESHED_CSV):
+        try:
+            kodeliste = read_csv(REFRESHED_CSV)
+        except (OSError, ValueError) as err:
+            print("Kunne ikke lese oppdatert kodeliste, bruker filen i repoet:", err)
+    if kodeliste is None:
+        kodeliste = read_csv(BUNDLED_CSV)
+    navn = np.full(1000, None, dtype=object)
+    koder = pd.to_numeric(kodeliste['Kodeverdi'], errors='coerce')
+    gyldig = koder.between(0, 999)
+    navn[koder[gyldig].astype(int).to_numpy()] = kodeliste.loc[gyldig, 'Navn'].to_numpy()
+    return navn
+
+
+def _tabell():
+    global _navn
+    with _lock:
+        if _navn is None:
+            _navn = _load()
+        return _navn
+
+
+def _koder(bygningstype):
+    """Bygningstypekoder som heltall; ukjente og ugyldige blir -1."""
+    koder = pd.to_numeric(pd.Series(np.asarray(bygningstype)), errors='coerce').to_numpy(dtype=float)
+    gyldig = (koder >= 0) & (koder <= 999)
+    return np.where(gyldig, np.nan_to_num(koder), -1).astype(int)
+
+
+def navn(bygningstype):
+    """Lesbart navn for hver kode (None for ukjente koder)."""
+    koder = _koder(bygningstype)
+    return np.where(koder >= 0, _tabell()[koder], None)
+
+
+def kategori(bygningstype):
+    """Kategori (1-9, første siffer i koden) for hver kode, 0 for ukjente koder."""
+    koder = _koder(bygningstype)
+    return np.where(koder >= 100, koder // 100, 0)
+
+
+def kategori_navn(bygningstype):
+    """Kategorinavn for hver kode som pandas Categorical."""
+    return pd.Categorical.from_codes(kategori(bygningstype) - 1, categories=list(KATEGORIER.values()))
+
+
+def refresh(url=BYGNINGSTYPE_URL):
+    """Henter kodelisten på nytt og lagrer den i cachen. Ved feil beholdes gjeldende liste."""
+    global _navn
+    try:
+        response = http_fetch.get(url)
+        response.raise_for_status()
+        os.makedirs(os.path.dirname(REFRESHED_CSV), exist_ok=True)
+        with open(REFRESHED_CSV + '.tmp', 'wb') as f:
+            f.write(response.content)
+        read_csv(REFRESHED_CSV + '.tmp')  # sjekk at filen kan leses før den tas i bruk
+        os.replace(REFRESHED_CSV + '.tmp', REFRESHED_CSV)
+    except Exception as err:
+        print("Kunne ikke oppdatere kodelisten for bygningstype:", err)
+        return False
+    with _lock:
+        _navn = None
+    return True
+
+
+if __name__ == '__main__':
+    refresh()
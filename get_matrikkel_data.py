@@ -5,17 +5,26 @@ Created on Tue Aug 12 09:59:03 2025
 @author: KRHE
 """
 
+import os
 import requests
+import http_fetch
+import snapshot
 import geopandas as gpd
 from io import BytesIO
+from tile_cache import TileCache
+from wfs_gml import read_points, antall_returnert
+from instrumentering import instrumentert, steg
 
-def get_matrikkel_data(row):
-    """Denne funksjonen bruker Kartverkets API til å finne alle bygninger innenfor en bounding box."""
-    wfs_url = "https://wfs.geonorge.no/skwms1/wfs.matrikkelen-bygningspunkt?"
+WFS_URL = os.environ.get('TANGOS_WFS_URL', "https://wfs.geonorge.no/skwms1/wfs.matrikkelen-bygningspunkt?")
+GML_PARSER = os.environ.get('TANGOS_GML_PARSER', 'iterparse')  # 'gdal' leser hele svaret med gpd.read_file
+KOLONNER = ('bygningstype',)  # felt som leses i tillegg til gml_id og punktet
 
-    minx, miny, maxx, maxy = row['minx'], row['miny'], row['maxx'], row['maxy']
-    bbox_str = f'{minx},{miny},{maxx},{maxy},EPSG:32633'
+_matrikkel_cache = None
 
+@instrumentert()
+def fetch_matrikkel_bbox(minx, miny, maxx, maxy, columns=KOLONNER):
+    """Henter alle bygningspunkt innenfor en bbox direkte fra WFS, med feltene i columns.
+    Kaster exception ved feil."""
     params = {
         'service': 'WFS',
         'version': '2.0.0',
@@ -23,12 +32,52 @@ def get_matrikkel_data(row):
         'typename': 'app:Bygning',
         'srsname': 'EPSG:32633',
         'outputformat': 'application/gml+xml; version=3.2',
-        'bbox': bbox_str,
+        'bbox': f'{minx},{miny},{maxx},{maxy},EPSG:32633',
     }
+    response = http_fetch.get(WFS_URL, params=params)
+    response.raise_for_status()
+    with steg('les GML') as innslag:
+        if GML_PARSER != 'gdal':
+            gdf = read_points(response.content, columns)
+        elif antall_returnert(response.content) == 0:  # GDAL finner ikke noe lag i en tom FeatureCollection
+            gdf = gpd.GeoDataFrame(geometry=[], crs='EPSG:32633')
+        else:
+            gdf = gpd.read_file(BytesIO(response.content))
+        if innslag is not None:
+            innslag['objekter'] = len(gdf)
+    return gdf
+
+def matrikkel_cache():
+    """Flis-cachen for matrikkeldata, opprettes ved første bruk."""
+    global _matrikkel_cache
+    if _matrikkel_cache is None:
+        _matrikkel_cache = TileCache('matrikkel', fetch_matrikkel_bbox, id_column='gml_id')
+    return _matrikkel_cache
+
+@instrumentert()
+def get_matrikkel_data(row, use_cache=True, henter=None, kast_feil=False):
+    """Denne funksjonen bruker Kartverkets API til å finne alle bygninger innenfor en bounding box.
+    Med use_cache hentes bare fliser som ikke allerede ligger i den lokale cachen, ellers
+    deles bboxen i delfliser som hentes parallelt. Med en henter (inkrementell.InkrementellHenting)
+    brukes den, og bare det som ikke er hentet fra før hentes. I offline-modus (TANGOS_SNAPSHOT)
+    leses bygningene fra snapshotet i stedet. Feil skrives ut og gir en tom tabell, med
+    kast_feil kastes de videre (batch skal ikke lagre et sted som ikke ble hentet)."""
+    minx, miny, maxx, maxy = row['minx'], row['miny'], row['maxx'], row['maxy']
 
+    def hent():
+        if snapshot.aktiv():
+            return snapshot.fetch_matrikkel_bbox(minx, miny, maxx, maxy)
+        if henter is not None:
+            return henter.get_bbox(minx, miny, maxx, maxy)
+        if use_cache:
+            return matrikkel_cache().get_bbox(minx, miny, maxx, maxy)
+        frames = http_fetch.map_concurrent(fetch_matrikkel_bbox, http_fetch.split_bbox(minx, miny, maxx, maxy))
+        return http_fetch.merge_frames(frames, id_column='gml_id')
+
+    if kast_feil:
+        return hent()
     try:
-        response = requests.get(wfs_url, params=params)
-        response.raise_for_status()
+        return hent()
     except requests.exceptions.HTTPError as errh:
         print("HTTP Error:", errh)
         return gpd.GeoDataFrame()
@@ -41,10 +90,6 @@ def get_matrikkel_data(row):
     except requests.exceptions.RequestException as err:
         print("Error:", err)
         return gpd.GeoDataFrame()
-
-    try:
-        matrikkel_data = gpd.read_file(BytesIO(response.content))
-        return matrikkel_data
     except ValueError as ve:
         print(f"ValueError: {ve}")
         return gpd.GeoDataFrame()
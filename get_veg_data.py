@@ -5,97 +5,214 @@ Created on Tue Aug 12 09:52:32 2025
 @author: KRHE
 """
 
+import os
 import requests
+import shapely
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-from shapely import wkt
+from concurrent.futures import ThreadPoolExecutor
+import http_fetch
+import snapshot
+from instrumentering import instrumentert, i_kontekst
 
-def get_veg_data(row):
-    """Denne funksjonen bruker SVV NVDB API til å finne alle veier, ÅDT og hastighet innenfor en bounding box
-    https://nvdb-docs.atlas.vegvesen.no/"""
-    nvdburl = 'https://nvdbapiles.atlas.vegvesen.no/vegobjekter/540'  # 540 er ÅDT
-    fartsurl = 'https://nvdbapiles.atlas.vegvesen.no/vegobjekter/105'  # 105 = Fartsgrense
+NVDB_URL = os.environ.get('TANGOS_NVDB_URL', 'https://nvdbapiles.atlas.vegvesen.no')
+PAGE_SIZE = int(os.environ.get('TANGOS_NVDB_PAGE_SIZE', 1000))  # objekter per side fra NVDB
 
-    minx, miny, maxx, maxy = row['minx'], row['miny'], row['maxx'], row['maxy']
+HEADERS = {
+    'accept': 'application/json',
+    'X-Client': 'Utdrag ÅDT',
+    'X-Client-Session': '402b9aee-16f9-e38d-2ce7-cd6bc20eb3e3'
+}
 
-    headers = {
-        'accept': 'application/json',
-        'X-Client': 'Utdrag ÅDT',
-        'X-Client-Session': '402b9aee-16f9-e38d-2ce7-cd6bc20eb3e3'
-    }
+def iter_vegobjekter(url, minx, miny, maxx, maxy, antall=PAGE_SIZE):
+    """Generator over sider med vegobjekter av én type innenfor en bbox fra NVDB.
+    Følger metadata.neste til siste side, slik at bare én side ligger i minnet om gangen.
+    Kaster exception ved feil."""
     params = {
         'srid': '5973',
         'inkluder': 'alle',
         'segmentering': 'true',
         'kartutsnitt': f'{minx},{miny},{maxx},{maxy}',
+        'antall': antall,
     }
+    while True:
+        response = http_fetch.get(url, params=params, headers=HEADERS)
+        response.raise_for_status()
+        side = response.json()
+        objekter = side.get('objekter', [])
+        if objekter:
+            yield objekter
+
+        metadata = side.get('metadata', {})
+        neste = metadata.get('neste')
+        if not objekter or not neste or metadata.get('returnert', len(objekter)) < metadata.get('sidestørrelse', antall):
+            return
+        params = {**params, 'start': neste['start']}
+
+def _egenskaper(objekter, egenskap_ids):
+    """Plukker ut verdiene for gitte egenskap-id-er, én liste per id."""
+    kolonner = {egenskap_id: [None] * len(objekter) for egenskap_id in egenskap_ids}
+    for i, obj in enumerate(objekter):
+        for egenskap in obj.get('egenskaper', []):
+            if egenskap['id'] in kolonner:
+                kolonner[egenskap['id']][i] = egenskap.get('verdi')
+    return kolonner
+
+def _geometri(objekter):
+    """Bygger geometrier for en hel side på én gang med shapely.from_wkt."""
+    return shapely.from_wkt([obj.get('geometri', {}).get('wkt') for obj in objekter])
+
+def _stedfestinger(objekter):
+    """Lineære stedfestinger (veglenkesekvensid, startposisjon, sluttposisjon) per objekt."""
+    return [[(s['veglenkesekvensid'], s['startposisjon'], s['sluttposisjon'])
+             for s in obj.get('lokasjon', {}).get('stedfestinger', []) if 'startposisjon' in s]
+            for obj in objekter]
+
+def adt_batch(objekter):
+    """Én side med ÅDT-objekter (540) som DataFrame."""
+    egenskaper = _egenskaper(objekter, (4621, 4623, 4625))
+    return pd.DataFrame({
+        'Vegobj_id': [obj['id'] for obj in objekter],
+        'ÅDT_år': egenskaper[4621],
+        'ÅDT_total': egenskaper[4623],
+        'ÅDT_grunnlag': egenskaper[4625],
+        'Stedfesting': _stedfestinger(objekter),
+        'geometry': _geometri(objekter),
+    })
+
+def fart_batch(objekter):
+    """Én side med fartsgrenseobjekter (105) som DataFrame. Objekter uten geometri
+    eller fartsgrense utelates."""
+    batch = pd.DataFrame({
+        'Vegobj_id': [obj['id'] for obj in objekter],
+        'Fartsgrense': _egenskaper(objekter, (2021,))[2021],
+        'Stedfesting': _stedfestinger(objekter),
+        'geometry': _geometri(objekter),
+    })
+    return batch[batch['geometry'].notna() & batch['Fartsgrense'].notna()]
+
+def iter_vegdata(url, parse_batch, minx, miny, maxx, maxy):
+    """Generator over ferdig parsede batcher (DataFrame) for én bbox."""
+    for objekter in iter_vegobjekter(url, minx, miny, maxx, maxy):
+        yield parse_batch(objekter)
+
+def fetch_vegdata_bbox(url, parse_batch, minx, miny, maxx, maxy):
+    """Henter delfliser av bboxen parallelt, side for side. Objekter som krysser flisgrenser
+    kommer med i flere fliser, og slås sammen på vegobjekt-id."""
+    boxes = http_fetch.split_bbox(minx, miny, maxx, maxy)
+    results = http_fetch.map_concurrent(lambda *box: list(iter_vegdata(url, parse_batch, *box)), boxes)
+    batches = [batch for batcher in results for batch in batcher]
+    if not batches:
+        return pd.DataFrame()
+    return pd.concat(batches, ignore_index=True).drop_duplicates(subset='Vegobj_id', ignore_index=True)
+
+def _stedfesting_tabell(stedfestinger):
+    """Flater ut en kolonne med stedfestinger til én rad per (objekt, veglenkesekvens)."""
+    rader = [(i, *s) for i, liste in enumerate(stedfestinger) for s in liste]
+    return pd.DataFrame(rader, columns=['idx', 'veglenkesekvensid', 'start', 'slutt'])
+
+@instrumentert()
+def join_fartsgrense(veg, fart):
+    """Kobler fartsgrense på ÅDT-segmentene, én rad per ÅDT-segment.
+
+    Kandidatpar finnes med et STRtree over fartsgrensegeometriene. Par der begge har
+    lineær stedfesting godtas bare hvis de ligger på samme veglenkesekvens med
+    overlappende posisjoner, slik at kryssende veier og segmenter som bare møtes i
+    et endepunkt ikke kobles. Mangler stedfesting brukes felles lengde i geometrien.
+    Fartsgrense blir den høyeste grensen langs segmentet, Fartsgrenser alle grensene."""
+    veg = veg.reset_index(drop=True)
+    fart = fart.reset_index(drop=True)
+    tree = shapely.STRtree(fart.geometry.values)
+    a, f = tree.query(veg.geometry.values, predicate='intersects')
+    par = pd.DataFrame({'a': a, 'f': f})
+
+    adt_sted = _stedfesting_tabell(veg['Stedfesting'])
+    fart_sted = _stedfesting_tabell(fart['Stedfesting'])
+    lineær = (par.merge(adt_sted, left_on='a', right_on='idx')
+                 .merge(fart_sted, left_on=['f', 'veglenkesekvensid'], right_on=['idx', 'veglenkesekvensid'],
+                        suffixes=('_a', '_f')))
+    overlapp = np.minimum(lineær['slutt_a'], lineær['slutt_f']) > np.maximum(lineær['start_a'], lineær['start_f'])
+    treff = [lineær.loc[overlapp, ['a', 'f']]]
+
+    uten_sted = par[~(np.isin(par['a'], adt_sted['idx']) & np.isin(par['f'], fart_sted['idx']))]
+    if not uten_sted.empty:
+        felles = shapely.length(shapely.intersection(veg.geometry.values[uten_sted['a']],
+                                                     fart.geometry.values[uten_sted['f']]))
+        treff.append(uten_sted[felles > 0])
+
+    treff = pd.concat(treff).drop_duplicates()
+    if treff.empty:  # ingen fartsgrense langs noen av segmentene
+        veg['Fartsgrense'] = None
+        veg['Fartsgrenser'] = None
+        return veg
+    treff['Fartsgrense'] = fart['Fartsgrense'].to_numpy()[treff['f']]
+    treff = treff.drop_duplicates(subset=['a', 'Fartsgrense']).sort_values(['a', 'Fartsgrense'])
+
+    # sortert på (segment, fartsgrense): siste rad per segment er høyeste grense
+    a = treff['a'].to_numpy()
+    grenser = treff['Fartsgrense'].astype(str).to_numpy()
+    start = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+    slutt = np.r_[start[1:], len(a)]
+    veg['Fartsgrense'] = pd.Series(treff['Fartsgrense'].to_numpy()[slutt - 1], index=a[start])
+    veg['Fartsgrenser'] = pd.Series(['/'.join(grenser[i:j]) for i, j in zip(start, slutt)], index=a[start], dtype=object)
+    return veg
+
+@instrumentert()
+def fetch_adt_bbox(minx, miny, maxx, maxy):
+    """ÅDT-segmenter innenfor en bbox. Kaster exception ved feil."""
+    return fetch_vegdata_bbox(f'{NVDB_URL}/vegobjekter/540', adt_batch, minx, miny, maxx, maxy)  # 540 er ÅDT
+
+@instrumentert()
+def fetch_fart_bbox(minx, miny, maxx, maxy):
+    """Fartsgrenser innenfor en bbox. Kaster exception ved feil."""
+    return fetch_vegdata_bbox(f'{NVDB_URL}/vegobjekter/105', fart_batch, minx, miny, maxx, maxy)  # 105 = Fartsgrense
+
+@instrumentert()
+def get_veg_data(row, hentere=None, kast_feil=False):
+    """Denne funksjonen bruker SVV NVDB API til å finne alle veier, ÅDT og hastighet innenfor en bounding box
+    https://nvdb-docs.atlas.vegvesen.no/
+    hentere er et valgfritt par (ÅDT, fartsgrense) av inkrementell.InkrementellHenting, som da
+    bare henter det som ikke er hentet fra før. I offline-modus (TANGOS_SNAPSHOT) leses begge fra snapshotet.
+    Feil skrives ut (uten ÅDT gis en tom tabell, uten fartsgrenser veiene uten fart); med kast_feil kastes de videre."""
+    bbox = row['minx'], row['miny'], row['maxx'], row['maxy']
+    if snapshot.aktiv():
+        fetch_adt, fetch_fart = snapshot.fetch_adt_bbox, snapshot.fetch_fart_bbox
+    elif hentere:
+        fetch_adt, fetch_fart = (henter.get_bbox for henter in hentere)
+    else:
+        fetch_adt, fetch_fart = fetch_adt_bbox, fetch_fart_bbox
+
+    # ÅDT og fartsgrense hentes samtidig
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        adt_future = pool.submit(i_kontekst(fetch_adt, *bbox))
+        fart_future = pool.submit(i_kontekst(fetch_fart, *bbox))
 
     try:
-        response = requests.get(nvdburl, params=params, headers=headers)
-        response.raise_for_status()
-        jsonResponse = response.json()
-        if 'objekter' not in jsonResponse:
-            return gpd.GeoDataFrame()
+        vegdata = adt_future.result()
     except (requests.exceptions.RequestException, ValueError) as err:
+        if kast_feil:
+            raise
         print("Error:", err)
         return gpd.GeoDataFrame()
 
-    vegdata_list = []
-    for vegobjekt in jsonResponse['objekter']:
-        vegdata_dict = {'Vegobj_id': vegobjekt['id']}
-        if 'geometri' in vegobjekt and 'wkt' in vegobjekt['geometri']:
-            vegdata_dict['geometry'] = vegobjekt['geometri']['wkt']
-        for egenskap in vegobjekt['egenskaper']:
-            if egenskap['id'] == 4621:
-                vegdata_dict['ÅDT_år'] = egenskap['verdi']
-            if egenskap['id'] == 4623:
-                vegdata_dict['ÅDT_total'] = egenskap['verdi']
-            if egenskap['id'] == 4625:
-                vegdata_dict['ÅDT_grunnlag'] = egenskap['verdi']
-        vegdata_list.append(vegdata_dict)
-
-    vegdata = pd.DataFrame(vegdata_list)
     if vegdata.empty:
         return gpd.GeoDataFrame()
 
-    if 'geometry' in vegdata:
-        vegdata['geometry'] = vegdata['geometry'].apply(wkt.loads)
     geo_veg_data = gpd.GeoDataFrame(vegdata, geometry='geometry', crs="EPSG:5973")
 
     try:
-        fart_response = requests.get(fartsurl, params=params, headers=headers)
-        fart_response.raise_for_status()
-        fart_json = fart_response.json()
-        if 'objekter' not in fart_json:
-            geo_veg_data['Fartsgrense'] = None
-            return geo_veg_data
+        fart_df = fart_future.result()
     except Exception as err:
+        if kast_feil:
+            raise
         print("Error fetching speed limits:", err)
         geo_veg_data['Fartsgrense'] = None
-        return geo_veg_data
-
-    fart_list = []
-    for obj in fart_json['objekter']:
-        fart_dict = {}
-        if 'geometri' in obj and 'wkt' in obj['geometri']:
-            fart_dict['geometry'] = obj['geometri']['wkt']
-        for egenskap in obj['egenskaper']:
-            if egenskap['id'] == 2021:
-                fart_dict['Fartsgrense'] = egenskap['verdi']
-        if 'geometry' in fart_dict and 'Fartsgrense' in fart_dict:
-            fart_list.append(fart_dict)
-
-    fart_df = pd.DataFrame(fart_list)
+        return geo_veg_data.drop(columns='Stedfesting')
+
     if fart_df.empty:
         geo_veg_data['Fartsgrense'] = None
-        return geo_veg_data
-
-    fart_df['geometry'] = fart_df['geometry'].apply(wkt.loads)
-    geo_fart = gpd.GeoDataFrame(fart_df, geometry='geometry', crs="EPSG:5973")
+        return geo_veg_data.drop(columns='Stedfesting')
 
-    geo_veg_data = gpd.overlay(
-        geo_veg_data,
-        geo_fart[['geometry', 'Fartsgrense']],
-        how='intersection'
-    )
-    return geo_veg_data
+    geo_veg_data = join_fartsgrense(geo_veg_data, gpd.GeoDataFrame(fart_df, geometry='geometry', crs="EPSG:5973"))
+    return geo_veg_data.drop(columns='Stedfesting')
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Felles hentelag for WFS- og NVDB-kall: én delt requests.Session med keep-alive,
+timeout og retry med eksponentiell backoff, begrenset antall samtidige kall per
+vert, og oppdeling av store bounding bokser i delfliser som hentes parallelt.
+"""
+
+import os
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+import pandas as pd
+import geopandas as gpd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instrumentering import registrer_bytes, i_kontekst
+
+TIMEOUT = (float(os.environ.get('TANGOS_CONNECT_TIMEOUT', 5)), float(os.environ.get('TANGOS_READ_TIMEOUT', 60)))
+MAX_WORKERS = int(os.environ.get('TANGOS_MAX_WORKERS', 8))
+PER_HOST_LIMIT = int(os.environ.get('TANGOS_PER_HOST_LIMIT', 4))
+RETRIES = int(os.environ.get('TANGOS_RETRIES', 3))
+SUBTILE_SIZE = float(os.environ.get('TANGOS_SUBTILE_SIZE', 1000))  # meter
+
+_session = None
+_session_lock = threading.Lock()
+_host_limits = {}
+
+
+def session():
+    """Delt Session med tilkoblingspool og retry (429/5xx, backoff 0.5, 1, 2 s ...)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=RETRIES, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=frozenset({'GET'}), raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(PER_HOST_LIMIT, MAX_WORKERS), max_retries=retry)
+            _session = requests.Session()
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def _host_limit(url):
+    host = urlparse(url).netloc
+    with _session_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return _host_limits[host]
+
+
+def get(url, params=None, headers=None, timeout=TIMEOUT):
+    """GET via den delte sesjonen, maks PER_HOST_LIMIT samtidige kall mot samme vert.
+    Størrelsen på svaret registreres i en eventuell måling (se instrumentering)."""
+    with _host_limit(url):
+        response = session().get(url, params=params, headers=headers, timeout=timeout)
+    registrer_bytes(len(response.content))
+    return response
+
+
+def split_bbox(minx, miny, maxx, maxy, size=SUBTILE_SIZE):
+    """Deler en bbox i delbokser på maks size x size meter."""
+    nx = max(1, math.ceil((maxx - minx) / size))
+    ny = max(1, math.ceil((maxy - miny) / size))
+    dx = (maxx - minx) / nx
+    dy = (maxy - miny) / ny
+    return [(minx + i * dx, miny + j * dy, minx + (i + 1) * dx, miny + (j + 1) * dy)
+            for i in range(nx) for j in range(ny)]
+
+
+def map_concurrent(func, items, max_workers=MAX_WORKERS):
+    """Kaller func(*item) for hvert item i en trådpool. Returnerer resultatene i samme
+    rekkefølge; første exception kastes videre. Trådene arver konteksten (målingen) til kalleren."""
+    items = list(items)
+    if len(items) <= 1:
+        return [func(*item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        futures = [pool.submit(i_kontekst(func, *item)) for item in items]
+        return [future.result() for future in futures]
+
+
+def merge_frames(frames, id_column=None, crs=None):
+    """Slår sammen GeoDataFrames fra delfliser og fjerner duplikater langs flisgrensene."""
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return gpd.GeoDataFrame()
+    gdf = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), geometry='geometry', crs=crs or frames[0].crs)
+    if id_column in gdf:
+        gdf = gdf.drop_duplicates(subset=id_column, ignore_index=True)
+    return gdf
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Inkrementell henting når samme bruker flytter anlegget litt eller øker NEI: området som
+allerede er hentet holdes som en geometri sammen med dataene for det. For en ny bbox
+hentes bare stripene som ikke er dekket (mengdedifferansen, delt i rektangler), og de
+slås sammen med dataene fra før uten duplikater.
+"""
+
+import threading
+
+import numpy as np
+import shapely
+
+from http_fetch import map_concurrent, merge_frames
+
+MAKS_FAKTOR = 4  # dekket område kan være så mange ganger større enn siste bbox før det nullstilles
+MIN_STRIPE = 0.01  # meter, smalere striper er avrundingsstøy og hentes ikke
+
+
+def rektangler(omrade, min_stripe=MIN_STRIPE):
+    """Deler et rettvinklet område (f.eks. differansen mellom to bokser) i akseparallelle
+    rektangler (minx, miny, maxx, maxy): rutenettet av alle x- og y-kanter, cellene som
+    ligger i området, slått sammen til striper langs x og deretter langs y."""
+    if omrade.is_empty:
+        return []
+    koordinater = shapely.get_coordinates(omrade)
+    xs, ys = np.unique(koordinater[:, 0]), np.unique(koordinater[:, 1])
+    midt_x, midt_y = (xs[:-1] + xs[1:]) / 2, (ys[:-1] + ys[1:]) / 2
+    inni = shapely.contains_xy(omrade, midt_x[np.newaxis, :], midt_y[:, np.newaxis])
+
+    apne, ferdige = {}, []  # apne: (x0, x1) -> [minx, miny, maxx, maxy] som kan forlenges oppover
+    for j in range(len(midt_y)):
+        kanter = np.flatnonzero(np.diff(np.r_[0, inni[j].astype(np.int8), 0]))
+        rad = {}
+        for a, b in zip(kanter[::2], kanter[1::2]):
+            rekt = apne.pop((a, b), None) or [xs[a], ys[j], xs[b], ys[j]]
+            rekt[3] = ys[j + 1]
+            rad[(a, b)] = rekt
+        ferdige.extend(apne.values())
+        apne = rad
+    ferdige.extend(apne.values())
+    return [tuple(float(v) for v in r) for r in ferdige
+            if r[2] - r[0] >= min_stripe and r[3] - r[1] >= min_stripe]
+
+
+def _innenfor(data, boks):
+    """Radene der omsluttende rektangel for geometrien overlapper boksen. Det er minst det en
+    bbox-spørring mot WFS eller kartutsnitt i NVDB gir, og objekter som bare ligger i en
+    tidligere hentet del er dermed alltid med."""
+    if data.empty:
+        return data
+    minx, miny, maxx, maxy = shapely.bounds(boks)
+    b = shapely.bounds(data['geometry'].values)
+    treff = (b[:, 2] >= minx) & (b[:, 0] <= maxx) & (b[:, 3] >= miny) & (b[:, 1] <= maxy)
+    return data[treff].reset_index(drop=True)
+
+
+class InkrementellHenting:
+    """Henting per bbox som husker hva som er hentet. fetch_bbox(minx, miny, maxx, maxy) skal
+    gi en (Geo)DataFrame med geometry og id_column, og kaste exception ved feil, slik at et
+    område aldri regnes som dekket uten data.
+
+    Flyttes bboxen helt bort fra det dekkede området, eller blir det dekkede området mer enn
+    maks_faktor ganger større enn bboxen, begynnes det på nytt med bare den nye bboxen."""
+
+    def __init__(self, fetch_bbox, id_column, crs, maks_faktor=MAKS_FAKTOR, min_stripe=MIN_STRIPE):
+        self.fetch_bbox = fetch_bbox
+        self.id_column = id_column
+        self.crs = crs
+        self.maks_faktor = maks_faktor
+        self.min_stripe = min_stripe
+        self.dekket = shapely.Polygon()
+        self.data = None
+        self.striper = []  # stripene som ble hentet ved siste kall
+        self._lock = threading.Lock()
+
+    def get_bbox(self, minx, miny, maxx, maxy):
+        """Data innenfor bboxen. Bare det som ikke er dekket fra før hentes, parallelt."""
+        boks = shapely.box(minx, miny, maxx, maxy)
+        with self._lock:
+            if self.data is None or not self.dekket.intersects(boks):
+                dekket, data = shapely.Polygon(), []
+            else:
+                dekket, data = self.dekket, [self.data]
+            striper = rektangler(boks.difference(dekket), self.min_stripe)
+            data = merge_frames(data + map_concurrent(self.fetch_bbox, striper), self.id_column, self.crs)
+            dekket = dekket.union(boks)
+            if dekket.area > self.maks_faktor * boks.area:
+                dekket, data = boks, _innenfor(data, boks)
+            self.dekket, self.data, self.striper = dekket, data, striper
+        return _innenfor(data, boks)
+
+    def hentet_andel(self, minx, miny, maxx, maxy):
+        """Andelen av bboxen som ble hentet ved siste kall."""
+        return sum((r[2] - r[0]) * (r[3] - r[1]) for r in self.striper) / ((maxx - minx) * (maxy - miny))
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Lett instrumentering av beregningsstegene: veggtid, nedlastede bytes, antall objekter og
+(valgfritt) maks minne per steg. Stegene markeres med @instrumentert eller `with steg(...)`,
+og måles bare inne i en `with kjoring(...)`, ellers koster de nesten ingenting.
+
+    with kjoring('anlegg 1') as maaling:
+        analyse_site(262000, 6649000, 1000)
+    print(maaling.to_prometheus())
+
+Målingen følger konteksten (contextvars), slik at samtidige Streamlit-økter ikke blander
+tallene. http_fetch.map_concurrent tar konteksten med inn i trådpoolen, så bytes og steg
+i parallelle hentinger havner i riktig måling. Minne måles med tracemalloc og gjør
+kjøringen merkbart tregere; tallet er Python-allokeringer, ikke minne i GDAL/GEOS.
+"""
+
+import os
+import json
+import time
+import threading
+import functools
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+_maaling = contextvars.ContextVar('tangos_maaling', default=None)
+_aapne = contextvars.ContextVar('tangos_aapne_steg', default=())
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_brukere = 0  # kjøringer med minne som er i gang; tracemalloc er felles for hele prosessen
+_tracemalloc_startet = False  # om tracemalloc ble startet her (og ikke av noen andre)
+_tracemalloc_omgang = 0  # telles opp hver gang tracemalloc startes her
+
+PROMETHEUS_FELT = {  # felt -> (metrikk, beskrivelse, hvordan gjentatte steg slås sammen)
+    'sekunder': ('steg_sekunder', 'Veggtid per steg i sekunder', 'sum'),
+    'bytes': ('steg_bytes', 'Bytes lastet ned per steg', 'sum'),
+    'objekter': ('steg_objekter', 'Antall objekter (rader) ut av steget', 'sum'),
+    'maks minne MB': ('steg_maks_minne_megabytes', 'Maks Python-minne brukt i steget (tracemalloc)', 'max'),
+}
+
+
+class Maaling:
+    """Målingene fra én kjøring, ett innslag per steg i den rekkefølgen stegene ble ferdige."""
+
+    def __init__(self, navn='kjøring', minne=False):
+        self.navn = navn
+        self.minne = minne
+        self.start = datetime.now()
+        self.steg = []
+        self._lock = threading.Lock()
+
+    def _legg_til(self, innslag):
+        with self._lock:
+            self.steg.append(innslag)
+
+    def tabell(self):
+        """Stegene som DataFrame."""
+        return pd.DataFrame(self.steg, columns=['steg', *PROMETHEUS_FELT])
+
+    def to_dict(self):
+        return {'navn': self.navn, 'start': self.start.isoformat(timespec='seconds'), 'steg': list(self.steg)}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=1)
+
+    def to_prometheus(self, prefix='tangos'):
+        """Prometheus-tekstformat, ett tall per steg (summert over gjentatte kall, maks for minne)."""
+        tabell = self.tabell()
+        linjer = []
+        for felt, (metrikk, beskrivelse, agg) in PROMETHEUS_FELT.items():
+            verdier = tabell.groupby('steg', sort=False)[felt].agg(agg).dropna()
+            if verdier.empty:
+                continue
+            linjer += [f'# HELP {prefix}_{metrikk} {beskrivelse}', f'# TYPE {prefix}_{metrikk} gauge']
+            linjer += [f'{prefix}_{metrikk}{{steg="{navn}"}} {verdi:.12g}' for navn, verdi in verdier.items()]
+        return '\n'.join(linjer) + '\n'
+
+
+def _start_tracemalloc():
+    global _tracemalloc_brukere, _tracemalloc_startet, _tracemalloc_omgang
+    with _tracemalloc_lock:
+        if _tracemalloc_brukere == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_startet = True
+            _tracemalloc_omgang += 1
+        _tracemalloc_brukere += 1
+
+
+def _stopp_tracemalloc():
+    """Stopper tracemalloc når den siste kjøringen med minne er ferdig, og bare om det ble startet her."""
+    global _tracemalloc_brukere, _tracemalloc_startet
+    with _tracemalloc_lock:
+        _tracemalloc_brukere -= 1
+        if _tracemalloc_brukere == 0 and _tracemalloc_startet:
+            tracemalloc.stop()
+            _tracemalloc_startet = False
+
+
+@contextmanager
+def kjoring(maaling='kjøring', minne=False):
+    """Måler stegene som kjøres inne i blokken. maaling er et navn eller en Maaling som
+    fortsetter å samle steg. Med minne startes tracemalloc hvis det ikke går fra før, og
+    stoppes igjen når den siste samtidige kjøringen med minne er ferdig."""
+    if isinstance(maaling, str):
+        maaling = Maaling(maaling, minne)
+    if maaling.minne:
+        _start_tracemalloc()
+    token = _maaling.set(maaling)
+    try:
+        yield maaling
+    finally:
+        _maaling.reset(token)
+        if maaling.minne:
+            _stopp_tracemalloc()
+
+
+def _oppdater_topp(aapne):
+    """Tar vare på toppen hittil for åpne steg før toppen nullstilles for et nytt steg."""
+    topp = tracemalloc.get_traced_memory()[1]
+    for innslag in aapne:
+        if '_topp' in innslag:  # steg som startet mens tracemalloc sto, måles ikke
+            innslag['_topp'] = max(innslag['_topp'], topp)
+    tracemalloc.reset_peak()
+
+
+@contextmanager
+def steg(navn):
+    """Måler ett steg. Gir innslaget (en dict) som kan få 'objekter' satt, eller None
+    utenfor en kjøring."""
+    maaling = _maaling.get()
+    if maaling is None:
+        yield None
+        return
+    innslag = {'steg': navn, 'sekunder': None, 'bytes': 0, 'objekter': None}
+    aapne = _aapne.get()
+    minne = maaling.minne and tracemalloc.is_tracing()
+    if minne:
+        _oppdater_topp(aapne)
+        innslag['_topp'] = 0
+        start_minne = tracemalloc.get_traced_memory()[0]
+        omgang = _tracemalloc_omgang
+    token = _aapne.set(aapne + (innslag,))
+    start = time.perf_counter()
+    try:
+        yield innslag
+    finally:
+        innslag['sekunder'] = round(time.perf_counter() - start, 4)
+        _aapne.reset(token)
+        if minne:
+            # ble tracemalloc stoppet (og kanskje startet igjen) underveis, er tallet ikke til å stole på
+            if tracemalloc.is_tracing() and omgang == _tracemalloc_omgang:
+                _oppdater_topp(aapne + (innslag,))
+                innslag['maks minne MB'] = round((innslag['_topp'] - start_minne) / 1e6, 2)
+            del innslag['_topp']
+        maaling._legg_til(innslag)
+
+
+def instrumentert(navn=None):
+    """Dekoratør som måler funksjonen som et steg. Returnerer den en DataFrame, telles radene."""
+    def dekorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with steg(navn or func.__name__) as innslag:
+                resultat = func(*args, **kwargs)
+                if innslag is not None and isinstance(resultat, pd.DataFrame):
+                    innslag['objekter'] = len(resultat)
+                return resultat
+        return wrapper
+    return dekorator
+
+
+def registrer_bytes(antall):
+    """Legger nedlastede bytes til alle åpne steg i kjøringen."""
+    aapne = _aapne.get()
+    if aapne:
+        with _maaling.get()._lock:
+            for innslag in aapne:
+                innslag['bytes'] += antall
+
+
+def i_kontekst(func, *args, **kwargs):
+    """Kaller func i en kopi av konteksten til tråden som lager kallet. Brukes med
+    pool.submit(i_kontekst(...)) slik at målingen følger med inn i tråder."""
+    return functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def skriv_prometheus(maaling, path):
+    """Skriver målingen i Prometheus-format til path (atomisk), f.eks. for node_exporters textfile-collector."""
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(maaling.to_prometheus())
+    os.replace(path + '.tmp', path)
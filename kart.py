@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Kartlag for eksponerte bygg. Byggene deles i kategorier med én groupby, og hver kategori
+blir ett kompakt lag: GeoJSON med bare feltene som vises i tooltip, eller en klynge av
+sirkelmarkører når antallet bygg er over CLUSTER_THRESHOLD. Et trykkraster fra
+scenario.Scenario kan legges over som varmekart.
+"""
+
+import os
+import numpy as np
+import folium
+import geopandas as gpd
+from folium.plugins import FastMarkerCluster
+
+from bygningstyper import KATEGORIER
+from instrumentering import instrumentert
+
+CLUSTER_THRESHOLD = int(os.environ.get('TANGOS_CLUSTER_THRESHOLD', 5000))  # antall bygg før klynger brukes
+TOOLTIP_FIELDS = ['Navn', 'avstand m', 'trykk kPa']
+
+KATEGORI_FARGE = {
+    1: 'orange',
+    2: 'black',
+    3: 'black',
+    4: 'black',
+    5: 'red',
+    6: 'red',
+    7: 'red',
+    8: 'red',
+    9: 'black',
+}
+# boliger legges sist slik at de ligger øverst, som før
+LAG_REKKEFOLGE = [2, 3, 4, 5, 6, 7, 8, 9, 1]
+
+_CLUSTER_CALLBACK = """\
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {radius: 5, color: '%s', weight: 2, fillOpacity: 0.5});
+    marker.bindTooltip(row[2]);
+    return marker;
+}"""
+
+
+def _geojson(gruppe, lat, lon):
+    """Minimal GeoJSON: punkt med 6 desimaler og bare tooltip-feltene."""
+    egenskaper = gruppe[TOOLTIP_FIELDS].astype(object).where(gruppe[TOOLTIP_FIELDS].notna(), None).to_dict('records')
+    return {
+        'type': 'FeatureCollection',
+        'features': [{'type': 'Feature',
+                      'geometry': {'type': 'Point', 'coordinates': [round(x, 6), round(y, 6)]},
+                      'properties': p}
+                     for x, y, p in zip(lon, lat, egenskaper)],
+    }
+
+
+@instrumentert()
+def add_building_layers(m, output, cluster_threshold=CLUSTER_THRESHOLD):
+    """Legger eksponerte bygg til kartet m, ett lag per kategori. output må ha kolonnene
+    kategori, geometry og TOOLTIP_FIELDS. Returnerer antall lag."""
+    wgs84 = output.geometry.to_crs('EPSG:4326')
+    output = output.assign(lat=wgs84.y.to_numpy(), lon=wgs84.x.to_numpy())
+    klynger = len(output) > cluster_threshold
+    grupper = dict(list(output.groupby('kategori')))
+
+    antall = 0
+    for kategori in LAG_REKKEFOLGE:
+        if kategori not in grupper:
+            continue
+        gruppe = grupper[kategori]
+        farge = KATEGORI_FARGE[kategori]
+        if klynger:
+            tekst = (gruppe['Navn'].fillna('Ukjent').astype(str) + '<br>' + gruppe['avstand m'].astype(str)
+                     + ' m, ' + gruppe['trykk kPa'].astype(str) + ' kPa')
+            data = [list(r) for r in zip(gruppe['lat'].round(6), gruppe['lon'].round(6), tekst)]
+            FastMarkerCluster(data, callback=_CLUSTER_CALLBACK % farge, name=KATEGORIER[kategori]).add_to(m)
+        else:
+            folium.GeoJson(
+                _geojson(gruppe, gruppe['lat'], gruppe['lon']),
+                name=KATEGORIER[kategori],
+                marker=folium.CircleMarker(radius=2, color=farge, fill=True, fill_color=farge, fill_opacity=0.5),
+                tooltip=folium.GeoJsonTooltip(fields=TOOLTIP_FIELDS),
+            ).add_to(m)
+        antall += 1
+    return antall
+
+
+def add_pressure_overlay(m, trykk, bounds, crs='EPSG:32633', cmap='inferno_r', opacity=0.6):
+    """Legger trykkrasteret (kPa, første rad nordligst) over kartet m som et bilde med
+    logaritmisk fargeskala. Celler med NaN blir gjennomsiktige."""
+    from matplotlib import colormaps
+    from matplotlib.colors import LogNorm
+
+    gyldig = np.isfinite(trykk) & (trykk > 0)
+    if not gyldig.any():
+        return None
+    norm = LogNorm(vmin=trykk[gyldig].min(), vmax=np.percentile(trykk[gyldig], 99))
+    rgba = colormaps[cmap](norm(np.where(gyldig, trykk, np.nan)))
+    rgba[~gyldig, 3] = 0
+
+    minx, miny, maxx, maxy = bounds
+    midtx, midty = (minx + maxx) / 2, (miny + maxy) / 2
+    kanter = gpd.GeoSeries(gpd.points_from_xy([midtx, midtx, minx, maxx], [miny, maxy, midty, midty]), crs=crs)
+    kanter = kanter.to_crs('EPSG:4326')  # midtpunktet på hver side, rasteret er symmetrisk rundt anlegget
+    sor, nord, vest, ost = (float(v) for v in (kanter.y[0], kanter.y[1], kanter.x[2], kanter.x[3]))
+    return folium.raster_layers.ImageOverlay(
+        image=rgba, bounds=[[sor, vest], [nord, ost]], opacity=opacity, name='Trykk', mercator_project=True,
+    ).add_to(m)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Beregningsstegene for ett anlegg, felles for Streamlit-appen og batch-kjøring:
+QD-soner, henting av bygg og veier, og eksponerte bygg med avstand og trykk.
+
+Hvilken QD-sone et bygg ligger i avgjøres eksakt ut fra avstanden til anlegget
+(klassifiser_soner). De bufrede sirklene fra qd_soner brukes bare til kartet.
+"""
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from get_veg_data import get_veg_data
+from get_matrikkel_data import get_matrikkel_data
+from blast_model import incident_pressure, incident_pressure_array
+import bygningstyper
+from instrumentering import instrumentert
+
+SONER = ('QD_syk', 'QD_bolig', 'QD_vei')
+KOLONNER = ['bygningstype', 'geometry', 'Navn', 'kategori', 'avstand m', 'trykk kPa', 'sone']
+
+
+def QD_func(NEI):
+    """denne funksjonen tar netto eksplosivinnhold (NEI) som argument og returnerer sikkerhetsavstanden
+    (QD, Quantity Distance) for hhv. sykehus, bolig og vei. QD er definert i eksplosivforskriften § 37"""
+
+    QD_syk = max(round(44.4 * NEI ** (1/3)), 800)
+    QD_bolig = max(round(22.2 * NEI ** (1/3)), 400)
+    QD_vei = max(round(14.8 * NEI ** (1/3)), 180)
+    return QD_syk, QD_bolig, QD_vei
+
+
+def qd_soner(oesting, nording, NEI):
+    """Lager anleggspunktet og de tre QD-sirklene (syk, bolig, vei) som GeoDataFrames, for visning i kartet."""
+    d = {'nording':[nording],'oesting':[oesting],'NEI':[NEI]}
+    df = pd.DataFrame(data=d)
+    gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.oesting,df.nording),crs='EPSG:32633')
+
+    QD_syk, QD_bolig, QD_vei = QD_func(NEI)
+
+    #en geopandas geodataframe kan kun ha en "geometry" kolonne, derfor er det nødvendig å kopiere gdf tre ganger
+    soner = []
+    for navn, QD in (('QD_syk', QD_syk), ('QD_bolig', QD_bolig), ('QD_vei', QD_vei)):
+        sone = gdf.copy().drop(columns=['nording','oesting'])
+        sone[navn] = QD
+        sone['trykk'] = f'{incident_pressure(QD, NEI):.1f} kPa' #trykket som korresponderer til QD avstanden, kun for visualisering
+        sone['geometry'] = sone['geometry'].buffer(QD)
+        soner.append(sone)
+    gdf_syk, gdf_bolig, gdf_vei = soner
+    return gdf, gdf_syk, gdf_bolig, gdf_vei
+
+
+def bbox_row(gdf_sone):
+    """Firkantet bounding box (minx, miny, maxx, maxy) rundt en sirkulær QD-sone."""
+    return gdf_sone['geometry'].bounds.iloc[0]
+
+
+def sone_bbox(oesting, nording, QD):
+    """Samme bounding box som bbox_row, regnet direkte fra sentrum og QD uten å lage sirkelen."""
+    return {'minx': oesting - QD, 'miny': nording - QD, 'maxx': oesting + QD, 'maxy': nording + QD}
+
+
+def klassifiser_soner(x, y, oesting, nording, NEI):
+    """Innerste QD-sone for hvert punkt, eksakt ut fra kvadrert avstand til anlegget, i én
+    vektorisert operasjon. Returnerer (sone, avstand²) der sone er 0 utenfor QD_syk og
+    ellers k for SONER[k - 1], dvs. 1 QD_syk, 2 QD_bolig og 3 QD_vei. Punkter på sirkelen regnes som innenfor."""
+    dx = np.asarray(x, dtype=float) - oesting
+    dy = np.asarray(y, dtype=float) - nording
+    avstand2 = dx * dx + dy * dy
+    grenser = np.array(QD_func(NEI), dtype=float)[::-1] ** 2  # QD_vei², QD_bolig², QD_syk² stigende
+    sone = len(grenser) - np.searchsorted(grenser, avstand2, side='left')  # antall soner med QD² >= avstand²
+    return sone.astype(np.int8), avstand2
+
+
+@instrumentert()
+def eksponerte_bygg(matrikkel_data, anlegg, NEI):
+    """Bygg innenfor QD_syk med lesbar bygningstype, kategori, avstand (m), trykk (kPa) og innerste QD-sone."""
+    punkter = matrikkel_data.geometry.values
+    sone, avstand2 = klassifiser_soner(shapely.get_x(punkter), shapely.get_y(punkter), anlegg.x, anlegg.y, NEI)
+    innenfor = np.flatnonzero(sone > 0) #behold bare bygninger innenfor sirkelen
+    output = matrikkel_data.iloc[innenfor][['bygningstype', 'geometry']].reset_index(drop=True) #kun interessant med disse kolonnene for videre visualisering
+
+    output['Navn'] = bygningstyper.navn(output['bygningstype']) #få på leselige navn på bygningstype
+    output['kategori'] = bygningstyper.kategori(output['bygningstype']) #første siffer i bygningstypen
+
+    output['avstand m'] = np.round(np.sqrt(avstand2[innenfor])) #regn ut avstanden til eksplosivlageret
+    output['trykk kPa'] = incident_pressure_array(output['avstand m'], NEI).round(2) #regner ut trykket og runder av til to desimaler
+    output['sone'] = np.array(SONER)[sone[innenfor] - 1]
+    return output
+
+
+def analyse_site(oesting, nording, NEI, kast_feil=False):
+    """Hele beregningen for ett anlegg uten UI. Returnerer (eksponerte bygg, veier innenfor QD_vei).
+    Med kast_feil kastes feil i hentingen videre i stedet for å gi tomme tabeller."""
+    QD_syk, QD_bolig, QD_vei = QD_func(NEI)
+    anlegg = shapely.Point(oesting, nording)
+
+    matrikkel_data = get_matrikkel_data(sone_bbox(oesting, nording, QD_syk), kast_feil=kast_feil)
+    veg_data = get_veg_data(sone_bbox(oesting, nording, QD_vei), kast_feil=kast_feil)
+
+    if matrikkel_data.empty:
+        output = gpd.GeoDataFrame(columns=KOLONNER, geometry='geometry', crs='EPSG:32633')
+    else:
+        output = eksponerte_bygg(matrikkel_data, anlegg, NEI)
+
+    if not veg_data.empty:
+        veg_data = veg_data.set_crs('EPSG:32633', allow_override=True)
+        veg_data = veg_data[veg_data.dwithin(anlegg, QD_vei)]
+    return output, veg_data
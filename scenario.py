@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Hva-om-analyse for ett anlegg: byggene hentes én gang for et romslig område (QD_syk for
+største NEI som skal prøves), og avstandene regnes ut og sorteres én gang. For hver ny
+NEI eller trykkterskel er QD-sonene da bare et prefiks i den sorterte tabellen, og bare
+trykket må regnes på nytt, vektorisert.
+"""
+
+import numpy as np
+
+from pipeline import QD_func, SONER
+from blast_model import incident_pressure_array
+import bygningstyper
+
+
+class Scenario:
+    """Bygg rundt anlegget (oesting, nording) sortert etter avstand, for NEI opp til NEI_maks.
+
+    buildings er en GeoDataFrame med bygningstype og punktgeometri i EPSG:32633 som dekker
+    minst QD_syk for NEI_maks, f.eks. fra get_matrikkel_data.
+    """
+
+    def __init__(self, buildings, oesting, nording, NEI_maks):
+        self.oesting = oesting
+        self.nording = nording
+        self.NEI_maks = NEI_maks
+        self.QD_maks = QD_func(NEI_maks)[0]
+
+        if buildings.empty:
+            x = y = np.empty(0)
+        else:
+            x, y = buildings.geometry.x.to_numpy(), buildings.geometry.y.to_numpy()
+        avstand = np.hypot(x - oesting, y - nording)
+        innenfor = np.flatnonzero(avstand <= self.QD_maks)
+        rekkefolge = innenfor[np.argsort(avstand[innenfor], kind='stable')]
+
+        self.avstand = avstand[rekkefolge]
+        bygg = buildings.iloc[rekkefolge][['bygningstype', 'geometry']].reset_index(drop=True) if len(rekkefolge) \
+            else buildings.reindex(columns=['bygningstype', 'geometry'])
+        bygg['Navn'] = bygningstyper.navn(bygg['bygningstype'])
+        bygg['kategori'] = bygningstyper.kategori(bygg['bygningstype'])
+        bygg['avstand m'] = np.round(self.avstand)
+        self.buildings = bygg
+        self._kategori = bygg['kategori'].to_numpy()
+        self._raster = {}
+
+    def antall(self, QD):
+        """Antall bygg med avstand <= QD."""
+        return int(np.searchsorted(self.avstand, QD, side='right'))
+
+    def _sjekk(self, NEI):
+        if NEI > self.NEI_maks:
+            raise ValueError(f"NEI {NEI} er større enn NEI_maks {self.NEI_maks} som byggene er hentet for")
+
+    def eksponerte_bygg(self, NEI, terskel=None):
+        """Bygg innenfor QD_syk for NEI med trykk (kPa), samme kolonner som pipeline.eksponerte_bygg.
+        Med terskel tas bare bygg med trykk >= terskel med."""
+        self._sjekk(NEI)
+        n_syk, n_bolig, n_vei = (self.antall(QD) for QD in QD_func(NEI))
+        output = self.buildings.iloc[:n_syk].copy()
+        output['trykk kPa'] = incident_pressure_array(output['avstand m'].to_numpy(), NEI).round(2)
+        # byggene er sortert etter avstand, så sonene er sammenhengende biter: vei, bolig, syk
+        output['sone'] = np.repeat(np.array(SONER[::-1]), [n_vei, n_bolig - n_vei, n_syk - n_bolig])
+        if terskel is not None:
+            output = output[output['trykk kPa'] >= terskel]
+        return output
+
+    def oppsummering(self, NEI, terskel=None):
+        """Antall bygg innenfor hver QD-sone og per kategori innenfor QD_syk, og maks trykk."""
+        self._sjekk(NEI)
+        QD_syk, QD_bolig, QD_vei = QD_func(NEI)
+        n = self.antall(QD_syk)
+        trykk = incident_pressure_array(np.round(self.avstand[:n]), NEI).round(2)
+        med = trykk >= terskel if terskel is not None else np.ones(n, dtype=bool)
+        per_kategori = np.bincount(self._kategori[:n][med], minlength=10)
+        return {
+            'QD_syk': QD_syk, 'QD_bolig': QD_bolig, 'QD_vei': QD_vei,
+            'antall QD_syk': n, 'antall QD_bolig': self.antall(QD_bolig), 'antall QD_vei': self.antall(QD_vei),
+            'antall over terskel': int(med.sum()),
+            'maks trykk kPa': float(np.nanmax(trykk)) if n else None,
+            'per kategori': {k: int(per_kategori[k]) for k in bygningstyper.KATEGORIER},
+        }
+
+    def trykk_raster(self, NEI, celle=10):
+        """Trykk (kPa) i et rutenett med celle meter sider rundt anlegget, ut til QD_syk for NEI.
+        Returnerer (raster, (minx, miny, maxx, maxy)); første rad er nordligst, NaN utenfor sonen.
+        Avstandsrutenettet regnes ut én gang per cellestørrelse."""
+        self._sjekk(NEI)
+        if celle not in self._raster:
+            n = int(np.ceil(self.QD_maks / celle))
+            akse = (np.arange(-n, n + 1)) * celle
+            self._raster[celle] = np.hypot(akse[np.newaxis, :], akse[::-1, np.newaxis])
+        avstand = self._raster[celle]
+        trykk = incident_pressure_array(avstand, NEI)
+        trykk[avstand > QD_func(NEI)[0]] = np.nan
+        r = (avstand.shape[0] // 2 + 0.5) * celle
+        return trykk, (self.oesting - r, self.nording - r, self.oesting + r, self.nording + r)
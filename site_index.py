@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Indeks over bygg og QD-sirkler for flere lagersteder, for å svare på det omvendte
+spørsmålet: hvilke bygg ligger innenfor QD-sonen til minst ett anlegg, og hvilket
+anlegg gir høyest trykk mot hvert bygg.
+"""
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from pipeline import QD_func, SONER
+from blast_model import incident_pressure_array
+from get_matrikkel_data import get_matrikkel_data
+from get_veg_data import get_veg_data
+from sonestatistikk import veg_eksponering, amrisk_veger
+from amr25filecreator import iter_depot_file
+import bygningstyper
+
+# valgfrie kolonner i stedslisten med mål for magasinet, og nøkkelen de har i AMRISK-eksporten
+MAGASIN_KOLONNER = {'lengde': 'length', 'bredde': 'width', 'hoyde': 'height', 'magasintype': 'remarks'}
+
+
+class SiteIndex:
+    """STRtree over byggpunktene, bygget én gang og spurt med alle QD-sirklene samtidig.
+
+    sites er en DataFrame med oesting, nording og NEI (og gjerne id), buildings en
+    GeoDataFrame med punktgeometri i EPSG:32633.
+    """
+
+    def __init__(self, buildings):
+        self.buildings = buildings.reset_index(drop=True)
+        self.x = self.buildings.geometry.x.to_numpy()
+        self.y = self.buildings.geometry.y.to_numpy()
+        self.tree = shapely.STRtree(self.buildings.geometry.values)
+
+    def pairs(self, sites, sone='QD_syk'):
+        """Alle (bygg, anlegg)-par der bygget ligger innenfor anleggets QD-sone, med
+        avstand og trykk. Én vektorisert spørring for alle anleggene."""
+        sites = sites.reset_index(drop=True)
+        QD = np.array([QD_func(NEI) for NEI in sites['NEI']])[:, SONER.index(sone)]
+        punkt = shapely.points(sites['oesting'].to_numpy(), sites['nording'].to_numpy())
+        site_idx, bygg_idx = self.tree.query(punkt, predicate='dwithin', distance=QD)
+
+        avstand = np.hypot(self.x[bygg_idx] - sites['oesting'].to_numpy()[site_idx],
+                           self.y[bygg_idx] - sites['nording'].to_numpy()[site_idx])
+        NEI = sites['NEI'].to_numpy()[site_idx]
+        return pd.DataFrame({
+            'bygg': bygg_idx,
+            'anlegg': sites['id'].to_numpy()[site_idx] if 'id' in sites else site_idx,
+            'avstand m': avstand.round(),
+            'trykk kPa': incident_pressure_array(avstand.round(), NEI).round(2),
+        })
+
+    def worst_case(self, sites, sone='QD_syk'):
+        """Per bygg innenfor minst én QD-sone: styrende anlegg (høyest trykk), avstanden
+        til det, maks trykk og antall anlegg bygget er eksponert for."""
+        par = self.pairs(sites, sone)
+        antall = par.groupby('bygg').size()
+        styrende = par.sort_values(['bygg', 'trykk kPa'], ascending=[True, False]).drop_duplicates('bygg')
+        styrende = styrende.set_index('bygg').rename(columns={'anlegg': 'styrende anlegg', 'trykk kPa': 'maks trykk kPa'})
+        styrende['antall anlegg'] = antall
+
+        result = self.buildings.loc[styrende.index].copy()
+        result[styrende.columns] = styrende
+        return result
+
+
+def depot_exposure(sites, sone='QD_syk'):
+    """Samlet eksponering for et depot med mange magasiner: henter byggene for hele
+    området én gang og returnerer worst_case per bygg med lesbar bygningstype."""
+    QD = np.array([QD_func(NEI) for NEI in sites['NEI']])[:, SONER.index(sone)]
+    row = {'minx': (sites['oesting'] - QD).min(), 'miny': (sites['nording'] - QD).min(),
+           'maxx': (sites['oesting'] + QD).max(), 'maxy': (sites['nording'] + QD).max()}
+    buildings = get_matrikkel_data(row)
+    if buildings.empty:
+        return buildings
+    result = SiteIndex(buildings[['bygningstype', 'geometry']]).worst_case(sites, sone)
+    result['Navn'] = bygningstyper.navn(result['bygningstype'])
+    return result
+
+
+def depot_veger(sites):
+    """Veisegmentene innenfor QD_vei for minst ett magasin, hver én gang: veiene hentes for hele
+    området samlet, og for segmenter nær flere magasiner beholdes magasinet som ligger nærmest
+    (se sonestatistikk.veg_eksponering)."""
+    QD = np.array([QD_func(NEI) for NEI in sites['NEI']])[:, SONER.index('QD_vei')]
+    row = {'minx': (sites['oesting'] - QD).min(), 'miny': (sites['nording'] - QD).min(),
+           'maxx': (sites['oesting'] + QD).max(), 'maxy': (sites['nording'] + QD).max()}
+    veg_data = get_veg_data(row)
+    deler = []
+    for site in sites.to_dict('records'):
+        veger = veg_eksponering(veg_data, site['oesting'], site['nording'], site['NEI'])
+        punkter = np.asarray(veger['geometry'].to_numpy(), dtype=object)
+        veger['avstand m'] = np.hypot(shapely.get_x(punkter) - site['oesting'], shapely.get_y(punkter) - site['nording'])
+        deler.append(veger)
+    veger = pd.concat(deler, ignore_index=True)
+    return veger.sort_values('avstand m', kind='stable').drop_duplicates('Vegobj_id').sort_index().reset_index(drop=True)
+
+
+def magasiner(sites):
+    """Stedene som magasiner for AMRISK-eksporten: koordinater, NEI som ladning og mål der de er oppgitt."""
+    result = []
+    for site in sites.to_dict('records'):
+        magasin = {'name': site.get('id'), 'x': site['oesting'], 'y': site['nording'], 'charge_kg': site['NEI']}
+        for kolonne, nøkkel in MAGASIN_KOLONNER.items():
+            if kolonne in site and pd.notna(site[kolonne]):
+                magasin[nøkkel] = site[kolonne]
+        result.append(magasin)
+    return result
+
+
+def write_depot_amrisk(f, sites, eksponering=None, sone='QD_syk', storage_name="Tanogs Export", veger=None):
+    """Skriver én AMRISK-fil for alle magasinene i sites til f. Hvert bygg innenfor
+    QD-sonen til minst ett magasin tas med én gang (fra depot_exposure). Med veger (fra
+    depot_veger) kommer veisegmentene etter byggene, med kjøretøy til stede som personer."""
+    if eksponering is None:
+        eksponering = depot_exposure(sites, sone)
+    if eksponering.empty:
+        x = y = np.empty(0)
+        navn = np.empty(0, dtype=object)
+    else:
+        x, y = shapely.get_x(eksponering.geometry.values), shapely.get_y(eksponering.geometry.values)
+        navn = eksponering['Navn'].to_numpy()
+    personer = np.zeros(len(x))
+    if veger is not None and not veger.empty:
+        vx, vy, vnavn, vpersoner = amrisk_veger(veger)
+        x, y, navn, personer = np.r_[x, vx], np.r_[y, vy], np.r_[navn, vnavn], np.r_[personer, vpersoner]
+    for chunk in iter_depot_file(magasiner(sites), x, y, navn, storage_name=storage_name, personer=personer):
+        f.write(chunk)
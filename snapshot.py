@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Offline-modus: et regionalt øyeblikksbilde (snapshot) av bygningspunkt fra Matrikkelen og
+ÅDT/fartsgrenser fra NVDB i én lokal GeoPackage, med R-tre-indeks på hvert lag. Er
+TANGOS_SNAPSHOT satt, svarer get_matrikkel_data og get_veg_data på bbox-spørringer fra
+filen i stedet for WFS og NVDB, og appen virker uten nett.
+
+    python snapshot.py vestfold.gpkg --matrikkel Basisdata_3900_Vestfold_25833_MatrikkelenBygning_GML.gml
+    python snapshot.py vestfold.gpkg --nvdb --bbox 180000 6540000 260000 6640000
+    python snapshot.py vestfold.gpkg --matrikkel-wfs --bbox 180000 6540000 260000 6640000
+    python snapshot.py vestfold.gpkg  # viser hva som ligger i filen
+
+Importen er strømmende: bulkuttrekket (GML, GeoPackage, FGDB, alt GDAL leser) leses i
+batcher med pyogrio.open_arrow og skrives lag for lag, så millioner av punkter aldri ligger
+i minnet samtidig. Uten uttrekk kan matrikkeldata høstes fra WFS flis for flis, og NVDB
+hentes side for side innenfor bboxen. Hver import erstatter laget den skriver.
+
+Spørringer bruker R-treet i GeoPackage, og SQLite leser filen memory-mappet (OGR_SQLITE_PRAGMA).
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import pyogrio
+
+from http_fetch import map_concurrent, split_bbox
+from instrumentering import steg
+
+SNAPSHOT = os.environ.get('TANGOS_SNAPSHOT')  # GeoPackage fra denne modulen, brukes i stedet for WFS og NVDB
+MMAP_BYTES = int(os.environ.get('TANGOS_SNAPSHOT_MMAP', 1024**3))
+BATCH = 100_000  # objekter per skrivebatch ved import
+WFS_FLIS = 2000  # meter, flisstørrelse ved høsting fra WFS
+NVDB_FLIS = 20000  # meter, flisstørrelse ved henting fra NVDB (sidene pagineres innenfor flisen)
+
+LAG = {  # lag -> (crs, kolonner i tillegg til geometry)
+    'matrikkel': ('EPSG:32633', ['gml_id', 'bygningstype']),
+    'adt': ('EPSG:5973', ['Vegobj_id', 'ÅDT_år', 'ÅDT_total', 'ÅDT_grunnlag', 'Stedfesting']),
+    'fart': ('EPSG:5973', ['Vegobj_id', 'Fartsgrense', 'Stedfesting']),
+}
+ID_KOLONNER = ('gml_id', 'lokalId', 'lokalid', 'bygningsnummer')  # prøves i rekkefølge ved import fra fil
+
+pyogrio.set_gdal_config_options({'OGR_SQLITE_PRAGMA': f'mmap_size={MMAP_BYTES}'})
+
+
+def aktiv():
+    """Om offline-modus er slått på."""
+    return bool(SNAPSHOT)
+
+
+def les_bbox(lag, minx, miny, maxx, maxy, path=None):
+    """Objektene i laget som skjærer bboxen, med samme kolonner som hentingen fra WFS/NVDB.
+    Mangler laget (f.eks. bare matrikkel er importert), gis en tom tabell med de samme kolonnene."""
+    path = path or SNAPSHOT
+    with steg(f'snapshot {lag}') as innslag:
+        if lag in pyogrio.list_layers(path)[:, 0]:
+            gdf = pyogrio.read_dataframe(path, layer=lag, bbox=(minx, miny, maxx, maxy))
+        else:
+            crs, kolonner = LAG[lag]
+            gdf = gpd.GeoDataFrame({k: [] for k in kolonner}, geometry=[], crs=crs)
+        if 'Stedfesting' in gdf:
+            gdf['Stedfesting'] = [[tuple(s) for s in json.loads(v)] if v else [] for v in gdf['Stedfesting']]
+        if innslag is not None:
+            innslag['objekter'] = len(gdf)
+    return gdf
+
+
+def fetch_matrikkel_bbox(minx, miny, maxx, maxy):
+    return les_bbox('matrikkel', minx, miny, maxx, maxy)
+
+
+def fetch_adt_bbox(minx, miny, maxx, maxy):
+    return les_bbox('adt', minx, miny, maxx, maxy)
+
+
+def fetch_fart_bbox(minx, miny, maxx, maxy):
+    return les_bbox('fart', minx, miny, maxx, maxy)
+
+
+def info(path=None):
+    """Antall objekter, utstrekning, kilde og importtidspunkt per lag i snapshotet."""
+    path = path or SNAPSHOT
+    finnes = {navn for navn, _ in pyogrio.list_layers(path)}
+    rader = []
+    for lag in LAG:
+        if lag in finnes:
+            meta = pyogrio.read_info(path, layer=lag)
+            rader.append({'lag': lag, 'objekter': meta['features'], 'bbox': meta['total_bounds'],
+                          **(meta['layer_metadata'] or {})})
+    return pd.DataFrame(rader)
+
+
+class _Skriver:
+    """Skriver batcher til ett lag, det første kallet erstatter laget."""
+
+    def __init__(self, path, lag, kilde):
+        self.path, self.lag, self.kilde = path, lag, kilde
+        self.antall = 0
+
+    def __call__(self, gdf):
+        crs, kolonner = LAG[self.lag]
+        gdf = gpd.GeoDataFrame(gdf[kolonner], geometry=gdf.geometry.values, crs=crs)
+        if 'Stedfesting' in gdf:
+            gdf['Stedfesting'] = [json.dumps(s) for s in gdf['Stedfesting']]
+        for kolonne in ('bygningstype', 'Vegobj_id', 'ÅDT_år', 'ÅDT_total', 'Fartsgrense'):
+            if kolonne in gdf:
+                gdf[kolonne] = pd.to_numeric(gdf[kolonne]).astype('Int64')
+        if self.antall == 0:
+            meta = {'kilde': self.kilde, 'importert': datetime.now().isoformat(timespec='seconds')}
+            pyogrio.write_dataframe(gdf, self.path, layer=self.lag, layer_metadata=meta)
+        elif len(gdf):
+            pyogrio.write_dataframe(gdf, self.path, layer=self.lag, append=True)
+        self.antall += len(gdf)
+        print(f'{self.lag}: {self.antall} objekter', file=sys.stderr)
+
+
+def _id_kolonne(kolonner, id_kolonne=None):
+    if id_kolonne:
+        return id_kolonne
+    return next((k for k in ID_KOLONNER if k in kolonner), None)
+
+
+def importer_matrikkel(path, kilde, id_kolonne=None, batch=BATCH):
+    """Leser bygningspunktene i et bulkuttrekk batch for batch og skriver dem til laget matrikkel.
+    Mangler en id-kolonne, brukes løpenummeret i fila."""
+    skriv = _Skriver(path, 'matrikkel', os.path.basename(kilde))
+    with pyogrio.open_arrow(kilde, batch_size=batch, use_pyarrow=True) as (meta, reader):
+        geometri = meta['geometry_name'] or 'wkb_geometry'
+        kolonne = _id_kolonne(meta['fields'], id_kolonne)
+        for record_batch in reader:
+            data = record_batch.to_pandas()
+            punkter = shapely.from_wkb(data[geometri].to_numpy())
+            punkter = np.where(shapely.get_type_id(punkter) == 4, shapely.get_point(punkter, 0), punkter)  # MultiPoint
+            gdf = gpd.GeoDataFrame({
+                'gml_id': data[kolonne].astype(str) if kolonne else np.arange(skriv.antall, skriv.antall + len(data)).astype(str),
+                'bygningstype': data['bygningstype'],
+            }, geometry=punkter, crs=meta['crs'])
+            if meta['crs'] and not gdf.crs.equals(LAG['matrikkel'][0]):
+                gdf = gdf.to_crs(LAG['matrikkel'][0])
+            skriv(gdf[gdf.geometry.notna()])
+    return skriv.antall
+
+
+def _halvåpen(gdf, minx, miny, maxx, maxy):
+    """Punktene i [minx, maxx) x [miny, maxy), slik at punkter på flisgrensene bare kommer med én gang."""
+    x, y = shapely.get_x(gdf.geometry.values), shapely.get_y(gdf.geometry.values)
+    return gdf[(x >= minx) & (x < maxx) & (y >= miny) & (y < maxy)]
+
+
+def importer_matrikkel_wfs(path, minx, miny, maxx, maxy, flis=WFS_FLIS):
+    """Høster bygningspunkt fra WFS innenfor bboxen, noen fliser parallelt om gangen."""
+    from get_matrikkel_data import fetch_matrikkel_bbox as hent, WFS_URL  # den vanlige hentingen
+
+    skriv = _Skriver(path, 'matrikkel', WFS_URL)
+    fliser = split_bbox(minx, miny, maxx, maxy, size=flis)
+    for i in range(0, len(fliser), 32):
+        gruppe = fliser[i:i + 32]
+        for boks, gdf in zip(gruppe, map_concurrent(hent, gruppe)):
+            if not gdf.empty:
+                skriv(_halvåpen(gdf, *boks))
+    if skriv.antall == 0:
+        skriv(gpd.GeoDataFrame({'gml_id': [], 'bygningstype': []}, geometry=[], crs='EPSG:32633'))
+    return skriv.antall
+
+
+def importer_nvdb(path, minx, miny, maxx, maxy, flis=NVDB_FLIS):
+    """Henter ÅDT (540) og fartsgrenser (105) innenfor bboxen side for side. Objekter som
+    krysser flisgrensene skrives bare én gang."""
+    from get_veg_data import NVDB_URL, adt_batch, fart_batch, iter_vegdata
+
+    fliser = split_bbox(minx, miny, maxx, maxy, size=flis)
+    antall = {}
+    for lag, typ, parse_batch in (('adt', 540, adt_batch), ('fart', 105, fart_batch)):
+        skriv = _Skriver(path, lag, f'{NVDB_URL}/vegobjekter/{typ}')
+        sett = set()
+        for boks in fliser:
+            for batch in iter_vegdata(f'{NVDB_URL}/vegobjekter/{typ}', parse_batch, *boks):
+                batch = batch[batch['geometry'].notna() & ~batch['Vegobj_id'].isin(sett)]
+                sett.update(batch['Vegobj_id'])
+                skriv(batch)
+        if skriv.antall == 0:
+            skriv(gpd.GeoDataFrame({k: [] for k in LAG[lag][1]}, geometry=[], crs=LAG[lag][0]))
+        antall[lag] = skriv.antall
+    return antall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lager eller viser et offline-snapshot (GeoPackage) med matrikkel- og vegdata.')
+    parser.add_argument('snapshot', help='GeoPackage som skrives til (lagene som importeres erstattes)')
+    parser.add_argument('--matrikkel', metavar='FIL', help='bulkuttrekk med bygningspunkt (GML, GeoPackage, FGDB, ...)')
+    parser.add_argument('--id-kolonne', help=f'id-kolonne i uttrekket (standard: første av {", ".join(ID_KOLONNER)})')
+    parser.add_argument('--matrikkel-wfs', action='store_true', help='høst bygningspunkt fra WFS innenfor --bbox')
+    parser.add_argument('--nvdb', action='store_true', help='hent ÅDT og fartsgrenser fra NVDB innenfor --bbox')
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('MINX', 'MINY', 'MAXX', 'MAXY'),
+                        help='område i UTM33 for --matrikkel-wfs og --nvdb')
+    args = parser.parse_args(argv)
+    if (args.matrikkel_wfs or args.nvdb) and not args.bbox:
+        parser.error('--matrikkel-wfs og --nvdb krever --bbox')
+    if args.matrikkel and args.matrikkel_wfs:
+        parser.error('velg enten --matrikkel eller --matrikkel-wfs')
+
+    if args.matrikkel:
+        importer_matrikkel(args.snapshot, args.matrikkel, args.id_kolonne)
+    if args.matrikkel_wfs:
+        importer_matrikkel_wfs(args.snapshot, *args.bbox)
+    if args.nvdb:
+        importer_nvdb(args.snapshot, *args.bbox)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(info(args.snapshot).to_string(index=False))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
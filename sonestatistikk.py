@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Statistikk per QD-sone (syk/bolig/vei) og per trykkbånd for ett anlegg, vektorisert:
+
+- bygg: antall per kategori, telt i én np.bincount over nøkkelen (sone, trykkbånd, kategori),
+  så summeres kuben langs sone eller trykkbånd.
+- veier: lengden av hvert segment innenfor en sirkel med radius r regnes analytisk for hvert
+  rett linjestykke (andregradslikning langs stykket), for QD_vei og for avstandene der trykket
+  faller til grensene mellom båndene. Lengden i et bånd er differansen mellom to sirkler.
+  Kjøretøyeksponering er gjennomsnittlig antall kjøretøy til stede: ÅDT · lengde / fart.
+
+Sonene er innerste sone som i pipeline.eksponerte_bygg, slik at hvert bygg telles én gang.
+Veiene hentes bare for QD_vei, så veikolonnene er tomme for QD_syk og QD_bolig.
+"""
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from blast_model import distance_for_pressure
+from pipeline import QD_func, SONER
+from instrumentering import instrumentert
+
+TRYKKBAND = (2, 5, 10, 20, 50, 100)  # kPa, grensene mellom båndene
+FARTSGRENSE_STANDARD = 50  # km/t for segmenter uten fartsgrense; lav fart gir flere kjøretøy til stede
+PERSONER_PER_KJORETOY = 1.3  # til antall personer i AMRISK-objektene for veier
+VEG_KOLONNER = ['lengde m', 'kjøretøy-km per døgn', 'kjøretøy til stede']
+
+
+def band_navn(band=TRYKKBAND):
+    """Lesbare navn på trykkbåndene, fra lavest til høyest trykk."""
+    grenser = [f'{g:g}' for g in band]
+    return ([f'< {grenser[0]} kPa'] + [f'{a}–{b} kPa' for a, b in zip(grenser, grenser[1:])]
+            + [f'≥ {grenser[-1]} kPa'])
+
+
+def _lengde_innenfor(geometri, oesting, nording, radier):
+    """Lengden av hver geometri innenfor sirkler med sentrum i anlegget, én kolonne per radius.
+    Multigeometrier deles i deler, og hvert rett stykke mellom to punkter behandles for seg."""
+    deler, segment = shapely.get_parts(geometri, return_index=True)
+    xy, del_nr = shapely.get_coordinates(deler, return_index=True)
+    samme = del_nr[1:] == del_nr[:-1]  # stykker mellom punkter i samme del
+    p0 = xy[:-1][samme] - (oesting, nording)
+    d = xy[1:][samme] - xy[:-1][samme]
+    segment = segment[del_nr[:-1][samme]]
+
+    # |p0 + t·d|² = r² for t i [0, 1]
+    a = np.einsum('ij,ij->i', d, d)[:, np.newaxis]
+    b = 2 * np.einsum('ij,ij->i', p0, d)[:, np.newaxis]
+    c = np.einsum('ij,ij->i', p0, p0)[:, np.newaxis] - np.asarray(radier, dtype=float) ** 2
+    diskriminant = b * b - 4 * a * c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rot = np.sqrt(diskriminant)
+        t1, t2 = (-b - rot) / (2 * a), (-b + rot) / (2 * a)
+    andel = np.clip(t2, 0, 1) - np.clip(t1, 0, 1)
+    lengde = np.where((diskriminant > 0) & (a > 0), andel * np.sqrt(a), 0.0)
+    return np.column_stack([np.bincount(segment, weights=lengde[:, k], minlength=len(geometri))
+                            for k in range(lengde.shape[1])])
+
+
+def _band_radier(NEI, QD_vei, band):
+    """Radiene til grensene mellom trykkbåndene innenfor QD_vei, fra ytterst (lavest trykk) og inn."""
+    radier = np.nan_to_num(distance_for_pressure(np.asarray(band, dtype=float), NEI), nan=0.0)
+    return np.r_[QD_vei, np.minimum(radier, QD_vei), 0.0]
+
+
+def _kjoretoy(veg_data, lengde):
+    """Kjøretøy-km per døgn og gjennomsnittlig antall kjøretøy til stede for lengdene (m) i
+    hver kolonne av lengde."""
+    adt = np.nan_to_num(pd.to_numeric(veg_data['ÅDT_total'], errors='coerce').to_numpy(dtype=float))
+    fart = veg_data['Fartsgrense'] if 'Fartsgrense' in veg_data else pd.Series(np.nan, index=veg_data.index)
+    fart = pd.to_numeric(fart, errors='coerce').fillna(FARTSGRENSE_STANDARD).to_numpy(dtype=float)
+    km = adt[:, np.newaxis] * lengde / 1000
+    return km, km / (24 * fart[:, np.newaxis])
+
+
+@instrumentert()
+def veg_eksponering(veg_data, oesting, nording, NEI):
+    """Veisegmentene som når inn i QD_vei, med lengde innenfor QD_vei, kjøretøy-km per døgn og
+    kjøretøy til stede. Geometrien er punktet på segmentet nærmest anlegget."""
+    QD_vei = QD_func(NEI)[2]
+    if veg_data is None or veg_data.empty:
+        return pd.DataFrame(columns=['Vegobj_id', 'ÅDT_total', 'Fartsgrense', *VEG_KOLONNER, 'geometry'])
+    geometri = veg_data.geometry.values
+    lengde = _lengde_innenfor(geometri, oesting, nording, [QD_vei])
+    km, til_stede = _kjoretoy(veg_data, lengde)
+    innenfor = lengde[:, 0] > 0
+    naermest = shapely.get_point(shapely.shortest_line(geometri[innenfor], shapely.Point(oesting, nording)), 0)
+    return pd.DataFrame({
+        'Vegobj_id': veg_data['Vegobj_id'].to_numpy()[innenfor],
+        'ÅDT_total': veg_data['ÅDT_total'].to_numpy()[innenfor],
+        'Fartsgrense': veg_data['Fartsgrense'].to_numpy()[innenfor] if 'Fartsgrense' in veg_data else None,
+        'lengde m': lengde[innenfor, 0].round(1),
+        'kjøretøy-km per døgn': km[innenfor, 0].round(2),
+        'kjøretøy til stede': til_stede[innenfor, 0].round(4),
+        'geometry': naermest,
+    })
+
+
+@instrumentert()
+def sonestatistikk(output, veg_data, oesting, nording, NEI, band=TRYKKBAND):
+    """Én rad per QD-sone og én per trykkbånd: antall bygg, antall per kategori (0 er ukjent
+    bygningstype), og for veier lengde innenfor QD_vei, kjøretøy-km per døgn og kjøretøy til stede.
+    output er tabellen fra pipeline.eksponerte_bygg, veg_data veiene fra get_veg_data."""
+    navn = band_navn(band)
+    n_sone, n_band = len(SONER), len(navn)
+
+    sone = pd.Categorical(output['sone'], categories=SONER).codes.astype(np.int64)
+    trykkband = np.searchsorted(np.asarray(band, dtype=float), output['trykk kPa'].to_numpy(dtype=float), side='right')
+    kategori = np.asarray(output['kategori'], dtype=np.int64)
+    gyldig = sone >= 0
+    nokkel = (sone[gyldig] * n_band + trykkband[gyldig]) * 10 + kategori[gyldig]
+    kube = np.bincount(nokkel, minlength=n_sone * n_band * 10).reshape(n_sone, n_band, 10)
+    per_kategori = np.vstack([kube.sum(axis=1), kube.sum(axis=0)])
+
+    veg = np.full((n_sone + n_band, len(VEG_KOLONNER)), np.nan)
+    if veg_data is not None and not veg_data.empty:
+        radier = _band_radier(NEI, QD_func(NEI)[2], band)
+        lengde = _lengde_innenfor(veg_data.geometry.values, oesting, nording, radier)
+        lengde = np.column_stack([lengde[:, 0], lengde[:, :-1] - lengde[:, 1:]])  # QD_vei, deretter per bånd
+        km, til_stede = _kjoretoy(veg_data, lengde)
+        totalt = np.vstack([lengde.sum(axis=0), km.sum(axis=0), til_stede.sum(axis=0)]).T
+        veg[SONER.index('QD_vei')] = totalt[0]
+        veg[n_sone:] = totalt[1:]
+
+    statistikk = pd.DataFrame({
+        'gruppe': ['sone'] * n_sone + ['trykkband'] * n_band,
+        'verdi': [*SONER, *navn],
+        'antall bygg': per_kategori.sum(axis=1),
+    })
+    for k in range(10):
+        statistikk[f'bygg kategori {k}'] = per_kategori[:, k]
+    statistikk[VEG_KOLONNER] = veg.round(2)
+    return statistikk
+
+
+def amrisk_veger(eksponering):
+    """x, y, navn og antall personer for veisegmentene fra veg_eksponering som eksponerte objekter
+    i AMRISK, i punktet nærmest anlegget. Personer er kjøretøy til stede ganger PERSONER_PER_KJORETOY."""
+    punkter = np.asarray(eksponering['geometry'].to_numpy(), dtype=object)
+    return (shapely.get_x(punkter), shapely.get_y(punkter),
+            ('Vei_' + eksponering['Vegobj_id'].astype(str)).to_numpy(),
+            (eksponering['kjøretøy til stede'].to_numpy(dtype=float) * PERSONER_PER_KJORETOY).round(4))
@@ -5,6 +5,9 @@ Program som tar et koordinat (EPSG:32633 – WGS 84 / UTM zone 33N) og en eksplo
 @author: KRHE
 """
 
+import os
+import time
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 import folium
@@ -13,27 +16,142 @@ import streamlit as st
 # st.set_page_config(layout="wide") #wide mode
 
 from streamlit_folium import st_folium
-from amr25filecreator import generate_amrisk_base_file, generate_exposed_objects
-from get_veg_data import get_veg_data
-from get_matrikkel_data import get_matrikkel_data
-from blast_model import incident_pressure
+from amr25filecreator import iter_amrisk_file
+from get_veg_data import get_veg_data, fetch_adt_bbox, fetch_fart_bbox
+from get_matrikkel_data import get_matrikkel_data, matrikkel_cache
+from inkrementell import InkrementellHenting
+from pipeline import qd_soner, bbox_row, eksponerte_bygg, KOLONNER
+from sonestatistikk import sonestatistikk, veg_eksponering, amrisk_veger
+from kart import add_building_layers, add_pressure_overlay
+from scenario import Scenario
+from bygningstyper import KATEGORIER
+from instrumentering import Maaling, kjoring, steg, skriv_prometheus
+import snapshot
+
+APP_CACHE_TTL = int(os.environ.get('TANGOS_APP_CACHE_TTL', 3600))  # sekunder et steg ligger i cachen
+APP_CACHE_ENTRIES = int(os.environ.get('TANGOS_APP_CACHE_ENTRIES', 64))  # maks antall innslag per steg
+DEBUG = os.environ.get('TANGOS_DEBUG') == '1'  # viser ytelsesmålingen, også med ?debug=1 i adressen
+METRICS_FILE = os.environ.get('TANGOS_METRICS_FILE')  # siste måling skrives hit i Prometheus-format
+
+# =============================================================================
+# Beregningssteg med cache. Cachen deles av alle brukere av appen, så samme eller
+# overlappende input gjenbruker tidligere arbeid. Overlappende områder som ikke gir
+# samme bbox hentes fra flis-cachen på disk, og hver økt henter bare stripene som
+# ikke er dekket av forrige beregning (se hentere).
+# =============================================================================
+
+def uten_tomme(cachet):
+    """Fjerner tomme svar fra cachen igjen, siden get_matrikkel_data og get_veg_data
+    også svarer tomt ved feil, og en feil ikke skal huskes i en time."""
+    def kall(*args):  # argumenter som starter med _ er ikke med i cachenøkkelen
+        svar = cachet(*args)
+        if svar.empty:
+            cachet.clear(*args)
+        return svar
+    return kall
+
+def bbox_nokkel(gdf_sone):
+    """bbox for en QD-sone som tuple, brukt som nøkkel for hentingen."""
+    return tuple(round(float(v), 2) for v in bbox_row(gdf_sone))
+
+@st.cache_data(ttl=APP_CACHE_TTL, max_entries=APP_CACHE_ENTRIES, show_spinner=False)
+def cached_qd_soner(oesting, nording, NEI):
+    return qd_soner(oesting, nording, NEI)
+
+def hentere():
+    """Inkrementelle hentere for denne økten, for bygg (via flis-cachen) og for ÅDT og fartsgrense.
+    Flyttes anlegget litt eller økes NEI, hentes bare det som ikke er dekket fra før. Leses her,
+    utenfor stegene med cache, og sendes inn som _hentere: cachen deles av alle øktene, og
+    hentere gir samme data som en vanlig henting, så de er ikke med i cachenøkkelen."""
+    if 'hentere' not in st.session_state:
+        st.session_state['hentere'] = {
+            'bygg': InkrementellHenting(matrikkel_cache().get_bbox, 'gml_id', 'EPSG:32633'),
+            'veg': (InkrementellHenting(fetch_adt_bbox, 'Vegobj_id', 'EPSG:5973'),
+                    InkrementellHenting(fetch_fart_bbox, 'Vegobj_id', 'EPSG:5973')),
+        }
+    return st.session_state['hentere']
+
+@st.cache_data(ttl=APP_CACHE_TTL, max_entries=APP_CACHE_ENTRIES, show_spinner="Henter bygg")
+def _hent_bygg(bbox, _henter=None):
+    return get_matrikkel_data(dict(zip(['minx', 'miny', 'maxx', 'maxy'], bbox)), henter=_henter)
+hent_bygg = uten_tomme(_hent_bygg)
+
+@st.cache_data(ttl=APP_CACHE_TTL, max_entries=APP_CACHE_ENTRIES, show_spinner="Henter veier")
+def _hent_veg(bbox, _hentere=None):
+    return get_veg_data(dict(zip(['minx', 'miny', 'maxx', 'maxy'], bbox)), _hentere)
+hent_veg = uten_tomme(_hent_veg)
+
+@st.cache_data(ttl=APP_CACHE_TTL, max_entries=APP_CACHE_ENTRIES, show_spinner=False)
+def _eksponerte_bygg(oesting, nording, NEI, _hentere=None):
+    """Bygg innenfor QD_syk med navn, kategori, avstand og trykk."""
+    gdf, gdf_syk, gdf_bolig, gdf_vei = cached_qd_soner(oesting, nording, NEI)
+    result_geodataframe = hent_bygg(bbox_nokkel(gdf_syk), (_hentere or {}).get('bygg')) #firkantet bounding box for QD_syk, denne vil også inneholde QD_bolig og QD_vei
+    if result_geodataframe.empty:
+        return gpd.GeoDataFrame(columns=KOLONNER, geometry='geometry', crs='EPSG:32633')
+    return eksponerte_bygg(result_geodataframe, gdf.iloc[0]['geometry'], NEI) #bygningstype slås opp i kodelisten som følger med appen
+cached_eksponerte_bygg = uten_tomme(_eksponerte_bygg)
+
+@st.cache_data(ttl=APP_CACHE_TTL, max_entries=APP_CACHE_ENTRIES, show_spinner="Tegner kart")
+def _kart_html(oesting, nording, NEI, _hentere=None):
+    """Ferdig HTML for kartet med anlegg, veier, QD-sirkler og eksponerte bygg."""
+    gdf, gdf_syk, gdf_bolig, gdf_vei = cached_qd_soner(oesting, nording, NEI)
+
+    #dette er kartpunktet for lageret
+    kartpunkt = gdf.explore(marker_type=folium.Marker(icon=folium.Icon(color='blue', icon='bomb', prefix='fa')),name='anlegg',control=False,
+                            prefer_canvas=True, zoom_start=13) #canvas tegner mange punkter raskere enn SVG
+
+    #dataframe med vegsegmenter som har ÅDT innenfor sikkerhetsavstandene
+    result_veg_geodataframe = hent_veg(bbox_nokkel(gdf_vei), (_hentere or {}).get('veg'))
+    if not result_veg_geodataframe.empty:
+        vegsegmenter = result_veg_geodataframe.explode(ignore_index=True)
+        vegsegmenter.crs = 'EPSG:32633'
+        kart_veg = vegsegmenter.explore(m=kartpunkt,style_kwds=dict(color='black'), name="Vei")
+
+    kartQDsyk = gdf_syk.explore(m=kartpunkt,style_kwds=dict(fill=False,color='red'),name ='QDsyk',control=False)
+    kartQDbol = gdf_bolig.explore(m=kartpunkt,style_kwds=dict(fill=False,color='orange'),name ='QDbolig',control=False)
+    kartQDvei = gdf_vei.explore(m=kartpunkt,style_kwds=dict(fill=False,color='black'),name ='QDvei',control=False)
+
+    output = cached_eksponerte_bygg(oesting, nording, NEI, _hentere)
+    if not output.empty:
+        add_building_layers(kartpunkt, output) #ett lag per kategori, klynger ved mange bygg
+        folium.LayerControl().add_to(kartpunkt)
+    with steg('kart HTML'):
+        return kartpunkt.get_root().render()
+
+def sone_statistikk(oesting, nording, NEI):
+    """Statistikk per QD-sone og trykkbånd, og veiene innenfor QD_vei med kjøretøyeksponering.
+    Byggene og veiene kommer fra cachen, selve aggregeringen er vektorisert og tar millisekunder."""
+    gdf, gdf_syk, gdf_bolig, gdf_vei = cached_qd_soner(oesting, nording, NEI)
+    veg_data = hent_veg(bbox_nokkel(gdf_vei), hentere()['veg'])
+    output = cached_eksponerte_bygg(oesting, nording, NEI, hentere())
+    return sonestatistikk(output, veg_data, oesting, nording, NEI), veg_eksponering(veg_data, oesting, nording, NEI)
+
+def kart_html(oesting, nording, NEI):
+    html = _kart_html(oesting, nording, NEI, hentere())
+    if cached_eksponerte_bygg(oesting, nording, NEI, hentere()).empty:
+        _kart_html.clear(oesting, nording, NEI) #kan skyldes en feil ved hentingen, se uten_tomme
+    return html
+
+@st.cache_resource(ttl=APP_CACHE_TTL, max_entries=APP_CACHE_ENTRIES, show_spinner="Henter bygg")
+def hent_scenario(oesting, nording, NEI_maks, _hentere=None):
+    """Scenario for hva-om-analysen. Delt som ressurs og ikke kopiert, siden det bare leses."""
+    _, gdf_syk_maks, _, _ = cached_qd_soner(oesting, nording, NEI_maks)
+    return Scenario(hent_bygg(bbox_nokkel(gdf_syk_maks), (_hentere or {}).get('bygg')), oesting, nording, NEI_maks)
+
 
 output = pd.DataFrame()
 output_csv = pd.DataFrame()
-bygningstype_url = 'https://raw.githubusercontent.com/Freeyolo/tangos/main/bygningstype.csv'
-   
-
+statistikk = pd.DataFrame()
 
-def QD_func(NEI):
-    """denne funksjonen tar netto eksplosivinnhold (NEI) som argument og returnerer sikkerhetsavstanden 
-    (QD, Quantity Distance) for hhv. sykehus, bolig og vei. QD er definert i eksplosivforskriften § 37"""
+#stegene som faktisk kjøres (ikke hentes fra cachen) måles, se instrumentering.py
+vis_maaling = DEBUG or 'debug' in st.query_params
+maaling = Maaling('app', minne=vis_maaling and st.sidebar.checkbox('Mål minne (tregere)', key='maal_minne'))
+if snapshot.aktiv():
+    st.sidebar.caption(f'Offline: bygg og veier leses fra {os.path.basename(snapshot.SNAPSHOT)}')
+   
 
-    QD_syk = max(round(44.4 * NEI ** (1/3)), 800)
-    QD_bolig = max(round(22.2 * NEI ** (1/3)), 400)
-    QD_vei = max(round(14.8 * NEI ** (1/3)), 180)
-    return QD_syk, QD_bolig, QD_vei
 
-tab1, tab2 = st.tabs(['Input','Amrisk'])
+tab1, tab2, tab3 = st.tabs(['Input','Amrisk','Hva om'])
 
 # =============================================================================
 # TAB 1 – Input, beregninger og kart
@@ -62,115 +180,33 @@ with tab1:
             st.stop()
         st.session_state["last_inputs"] = {"oesting": oesting, "nording": nording, "NEI": NEI} 
         
-        d = {'nording':[nording],'oesting':[oesting],'NEI':[NEI]}
-        df = pd.DataFrame(data=d)
-        gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.oesting,df.nording),crs='EPSG:32633')
-           
-        QD_syk, QD_bolig, QD_vei = QD_func(NEI)
-    
-        #en geopandas geodataframe kan kun ha en "geometry" kolonne, derfor er det nødvendig å kopiere gdf tre ganger
-    
-        gdf_syk = gdf.copy().drop(columns=['nording','oesting'])
-        gdf_bolig = gdf.copy().drop(columns=['nording','oesting'])
-        gdf_vei = gdf.copy().drop(columns=['nording','oesting'])
-    
-        gdf_syk['QD_syk'] = QD_syk
-        gdf_syk['trykk'] = '2 kPa' #trykket som korresponderer til QD avstanden, kun for visualisering
-    
-        gdf_bolig['QD_bolig'] = QD_bolig
-        gdf_bolig['trykk'] = '5 kPa'
-    
-        gdf_vei['QD_vei'] = QD_vei
-        gdf_vei['trykk'] = '9 kPa'
-        
-        gdf_syk['geometry'] = gdf_syk['geometry'].buffer(gdf_syk['QD_syk'])  
-        gdf_bolig['geometry'] = gdf_bolig['geometry'].buffer(gdf_bolig['QD_bolig'])
-        gdf_vei['geometry'] = gdf_vei['geometry'].buffer(gdf_vei['QD_vei'])
-        
-        #dette er kartpunktet for lageret
-        kartpunkt = gdf.explore(marker_type=folium.Marker(icon=folium.Icon(color='blue', icon='bomb', prefix='fa')),name='anlegg',control=False)
-        
-        # Lage en firkantet bounding boks for QD_syk, denne vil også inneholde QD_bolig og QD_vei
-        gdf_syk_bbox = pd.concat([gdf_syk, gdf_syk['geometry'].bounds], axis=1) #lager en firkantet bounding box for de sirkulære sikkerhetsavstandene
-        gdf_vei_bbox = pd.concat([gdf_vei, gdf_vei['geometry'].bounds], axis=1) #lager en firkantet bounding box for de sirkulære sikkerhetsavstandene  
-        
-        #dataframe med boliger innenfor sikkerhetsavstandene
-        result_geodataframe = get_matrikkel_data(gdf_syk_bbox.iloc[0])
-    
-        #dataframe med vegsegmenter som har ÅDT innenfor sikkerhetsavstandene       
-        result_veg_geodataframe = get_veg_data(gdf_vei_bbox.iloc[0])
-    
-        if not result_veg_geodataframe.empty:
-            vegsegmenter = result_veg_geodataframe.explode(ignore_index=True)
-            vegsegmenter.crs = 'EPSG:32633'
-            kart_veg = vegsegmenter.explore(m=kartpunkt,style_kwds=dict(color='black'), name="Vei")
-    
-        if not result_geodataframe.empty:
-            eksponerte_bygg_syk = gpd.sjoin(result_geodataframe, gdf_syk, predicate='within') #behold bare bygninger innenfor sirkelen
-            output = eksponerte_bygg_syk[['bygningstype', 'geometry']] #kun interessant med disse kolonnene for videre visualisering
-            
-            bygningstype = pd.read_csv(bygningstype_url, index_col=False, sep=';', usecols=['Navn', 'Kodeverdi'], encoding='utf8') #last in bygningstype fra SSB
-            output = output.merge(bygningstype, how='left', left_on='bygningstype', right_on='Kodeverdi') #få på leselige navn på bygningstype
-            output.drop(columns=['Kodeverdi'], inplace=True) #fjern unødvendig kolonne
-    
-            output['avstand m'] = round(output.distance(gdf.iloc[0]['geometry'])) #regn ut avstanden til eksplosivlageret
-            output['trykk kPa'] = output['avstand m'].apply(incident_pressure,args=[NEI]).round(2) #regner ut trykket og runder av til to desimaler
+    if st.session_state.get("last_inputs"):
+        #kjøres ved hver rerun, men stegene hentes fra cachen så lenge input er den samme
+        siste = st.session_state["last_inputs"]
+        with kjoring(maaling):
+            output = cached_eksponerte_bygg(siste["oesting"], siste["nording"], siste["NEI"], hentere())
     
+        if not output.empty:
             output['bygningstype'] = output['bygningstype'].astype(str) # Convert 'bygningstype' column to string type
-            boliger = output[output['bygningstype'].str.startswith('1')]
-            industri = output[output['bygningstype'].str.startswith('2')]
-            kontor = output[output['bygningstype'].str.startswith('3')]
-            samferdsel = output[output['bygningstype'].str.startswith('4')]
-            hotell = output[output['bygningstype'].str.startswith('5')]
-            kultur = output[output['bygningstype'].str.startswith('6')]
-            helse = output[output['bygningstype'].str.startswith('7')]
-            brann = output[output['bygningstype'].str.startswith('8')]
-            annet = output[output['bygningstype'].str.startswith('9')]
             output_csv = pd.DataFrame(output)  # convert back to pandas dataframe
             output_csv["geometry"] = output_csv["geometry"].astype(str)
             st.session_state['output_csv'] = output_csv
-            # =============================================================================
-            # Plotting av matrikkeldata i kart og lagring av kartet
-            # =============================================================================
-            kartQDsyk = gdf_syk.explore(m=kartpunkt,style_kwds=dict(fill=False,color='red'),name ='QDsyk',control=False)
-            kartQDbol = gdf_bolig.explore(m=kartpunkt,style_kwds=dict(fill=False,color='orange'),name ='QDbolig',control=False)
-            kartQDvei = gdf_vei.explore(m=kartpunkt,style_kwds=dict(fill=False,color='black'),name ='QDvei',control=False)
-    
-            if not industri.empty:
-                kartindustri = industri.explore(m=kartpunkt, style_kwds=dict(color='black'), name="Industri/lager")
-            if not kontor.empty:
-                kartkontor = kontor.explore(m=kartpunkt, style_kwds=dict(color='black'), name="Kontor/forretning")
-            if not samferdsel.empty:
-                kartsamferdsel = samferdsel.explore(m=kartpunkt, style_kwds=dict(color='black'), name="Samferdsel")
-            if not hotell.empty:
-                karthotell = hotell.explore(m=kartpunkt, style_kwds=dict(color='red'), name="Hotell/restaurant")
-            if not kultur.empty:
-                kartkultur = kultur.explore(m=kartpunkt, style_kwds=dict(color='red'), name="Skole/bhg/idrett")
-            if not helse.empty:
-                karthelse = helse.explore(m=kartpunkt, style_kwds=dict(color='red'), name="Helse")
-            if not brann.empty:
-                kartbrann = brann.explore(m=kartpunkt, style_kwds=dict(color='red'), name="Brann/politi")
-            if not annet.empty:
-                kartannet = annet.explore(m=kartpunkt, style_kwds=dict(color='black'), name="Annet")
-            if not boliger.empty:
-                kartboliger = boliger.explore(m=kartpunkt, style_kwds=dict(color='orange'), name="Boliger")
-    
-            folium.LayerControl().add_to(kartpunkt)
-            #st_kart = st_folium(kartpunkt,width=672,zoom=13)
-            st.session_state['folium_map'] = kartpunkt
-            st_folium(st.session_state['folium_map'], width=672, zoom=13, key="map_tab1")
+            st.session_state['koordinater'] = pd.DataFrame({'x': output.geometry.x, 'y': output.geometry.y}) #til AMRISK-eksporten, uten å gå via WKT
         else:
-            output_csv = pd.DataFrame()
+            output_csv = pd.DataFrame(columns=KOLONNER) #tom, men med kolonnene, så AMRISK-fanen ikke bruker bygg fra en tidligere beregning
+            st.session_state['output_csv'] = output_csv
+            st.session_state['koordinater'] = pd.DataFrame(columns=['x', 'y'])
             st.write('Ingen bygninger eksponert :sunglasses:')
-            # =============================================================================
-            # kart uten utsatte objekter
-            # =============================================================================
-            kartQDsyk = gdf_syk.explore(m=kartpunkt,style_kwds=dict(fill=False,color='red'),name ='QDsyk',control=False)
-            kartQDbol = gdf_bolig.explore(m=kartpunkt,style_kwds=dict(fill=False,color='orange'),name ='QDbolig',control=False)
-            kartQDvei = gdf_vei.explore(m=kartpunkt,style_kwds=dict(fill=False,color='black'),name ='QDvei',control=False)
-            #st_kart = st_folium(kartpunkt,width=672,zoom=13)
-            st.session_state['folium_map'] = kartpunkt
-            st_folium(st.session_state['folium_map'], width=672, zoom=13, key="map_tab1")
+
+        with kjoring(maaling):
+            html = kart_html(siste["oesting"], siste["nording"], siste["NEI"])
+        st.iframe(html, width=672, height=700)
+
+        with kjoring(maaling):
+            statistikk, veger = sone_statistikk(siste["oesting"], siste["nording"], siste["NEI"])
+        st.session_state['veger'] = veger #til AMRISK-eksporten
+        with st.expander('Statistikk per QD-sone og trykkbånd'):
+            st.dataframe(statistikk, hide_index=True)
             
     # =============================================================================
     # Eksportering av data i CSV format
@@ -190,6 +226,16 @@ with tab1:
        mime='text/csv',
        icon=":material/download:",
        )
+
+    st.download_button(
+       label="Download zone statistics as CSV",
+       data=convert_df(statistikk),
+       file_name='sonestatistikk.csv',
+       on_click="ignore",
+       mime='text/csv',
+       icon=":material/download:",
+       disabled=statistikk.empty,
+       )
     
     
 # =============================================================================
@@ -201,52 +247,133 @@ with tab1:
 with tab2:
     if (st.session_state.get("last_inputs") and st.session_state.get("last_inputs").get("NEI")) is None:
         st.warning("Fyll inn data i fanen 'Input' først og kjør beregning.")
-        st.stop()
+    else:
+        amrdataframe = st.session_state.get('output_csv', pd.DataFrame()).copy()
     
-    amrdataframe = st.session_state.get('output_csv', pd.DataFrame()).copy()
+        # Always add the checkbox column (defaults to checked)
+        amrdataframe['Inkluder'] = True
     
-    # Always add the checkbox column (defaults to checked)
-    amrdataframe['Inkluder'] = True
+        edited = st.data_editor(
+            amrdataframe,
+            key="editor_output_csv",
+            width='stretch',
+            column_config={
+                'Inkluder': st.column_config.CheckboxColumn(
+                    "Inkluder",
+                    help="Huk av for å ta med bygget i AMRISK-eksporten",
+                    default=True,
+                ),
+                'geometry': None,
+                'bygningstype': None,
+            },
+            column_order=['Inkluder'] + [c for c in amrdataframe.columns if c != 'Inkluder'],
+        )
     
-    edited = st.data_editor(
-        amrdataframe,
-        key="editor_output_csv",
-        width='stretch',
-        column_config={
-            'Inkluder': st.column_config.CheckboxColumn(
-                "Inkluder",
-                help="Huk av for å ta med bygget i AMRISK-eksporten",
-                default=True,
-            ),
-            'geometry': None,
-            'bygningstype': None,
-        },
-        column_order=['Inkluder'] + [c for c in amrdataframe.columns if c != 'Inkluder'],
-    )
-    
-    st.session_state['output_csv'] = edited
+        st.session_state['output_csv'] = edited
+
+        veger = st.session_state.get('veger', pd.DataFrame())
+        ta_med_veier = st.checkbox(f'Ta med {len(veger)} veisegmenter innenfor QD_vei', value=False, disabled=veger.empty,
+                                   help="Hvert segment blir et objekt i punktet nærmest anlegget, med kjøretøy til stede som antall personer")
     
-    if st.button('Generer AMRISK-fil'):
-        if None in (oesting, nording, NEI):
-            st.warning("Mangler input eller ingen eksponerte bygg")
-        else:
-            # only included rows
-            to_export = edited[edited['Inkluder']].drop(columns=['Inkluder'], errors='ignore')
-            if to_export.empty:
-                st.warning("Ingen rader valgt for eksport.")
+        if st.button('Generer AMRISK-fil'):
+            if None in (oesting, nording, NEI):
+                st.warning("Mangler input eller ingen eksponerte bygg")
             else:
-                base = generate_amrisk_base_file(coord_x=oesting, coord_y=nording, charge_kg=NEI)
-                objects = generate_exposed_objects(to_export)
-                st.session_state['amrisk_file'] = base + "\n" + objects
-                st.success("Fil generert")
+                # only included rows
+                to_export = edited[edited['Inkluder']].drop(columns=['Inkluder'], errors='ignore')
+                if to_export.empty and not ta_med_veier:
+                    st.warning("Ingen rader valgt for eksport.")
+                else:
+                    koordinater = st.session_state.get('koordinater', pd.DataFrame(columns=['x', 'y'])).loc[to_export.index]
+                    x, y, navn = koordinater['x'].to_numpy(), koordinater['y'].to_numpy(), to_export.get('Navn', pd.Series(dtype=object)).to_numpy()
+                    index, personer = to_export.index.tolist(), [0.0] * len(to_export)
+                    if ta_med_veier:
+                        vx, vy, vnavn, vpersoner = amrisk_veger(veger)
+                        start = max(index, default=-1) + 1 #veiene nummereres etter byggene
+                        x, y, navn = np.r_[x, vx], np.r_[y, vy], np.r_[navn, vnavn]
+                        index, personer = index + list(range(start, start + len(vx))), personer + list(vpersoner)
+                    st.session_state['amrisk_export'] = dict(
+                        coord_x=oesting, coord_y=nording, charge_kg=NEI,
+                        x=x, y=y, navn=navn, index=index, personer=personer)
+                    st.success("Fil generert")
             
-    if 'amrisk_file' in st.session_state:    
-        st.download_button(
-           label="Export AMRISK2.5 file",
-           data=st.session_state['amrisk_file'].encode("utf-8"),
-           file_name="amrisk_export.amr25",
-           on_click="ignore",
-           mime='text/csv',
-           icon=":material/download:",
-
-           )
+        if 'amrisk_export' in st.session_state:
+            amrisk_export = st.session_state['amrisk_export']
+            st.download_button(
+               label="Export AMRISK2.5 file",
+               data=lambda: b"".join(chunk.encode("utf-8") for chunk in iter_amrisk_file(**amrisk_export)), #filen skrives først når brukeren laster ned
+               file_name="amrisk_export.amr25",
+               on_click="ignore",
+               mime='text/csv',
+               icon=":material/download:",
+
+               )
+
+# =============================================================================
+# TAB 3 – Hva om: ny NEI og trykkterskel uten ny henting av bygg
+# =============================================================================
+
+with tab3:
+    siste = st.session_state.get("last_inputs")
+    if not siste or siste.get("NEI") is None:
+        st.info("Kjør en beregning i fanen 'Input' først, så kan du prøve andre NEI og trykkterskler her.")
+    else:
+        NEI_maks = st.number_input('Største NEI som skal prøves', value=min(4 * siste['NEI'], 100000), step=1,
+                                   min_value=siste['NEI'], max_value=100000,
+                                   help="Byggene hentes én gang for QD_syk til denne mengden")
+        if st.button('Hent bygg for hva-om'):
+            st.session_state['scenario'] = (siste['oesting'], siste['nording'], NEI_maks)
+
+        if st.session_state.get('scenario', ())[:2] == (siste['oesting'], siste['nording']):
+            with kjoring(maaling):
+                scenario = hent_scenario(*st.session_state['scenario'], hentere())
+            if scenario.buildings.empty:
+                hent_scenario.clear(*st.session_state['scenario']) #kan skyldes en feil ved hentingen, se uten_tomme
+            NEI_hva_om = st.slider('NEI (kg)', 1, int(scenario.NEI_maks), min(siste['NEI'], int(scenario.NEI_maks)))
+            terskel = st.number_input('Trykkterskel (kPa)', value=0.0, min_value=0.0, step=1.0)
+
+            start = time.perf_counter()
+            oppsummering = scenario.oppsummering(NEI_hva_om, terskel) #kun vektorisert trykk og QD-masker, ingen henting eller join
+            st.caption(f"Beregnet på {(time.perf_counter() - start) * 1000:.0f} ms")
+
+            kol1, kol2, kol3, kol4 = st.columns(4)
+            kol1.metric(f"Innenfor QD syk ({oppsummering['QD_syk']} m)", oppsummering['antall QD_syk'])
+            kol2.metric(f"Innenfor QD bolig ({oppsummering['QD_bolig']} m)", oppsummering['antall QD_bolig'])
+            kol3.metric(f"Innenfor QD vei ({oppsummering['QD_vei']} m)", oppsummering['antall QD_vei'])
+            kol4.metric("Over terskel", oppsummering['antall over terskel'])
+            st.dataframe(pd.DataFrame({'kategori': list(KATEGORIER.values()),
+                                       'antall bygg': list(oppsummering['per kategori'].values())}), hide_index=True)
+
+            if st.checkbox('Vis trykkraster'):
+                trykk, bounds = scenario.trykk_raster(NEI_hva_om)
+                gdf, gdf_syk, gdf_bolig, gdf_vei = cached_qd_soner(siste['oesting'], siste['nording'], NEI_hva_om)
+                kart = gdf.explore(marker_type=folium.Marker(icon=folium.Icon(color='blue', icon='bomb', prefix='fa')),name='anlegg',control=False)
+                add_pressure_overlay(kart, trykk, bounds)
+                gdf_syk.explore(m=kart,style_kwds=dict(fill=False,color='red'),name ='QDsyk',control=False)
+                gdf_bolig.explore(m=kart,style_kwds=dict(fill=False,color='orange'),name ='QDbolig',control=False)
+                gdf_vei.explore(m=kart,style_kwds=dict(fill=False,color='black'),name ='QDvei',control=False)
+                st_folium(kart, width=672, zoom=13, key="map_tab3", returned_objects=[])
+
+# =============================================================================
+# Ytelsesmåling: tid, bytes, antall objekter og minne per steg i siste beregning
+# =============================================================================
+
+if maaling.steg:
+    st.session_state['maaling'] = maaling
+    if METRICS_FILE:
+        skriv_prometheus(maaling, METRICS_FILE)
+
+if vis_maaling:
+    with st.sidebar:
+        st.subheader('Ytelse')
+        forrige = st.session_state.get('maaling')
+        if forrige is None:
+            st.write('Ingen steg er kjørt ennå.')
+        else:
+            if forrige is not maaling:
+                st.caption('Alt i denne kjøringen kom fra cachen, viser forrige beregning.')
+            st.dataframe(forrige.tabell(), hide_index=True)
+            st.download_button('Last ned JSON', data=forrige.to_json(), file_name='tangos_maaling.json',
+                               mime='application/json', on_click='ignore')
+            st.download_button('Last ned Prometheus', data=forrige.to_prometheus(), file_name='tangos_maaling.prom',
+                               mime='text/plain', on_click='ignore')
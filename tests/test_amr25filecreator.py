@@ -0,0 +1,124 @@
+import datetime as dt
+import io
+import os
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+import shapely
+
+import amr25filecreator
+from amr25filecreator import generate_amrisk_base_file, generate_depot_base_file
+from amr25reader import parse_lines
+from site_index import SiteIndex, write_depot_amrisk
+
+DATA = os.path.join(os.path.dirname(__file__), 'data')
+
+
+class _FastDato(dt.datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 1, 2, 3, 4, 5)
+
+
+@pytest.fixture(autouse=True)
+def fast_dato(monkeypatch):
+    monkeypatch.setattr(amr25filecreator, 'datetime', _FastDato)
+
+
+def _referanse(navn):
+    with open(os.path.join(DATA, navn), encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+def _magasinblokk(nr, navn, ladninger, *linjer):
+    """Magasinblokken fra enkelt_magasin.amr25 (skrevet av den opprinnelige koden) med linjer byttet
+    ut for hånd. ladninger er ferdig formaterte (Q med debris t, Q t, P), linjer hele linjer som
+    erstatter linjen med samme ledetekst."""
+    linjer = {linje[:20].strip(): linje for linje in linjer}
+    mal = _referanse('enkelt_magasin.amr25').split('\n')
+    start = next(i for i, linje in enumerate(mal) if linje.startswith('Magazin name'))
+    slutt = next(i for i, linje in enumerate(mal) if linje.startswith('Number of charges'))
+    blokk = [f"Magazin name        {nr:>3}           {navn}"]
+    for linje in mal[start + 1:slutt]:
+        blokk.append(linjer.get(linje[:20].strip(), linje))
+    blokk.append(f"Number of charges   {nr:>3}{len(ladninger):>3}")
+    for q_debris, q, P in ladninger:
+        blokk += [f"Charge data in mag  {nr:>3}     {q_debris}     {q}     {P}",
+                  "Probability calcul              U 11", "Remarks on charge   ", " Charge = chg ind r "]
+    return blokk
+
+
+def _depotfil(*blokker):
+    mal = _referanse('enkelt_magasin.amr25').split('\n')
+    start = next(i for i, linje in enumerate(mal) if linje.startswith('Magazin name'))
+    slutt = next(i for i, linje in enumerate(mal) if linje.startswith(' Defined situations'))
+    hode = [linje.replace('Number of magazines  1', f'Number of magazines{len(blokker):>3}') for linje in mal[:start]]
+    return '\n'.join(hode + [linje for blokk in blokker for linje in blokk] + mal[slutt:])
+
+
+def test_ett_magasin_som_før():
+    # enkelt_magasin.amr25 er skrevet av generate_amrisk_base_file før flere magasiner ble støttet
+    referanse = _referanse('enkelt_magasin.amr25')
+    assert generate_amrisk_base_file(262000.5, 6649000.25, 1500, storage_name='Referanse') == referanse
+    magasin = {'x': 262000.5, 'y': 6649000.25, 'charge_kg': 1500}
+    assert generate_depot_base_file([magasin], storage_name='Referanse') == referanse
+
+
+def test_magasiner_med_egne_mål_og_flere_ladninger():
+    magasiner = [
+        {'name': 'A', 'x': 262000.0, 'y': 6649000.0, 'charges': [100, 250], 'remarks': 'Container',
+         'length': 10.0, 'width': 3.0, 'height': 2.5},
+        {'name': 'B', 'x': 262300.0, 'y': 6649000.0, 'charge_kg': 200},
+    ]
+    # tverrsnitt 3 · 2,5 = 7,5 m², volum 10 · 7,5 = 75 m³; P = 1,5e-4 + 1,5e-10 · Q
+    forventet = _depotfil(
+        _magasinblokk(1, 'A',
+                      [('1.10000000E-01', '1.00000000E-01', '1.50015000E-04'),
+                       ('2.75000000E-01', '2.50000000E-01', '1.50037500E-04')],
+                      'Coordinates x, y         2.62000000E+005     6.64900000E+006     0.00000000E+000',
+                      ' Remarks on mag                 Container           ',
+                      ' Length of mag        1.00000000E+001',
+                      ' Width of mag         3.00000000E+000',
+                      ' Height of mag        2.50000000E+000',
+                      ' Cross section        7.50000000E+000',
+                      ' Magazine volume      7.50000000E+001'),
+        _magasinblokk(2, 'B', [('2.20000000E-01', '2.00000000E-01', '1.50030000E-04')],
+                      'Coordinates x, y         2.62300000E+005     6.64900000E+006     0.00000000E+000'),
+    )
+    assert generate_depot_base_file(magasiner, storage_name='Referanse') == forventet
+
+
+def test_depot_bygg_i_to_soner_en_gang():
+    sites = pd.DataFrame({'id': ['A', 'B'], 'oesting': [262000.0, 262300.0], 'nording': [6649000.0, 6649000.0],
+                          'NEI': [100, 200], 'lengde': [10.0, None]})
+    bygg = gpd.GeoDataFrame({'bygningstype': [111, 211, 611]},
+                            geometry=shapely.points([262150.0, 261300.0, 263000.0], [6649000.0, 6649000.0, 6649000.0]),
+                            crs='EPSG:32633')
+    eksponering = SiteIndex(bygg).worst_case(sites)
+    eksponering['Navn'] = ['Midt', 'Vest', 'Ost']
+
+    f = io.StringIO(newline='')
+    write_depot_amrisk(f, sites, eksponering, storage_name='Referanse')
+    tekst = f.getvalue()
+
+    # A har bare lengde oppgitt: tverrsnitt 2,438 · 2,591 = 6,316858 m², volum 10 · 6,316858 m³
+    # objekter.amr25 er skrevet av den opprinnelige generate_exposed_objects
+    forventet = _depotfil(
+        _magasinblokk(1, 'A',
+                      [('1.10000000E-01', '1.00000000E-01', '1.50015000E-04')],
+                      'Coordinates x, y         2.62000000E+005     6.64900000E+006     0.00000000E+000',
+                      ' Remarks on mag                                     ',
+                      ' Length of mag        1.00000000E+001',
+                      ' Magazine volume      6.31685800E+001'),
+        _magasinblokk(2, 'B', [('2.20000000E-01', '2.00000000E-01', '1.50030000E-04')],
+                      'Coordinates x, y         2.62300000E+005     6.64900000E+006     0.00000000E+000'),
+    ) + '\n' + _referanse('objekter.amr25')
+    assert tekst == forventet
+
+    resultat = parse_lines(tekst.splitlines())
+    assert resultat.magasiner['navn'].tolist() == ['A', 'B']
+    assert resultat.ladninger['NEI'].round().tolist() == [100, 200]
+    assert eksponering.loc[0, 'antall anlegg'] == 2
+    assert resultat.objekter['Navn'].str.startswith('Midt').sum() == 1
+    assert len(resultat.objekter) == 3
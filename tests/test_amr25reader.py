@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+from amr25filecreator import generate_amrisk_base_file, generate_exposed_objects
+from amr25reader import parse_lines, read_amr25_files
+
+OESTING, NORDING, NEI = 262000.5, 6649000.25, 1500
+
+
+def _bygg():
+    return pd.DataFrame({
+        'Navn': ['Enebolig', 'Lager hall', 'Skole'],
+        'geometry': shapely.points([262100.125, 261950.0, 262300.75], [6649050.5, 6648800.0, 6649200.0]),
+    })
+
+
+def _tekst(magasin_x, magasin_y, NEI, bygg):
+    return generate_amrisk_base_file(magasin_x, magasin_y, NEI) + "\n" + generate_exposed_objects(bygg)
+
+
+def _uten_dato(tekst):
+    return [linje for linje in tekst.splitlines() if 'Save date' not in linje]
+
+
+def _sjekk(resultat, bygg):
+    assert len(resultat.magasiner) == 1
+    assert resultat.magasiner.loc[0, ['x', 'y']].tolist() == [OESTING, NORDING]
+    assert np.isclose(resultat.ladninger.loc[0, 'NEI'], NEI)
+    assert resultat.objekter['Navn'].tolist() == [f"{n.replace(' ', '_')}_{i}" for i, n in enumerate(bygg['Navn'])]
+    assert np.allclose(resultat.objekter['x'], shapely.get_x(bygg['geometry']))
+    assert np.allclose(resultat.objekter['y'], shapely.get_y(bygg['geometry']))
+
+
+def test_rundtur_parse_lines():
+    bygg = _bygg()
+    tekst = _tekst(OESTING, NORDING, NEI, bygg)
+    resultat = parse_lines(tekst.splitlines())
+    _sjekk(resultat, bygg)
+
+    # samme tekst lages på nytt fra det som ble lest
+    magasin = resultat.magasiner.iloc[0]
+    objekter = pd.DataFrame({
+        'Navn': resultat.objekter['Navn'].str.rsplit('_', n=1).str[0],
+        'geometry': shapely.points(resultat.objekter['x'], resultat.objekter['y']),
+    })
+    ny = _tekst(magasin['x'], magasin['y'], resultat.ladninger.loc[0, 'NEI'], objekter)
+    assert _uten_dato(ny) == _uten_dato(tekst)
+
+
+def test_rundtur_filer(tmp_path):
+    bygg = _bygg()
+    paths = []
+    for i in range(2):
+        path = tmp_path / f'prosjekt{i}.amr25'
+        path.write_text(_tekst(OESTING, NORDING, NEI, bygg), encoding='utf-8')
+        paths.append(str(path))
+
+    resultat = read_amr25_files(paths, workers=2)
+
+    assert resultat.magasiner['fil'].tolist() == ['prosjekt0.amr25', 'prosjekt1.amr25']
+    for fil in ('prosjekt0.amr25', 'prosjekt1.amr25'):
+        _sjekk(type(resultat)(*(tabell[tabell['fil'] == fil].reset_index(drop=True) for tabell in resultat)), bygg)
+
+
+def test_objektnavn_med_mellomrom():
+    tekst = generate_amrisk_base_file(OESTING, NORDING, NEI) + """
+ Exposed objects       3
+Object name              1  Skole nord Exposed object 
+ Number of persons       2.50000000E+002
+Object points       NDNF   2.62100000E+005     6.64905000E+006     0.00000000E+000
+Object name              2  Barnehage  Sol og Vind   Exposed object
+Object points       NDNF   2.62200000E+005     6.64906000E+006     0.00000000E+000
+Object name              3  Hytte
+Object points       NDNF   2.62300000E+005     6.64907000E+006     0.00000000E+000
+"""
+    objekter = parse_lines(tekst.splitlines()).objekter
+    assert objekter['Navn'].tolist() == ['Skole nord', 'Barnehage  Sol og Vind', 'Hytte']
+    assert objekter['beskrivelse'].tolist() == ['Exposed object', 'Exposed object', '']
+    assert objekter['Number of persons'].tolist()[0] == 250
+    assert objekter['x'].tolist() == [262100, 262200, 262300]
@@ -0,0 +1,67 @@
+import geopandas as gpd
+import pytest
+import requests
+
+import batch
+import get_matrikkel_data
+import http_fetch
+from tile_cache import TileCache
+from pipeline import KOLONNER
+
+
+def test_read_sites_validerer(tmp_path):
+    path = tmp_path / 'sites.csv'
+    path.write_text('id,oesting,nording,NEI\na,262000,6649000,1000\nb,262000,,1000\nc,262000,6649000,0\n')
+    with pytest.raises(ValueError, match='b, c'):
+        batch.read_sites(str(path))
+
+
+def test_filnavn():
+    assert batch.filnavn('../lager 1/a') == '_lager_1_a'
+    assert batch.filnavn('Øst-3.b') == 'Øst-3.b'
+
+
+def test_run_cluster_lagrer_steder_som_ikke_feiler(tmp_path, monkeypatch):
+    def analyse_site(oesting, nording, NEI, kast_feil=False):
+        if NEI == 13:
+            raise RuntimeError('feil i henting')
+        return gpd.GeoDataFrame(columns=KOLONNER, geometry='geometry', crs='EPSG:32633'), gpd.GeoDataFrame()
+
+    monkeypatch.setattr(batch, 'analyse_site', analyse_site)
+    (tmp_path / 'sites').mkdir()
+    sites = [{'id': 'ok', 'oesting': 1.0, 'nording': 2.0, 'NEI': 100},
+             {'id': 'feil', 'oesting': 1.0, 'nording': 2.0, 'NEI': 13}]
+
+    checkpoint = tmp_path / 'checkpoint.jsonl'
+    summaries, feil = batch.run_cluster(sites, str(tmp_path), str(checkpoint))
+
+    assert [s['id'] for s in summaries] == ['ok']
+    assert feil[0][0] == 'feil' and 'feil i henting' in feil[0][1]
+    assert (tmp_path / 'sites' / 'ok.csv').exists()
+    assert list(batch.read_checkpoint(str(checkpoint))) == ['ok']
+
+
+def test_feil_i_hentingen_logges_ikke(tmp_path, monkeypatch):
+    def get(*args, **kwargs):
+        raise requests.exceptions.ConnectionError('ingen forbindelse')
+
+    monkeypatch.setattr(http_fetch, 'get', get)
+    monkeypatch.setattr(get_matrikkel_data, '_matrikkel_cache',
+                        TileCache('matrikkel', get_matrikkel_data.fetch_matrikkel_bbox, id_column='gml_id',
+                                  cache_dir=str(tmp_path / 'cache')))
+    (tmp_path / 'sites').mkdir()
+    checkpoint = tmp_path / 'checkpoint.jsonl'
+
+    summaries, feil = batch.run_cluster([{'id': 'a', 'oesting': 262000.0, 'nording': 6649000.0, 'NEI': 100}],
+                                        str(tmp_path), str(checkpoint))
+
+    assert summaries == [] and feil[0][0] == 'a' and 'ConnectionError' in feil[0][1]
+    assert batch.read_checkpoint(str(checkpoint)) == {}
+
+
+def test_read_checkpoint_hopper_over_halvskrevet_linje(tmp_path):
+    checkpoint = tmp_path / 'checkpoint.jsonl'
+    batch.write_checkpoint(str(checkpoint), {'id': 'a', 'antall bygg': 3})
+    with open(checkpoint, 'a', encoding='utf-8') as f:
+        f.write('{"id": "b", "antall')
+    assert batch.read_checkpoint(str(checkpoint)) == {'a': {'id': 'a', 'antall bygg': 3}}
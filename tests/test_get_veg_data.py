@@ -0,0 +1,32 @@
+import geopandas as gpd
+import shapely
+
+from get_veg_data import join_fartsgrense
+
+
+def _veg(linjer, stedfestinger, **kolonner):
+    return gpd.GeoDataFrame({**kolonner, 'Stedfesting': stedfestinger},
+                            geometry=[shapely.LineString(l) for l in linjer], crs='EPSG:5973')
+
+
+def test_join_fartsgrense_uten_treff():
+    veg = _veg([[(0, 0), (100, 0)]], [[(1, 0.0, 1.0)]], Vegobj_id=[1], ÅDT_total=[500])
+    fart = _veg([[(5000, 5000), (5100, 5000)]], [[(2, 0.0, 1.0)]], Vegobj_id=[2], Fartsgrense=[80])
+
+    resultat = join_fartsgrense(veg, fart)
+
+    assert len(resultat) == 1
+    assert resultat['Fartsgrense'].isna().all()
+    assert resultat['Fartsgrenser'].isna().all()
+
+
+def test_join_fartsgrense_samme_veglenke():
+    veg = _veg([[(0, 0), (100, 0)], [(0, 50), (100, 50)]], [[(1, 0.0, 1.0)], [(3, 0.0, 1.0)]], Vegobj_id=[1, 3])
+    fart = _veg([[(0, 0), (50, 0)], [(50, 0), (100, 0)]], [[(1, 0.0, 0.5)], [(1, 0.5, 1.0)]],
+                Vegobj_id=[2, 4], Fartsgrense=[60, 80])
+
+    resultat = join_fartsgrense(veg, fart)
+
+    assert resultat.loc[0, 'Fartsgrense'] == 80
+    assert resultat.loc[0, 'Fartsgrenser'] == '60/80'
+    assert resultat['Fartsgrense'].isna()[1]
@@ -0,0 +1,79 @@
+import itertools
+
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+
+from inkrementell import InkrementellHenting, rektangler
+
+GAMMEL = (1000.0, 2000.0, 2000.0, 3000.0)
+
+
+@pytest.mark.parametrize('ny', [
+    (1300.0, 2000.0, 2300.0, 3000.0),  # flyttet langs x
+    (1250.5, 1800.25, 2250.5, 2800.25),  # flyttet på skrå
+    (900.0, 1900.0, 2100.0, 3100.0),  # forstørret rundt den gamle
+    (1000.0, 2000.0, 2600.0, 3400.0),  # forstørret mot nordøst
+])
+def test_rektangler_dekker_differansen_uten_overlapp(ny):
+    omrade = shapely.box(*ny).difference(shapely.box(*GAMMEL))
+    rekt = [shapely.box(*r) for r in rektangler(omrade)]
+
+    assert sum(r.area for r in rekt) == pytest.approx(omrade.area)
+    assert shapely.union_all(rekt).symmetric_difference(omrade).area == pytest.approx(0, abs=1e-6)
+    for a, b in itertools.combinations(rekt, 2):
+        assert a.intersection(b).area == pytest.approx(0, abs=1e-9)
+
+
+def test_rektangler_tomt():
+    assert rektangler(shapely.box(0, 0, 10, 10).difference(shapely.box(-1, -1, 11, 11))) == []
+
+
+class _Kilde:
+    """Punkter i et rutenett med 10 m avstand; husker hvilke bokser som ble hentet."""
+
+    def __init__(self):
+        x, y = np.meshgrid(np.arange(0, 5000, 10.0), np.arange(0, 5000, 10.0))
+        self.punkter = gpd.GeoDataFrame({'id': np.arange(x.size)}, geometry=shapely.points(x.ravel(), y.ravel()),
+                                        crs='EPSG:32633')
+        self.kall = []
+
+    def __call__(self, minx, miny, maxx, maxy):
+        self.kall.append((minx, miny, maxx, maxy))
+        return self.punkter.cx[minx:maxx, miny:maxy]
+
+    def direkte(self, *bbox):
+        return set(self(*bbox)['id'])
+
+
+def test_get_bbox_henter_bare_det_nye():
+    kilde = _Kilde()
+    henter = InkrementellHenting(kilde, 'id', 'EPSG:32633')
+    assert set(henter.get_bbox(*GAMMEL)['id']) == kilde.direkte(*GAMMEL)
+
+    kilde.kall.clear()
+    ny = (1300.0, 2100.0, 2300.0, 3100.0)
+    assert set(henter.get_bbox(*ny)['id']) == kilde.direkte(*ny)
+    hentet = [shapely.box(*b) for b in kilde.kall[:-1]]  # siste kall er kilde.direkte
+    assert sum(b.area for b in hentet) == pytest.approx(shapely.box(*ny).difference(shapely.box(*GAMMEL)).area)
+    assert henter.hentet_andel(*ny) == pytest.approx(1 - 700 * 900 / 1000 ** 2)
+
+
+def test_nullstilles_over_maks_faktor():
+    kilde = _Kilde()
+    henter = InkrementellHenting(kilde, 'id', 'EPSG:32633', maks_faktor=4)
+    for i in range(4):  # hvert steg flyttes boksen 800 m, dekket område vokser med 0,8 bokser
+        boks = (1000.0 + 800 * i, 1000.0, 2000.0 + 800 * i, 2000.0)
+        assert set(henter.get_bbox(*boks)['id']) == kilde.direkte(*boks)
+    assert henter.dekket.area == pytest.approx(3.4e6)
+
+    boks = (1000.0 + 800 * 4, 1000.0, 2000.0 + 800 * 4, 2000.0)
+    assert set(henter.get_bbox(*boks)['id']) == kilde.direkte(*boks)
+    assert henter.dekket.equals(shapely.box(*boks))  # 4,2 bokser > maks_faktor: bare den nye boksen
+    assert len(henter.data) == len(kilde.direkte(*boks))
+
+    # flyttet helt bort fra det dekkede området: alt hentes på nytt
+    boks = (100.0, 3500.0, 600.0, 4000.0)
+    assert set(henter.get_bbox(*boks)['id']) == kilde.direkte(*boks)
+    assert henter.hentet_andel(*boks) == pytest.approx(1)
@@ -0,0 +1,57 @@
+import threading
+import tracemalloc
+
+import pytest
+
+from instrumentering import kjoring, steg
+
+
+@pytest.fixture(autouse=True)
+def uten_tracemalloc():
+    if tracemalloc.is_tracing():
+        pytest.skip('tracemalloc går allerede')
+    yield
+    tracemalloc.stop()
+
+
+def test_samtidige_kjoringer_deler_tracemalloc():
+    a_startet, a_ferdig = threading.Event(), threading.Event()
+    resultat = {}
+
+    def kjoring_a():
+        with kjoring('a', minne=True):
+            a_startet.set()
+            a_ferdig.wait()
+
+    traad = threading.Thread(target=kjoring_a)
+    traad.start()
+    a_startet.wait()
+    with kjoring('b', minne=True) as maaling:
+        a_ferdig.set()
+        traad.join()  # a er ferdig, men b måler fortsatt
+        resultat['går'] = tracemalloc.is_tracing()
+        with steg('b steg'):
+            liste = [0] * 100_000
+    assert resultat['går']
+    assert maaling.steg[0]['maks minne MB'] > 0
+    assert not tracemalloc.is_tracing()
+    del liste
+
+
+def test_steg_uten_minne_naar_tracemalloc_stoppes_underveis():
+    with kjoring('a', minne=True) as maaling:
+        with steg('ytre'):
+            with steg('indre'):
+                tracemalloc.stop()
+    assert [s['steg'] for s in maaling.steg] == ['indre', 'ytre']
+    assert all('maks minne MB' not in s and '_topp' not in s for s in maaling.steg)
+    assert maaling.tabell()['maks minne MB'].isna().all()
+
+
+def test_lar_tracemalloc_startet_av_andre_gaa():
+    tracemalloc.start()
+    with kjoring('a', minne=True) as maaling:
+        with steg('x'):
+            pass
+    assert tracemalloc.is_tracing()
+    assert 'maks minne MB' in maaling.steg[0]
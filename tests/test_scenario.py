@@ -0,0 +1,45 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+
+from pipeline import QD_func, SONER, eksponerte_bygg
+from scenario import Scenario
+
+OESTING, NORDING, NEI_MAKS = 262000.0, 6649000.0, 5000
+
+
+@pytest.fixture(scope='module')
+def bygg():
+    rng = np.random.default_rng(3)
+    QD = QD_func(NEI_MAKS)[0]
+    x = rng.uniform(OESTING - QD, OESTING + QD, 3000)
+    y = rng.uniform(NORDING - QD, NORDING + QD, 3000)
+    x[:2], y[:2] = OESTING + QD_func(1000)[1], NORDING + QD_func(1000)[2]  # på QD_bolig og QD_vei for NEI 1000
+    y[0], x[1] = NORDING, OESTING
+    typer = rng.choice([111, 121, 211, 311, 611, 999], len(x))
+    return gpd.GeoDataFrame({'bygningstype': typer}, geometry=shapely.points(x, y), crs='EPSG:32633')
+
+
+@pytest.mark.parametrize('NEI', [100, 1000, 2500, NEI_MAKS])
+def test_soner_som_pipeline(bygg, NEI):
+    scenario = Scenario(bygg, OESTING, NORDING, NEI_MAKS)
+    forventet = eksponerte_bygg(bygg, shapely.Point(OESTING, NORDING), NEI)
+    output = scenario.eksponerte_bygg(NEI)
+
+    antall = forventet['sone'].value_counts().reindex(SONER, fill_value=0)
+    assert output['sone'].value_counts().reindex(SONER, fill_value=0).tolist() == antall.tolist()
+    oppsummering = scenario.oppsummering(NEI)
+    assert oppsummering['antall QD_syk'] == len(forventet)
+    assert oppsummering['antall QD_bolig'] == antall['QD_bolig'] + antall['QD_vei']
+    assert oppsummering['antall QD_vei'] == antall['QD_vei']
+    assert oppsummering['per kategori'] == {k: int((forventet['kategori'] == k).sum()) for k in oppsummering['per kategori']}
+
+    kolonner = ['bygningstype', 'avstand m', 'trykk kPa', 'sone']
+    sorter = lambda df: df[kolonner].sort_values(kolonner).reset_index(drop=True)
+    assert sorter(output).equals(sorter(forventet))
+
+
+def test_nei_over_maks(bygg):
+    with pytest.raises(ValueError):
+        Scenario(bygg, OESTING, NORDING, NEI_MAKS).oppsummering(NEI_MAKS + 1)
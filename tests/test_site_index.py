@@ -0,0 +1,40 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from blast_model import incident_pressure_array
+from site_index import SiteIndex
+
+SITES = pd.DataFrame({'id': ['A', 'B'], 'oesting': [262000.0, 262300.0], 'nording': [6649000.0, 6649000.0],
+                      'NEI': [100, 200]})
+
+
+def _bygg(x):
+    return gpd.GeoDataFrame({'bygningstype': [111] * len(x)},
+                            geometry=shapely.points(x, np.full(len(x), 6649000.0)), crs='EPSG:32633')
+
+
+def test_pairs():
+    # 262150: 150 m fra begge, 262100: 100 m fra A og 200 m fra B, 261300: bare innenfor QD_syk for A (800 m)
+    par = SiteIndex(_bygg([262150.0, 262100.0, 261300.0, 270000.0])).pairs(SITES)
+    par = par.sort_values(['bygg', 'anlegg']).reset_index(drop=True)
+    assert par[['bygg', 'anlegg']].values.tolist() == [[0, 'A'], [0, 'B'], [1, 'A'], [1, 'B'], [2, 'A']]
+    assert par['avstand m'].tolist() == [150, 150, 100, 200, 700]
+    NEI = np.array([100, 200, 100, 200, 100])
+    assert par['trykk kPa'].tolist() == pytest.approx(incident_pressure_array(par['avstand m'].to_numpy(), NEI).round(2))
+
+
+def test_worst_case_styrende_anlegg_og_maks_trykk():
+    resultat = SiteIndex(_bygg([262150.0, 262100.0, 261300.0, 270000.0])).worst_case(SITES)
+
+    assert resultat.index.tolist() == [0, 1, 2]  # bygget 8 km unna er ikke med
+    # like langt fra begge: B har størst NEI og gir høyest trykk
+    assert resultat.loc[0, 'styrende anlegg'] == 'B'
+    assert resultat.loc[0, 'maks trykk kPa'] == pytest.approx(incident_pressure_array(150.0, 200).round(2))
+    # nærmest A: 100 m fra A gir mer enn 200 m fra B
+    assert resultat.loc[1, 'styrende anlegg'] == 'A'
+    assert resultat.loc[1, 'avstand m'] == 100
+    assert resultat.loc[1, 'maks trykk kPa'] == pytest.approx(incident_pressure_array(100.0, 100).round(2))
+    assert resultat['antall anlegg'].tolist() == [2, 2, 1]
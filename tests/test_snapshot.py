@@ -0,0 +1,66 @@
+import numpy as np
+import geopandas as gpd
+import pyogrio
+import shapely
+
+import snapshot
+from get_veg_data import get_veg_data
+from get_matrikkel_data import get_matrikkel_data
+
+
+def _uttrekk(path, n=1000):
+    """Et lite bulkuttrekk som i Geonorge: lokalId, bygningstype som tekst og EPSG:25833."""
+    rng = np.random.default_rng(0)
+    gdf = gpd.GeoDataFrame({'lokalId': [f'b{i}' for i in range(n)],
+                            'bygningstype': rng.integers(100, 900, n).astype(str)},
+                           geometry=shapely.points(rng.uniform(0, 10000, n), rng.uniform(0, 10000, n)),
+                           crs='EPSG:25833')
+    pyogrio.write_dataframe(gdf, path)
+    return gdf
+
+
+def test_import_og_bbox(tmp_path, monkeypatch):
+    uttrekk = _uttrekk(str(tmp_path / 'uttrekk.gpkg'))
+    path = str(tmp_path / 'snapshot.gpkg')
+    assert snapshot.importer_matrikkel(path, str(tmp_path / 'uttrekk.gpkg'), batch=300) == len(uttrekk)
+
+    bbox = (2000, 3000, 4500, 6000)
+    resultat = snapshot.les_bbox('matrikkel', *bbox, path=path)
+    x, y = shapely.get_x(uttrekk.geometry.values), shapely.get_y(uttrekk.geometry.values)
+    forventet = uttrekk[(x >= bbox[0]) & (x <= bbox[2]) & (y >= bbox[1]) & (y <= bbox[3])]
+    assert sorted(resultat['gml_id']) == sorted(forventet['lokalId'])
+    assert resultat['bygningstype'].dtype.kind == 'i'
+
+    monkeypatch.setattr(snapshot, 'SNAPSHOT', path)
+    bygg = get_matrikkel_data(dict(zip(['minx', 'miny', 'maxx', 'maxy'], bbox)))
+    assert len(bygg) == len(forventet)
+
+
+def test_snapshot_uten_veglag(tmp_path, monkeypatch):
+    _uttrekk(str(tmp_path / 'uttrekk.gpkg'), n=10)
+    path = str(tmp_path / 'snapshot.gpkg')
+    snapshot.importer_matrikkel(path, str(tmp_path / 'uttrekk.gpkg'))
+    monkeypatch.setattr(snapshot, 'SNAPSHOT', path)
+
+    adt = snapshot.les_bbox('adt', 0, 0, 10000, 10000)
+    assert adt.empty and list(adt.columns) == [*snapshot.LAG['adt'][1], 'geometry']
+    assert get_veg_data({'minx': 0, 'miny': 0, 'maxx': 10000, 'maxy': 10000}).empty
+
+
+def test_nvdb_import_gir_samme_veier(tmp_path, monkeypatch):
+    import bench_fixtures
+    from pipeline import QD_func, sone_bbox
+
+    data = bench_fixtures.synthetic(100, n_veg=200)
+    bbox = sone_bbox(data.oesting, data.nording, QD_func(data.NEI)[2])
+    path = str(tmp_path / 'snapshot.gpkg')
+    with bench_fixtures.StubServer(data) as server, bench_fixtures.offline(server):
+        snapshot.importer_nvdb(path, bbox['minx'] - 100, bbox['miny'] - 100, bbox['maxx'] + 100, bbox['maxy'] + 100,
+                               flis=500)
+        direkte = get_veg_data(bbox)
+    monkeypatch.setattr(snapshot, 'SNAPSHOT', path)
+    offline = get_veg_data(bbox)
+
+    direkte, offline = (v.sort_values('Vegobj_id').reset_index(drop=True) for v in (direkte, offline))
+    assert list(offline['Vegobj_id']) == list(direkte['Vegobj_id'])
+    assert list(offline['Fartsgrenser']) == list(direkte['Fartsgrenser'])
@@ -0,0 +1,79 @@
+import io
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pytest
+import shapely
+
+import site_index
+from amr25reader import parse_lines
+from pipeline import QD_func, SONER
+from sonestatistikk import TRYKKBAND, _lengde_innenfor, sonestatistikk
+
+OESTING, NORDING = 262000.0, 6649000.0
+
+
+def veger():
+    return np.array([
+        shapely.LineString([(OESTING - 500, NORDING + 10), (OESTING + 500, NORDING + 10)]),  # gjennom sentrum
+        shapely.LineString([(OESTING + 50, NORDING - 300), (OESTING + 50, NORDING), (OESTING + 400, NORDING + 20)]),
+        shapely.MultiLineString([[(OESTING - 90, NORDING - 90), (OESTING - 20, NORDING - 30)],
+                                 [(OESTING + 150, NORDING + 150), (OESTING + 260, NORDING + 40)]]),
+        shapely.LineString([(OESTING + 1000, NORDING), (OESTING + 1100, NORDING)]),  # utenfor alle sirklene
+        shapely.LineString([(OESTING + 30, NORDING + 40), (OESTING + 30, NORDING + 40)]),  # uten lengde
+    ], dtype=object)
+
+
+def test_lengde_innenfor_som_shapely_intersection():
+    radier = [400, 200, 60, 0]
+    lengde = _lengde_innenfor(veger(), OESTING, NORDING, radier)
+    for k, r in enumerate(radier):
+        sirkel = shapely.Point(OESTING, NORDING).buffer(r, quad_segs=2048)
+        forventet = shapely.length(shapely.intersection(veger(), sirkel))
+        np.testing.assert_allclose(lengde[:, k], forventet, atol=1e-2)
+
+
+def test_sonestatistikk_teller_som_groupby():
+    rng = np.random.default_rng(1)
+    n = 500
+    output = pd.DataFrame({
+        'sone': rng.choice(SONER, n),
+        'trykk kPa': rng.uniform(0, 150, n),
+        'kategori': rng.integers(0, 10, n),
+    })
+    statistikk = sonestatistikk(output, None, OESTING, NORDING, 1000).set_index(['gruppe', 'verdi'])
+
+    band = np.searchsorted(TRYKKBAND, output['trykk kPa'], side='right')
+    forventet = output.assign(band=band).groupby(['sone', 'kategori']).size()
+    for (sone, kategori), antall in forventet.items():
+        assert statistikk.loc[('sone', sone), f'bygg kategori {kategori}'] == antall
+    forventet = output.assign(band=band).groupby(['band', 'kategori']).size()
+    soner = statistikk.loc['trykkband']
+    for (b, kategori), antall in forventet.items():
+        assert soner.iloc[b][f'bygg kategori {kategori}'] == antall
+    assert soner['antall bygg'].sum() == n
+
+
+def test_depot_amrisk_med_veger(monkeypatch):
+    sites = pd.DataFrame({'id': ['A', 'B'], 'oesting': [OESTING, OESTING + 300], 'nording': [NORDING] * 2,
+                          'NEI': [1000, 1000]})
+    QD_vei = QD_func(1000)[2]
+    veg_data = gpd.GeoDataFrame({
+        'Vegobj_id': [1, 2],
+        'ÅDT_total': [5000, 1000],
+        'Fartsgrense': [60, 80],
+    }, geometry=[shapely.LineString([(OESTING + 150, NORDING - 50), (OESTING + 150, NORDING + 50)]),  # nær begge
+                 shapely.LineString([(OESTING, NORDING + 3 * QD_vei), (OESTING + 10, NORDING + 3 * QD_vei)])],
+        crs='EPSG:32633')
+    monkeypatch.setattr(site_index, 'get_veg_data', lambda row: veg_data)
+
+    veier = site_index.depot_veger(sites)
+    assert veier['Vegobj_id'].tolist() == [1]
+
+    eksponering = gpd.GeoDataFrame({'Navn': ['Bygg']}, geometry=[shapely.Point(OESTING + 10, NORDING)], crs='EPSG:32633')
+    f = io.StringIO()
+    site_index.write_depot_amrisk(f, sites, eksponering, veger=veier)
+    objekter = parse_lines(f.getvalue().splitlines()).objekter
+    assert objekter['Navn'].tolist() == ['Bygg_0', 'Vei_1_1']
+    assert objekter['Number of persons'].tolist() == [0, pytest.approx(veier['kjøretøy til stede'][0] * 1.3, abs=1e-4)]
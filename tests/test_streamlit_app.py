@@ -0,0 +1,51 @@
+import ast
+import os
+
+import geopandas as gpd
+import pytest
+import shapely
+
+import get_matrikkel_data
+import get_veg_data
+
+AppTest = pytest.importorskip('streamlit.testing.v1').AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'streamlit_app.py')
+OESTING, NORDING = 262000, 6649000
+
+
+def test_amrisk_med_bare_veier_naar_ingen_bygg_er_eksponert(monkeypatch):
+    veier = gpd.GeoDataFrame({'Vegobj_id': [7], 'ÅDT_total': [4000], 'Fartsgrense': [60]},
+                             geometry=[shapely.LineString([(OESTING - 50, NORDING + 20), (OESTING + 50, NORDING + 20)])],
+                             crs='EPSG:5973')
+    monkeypatch.setattr(get_matrikkel_data, 'get_matrikkel_data', lambda *args, **kwargs: gpd.GeoDataFrame())
+    monkeypatch.setattr(get_veg_data, 'get_veg_data', lambda *args, **kwargs: veier)
+
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.run()
+    at.session_state['output_csv'] = gpd.GeoDataFrame({'Navn': ['Gammelt_bygg']})  # fra en tidligere beregning
+    at.number_input[0].set_value(NORDING)
+    at.number_input[1].set_value(OESTING)
+    at.number_input[2].set_value(100)
+    at.button[0].click().run()
+    assert not at.exception
+
+    next(c for c in at.checkbox if 'veisegmenter' in c.label).check().run()
+    next(b for b in at.button if b.label == 'Generer AMRISK-fil').click().run()
+    assert not at.exception
+    eksport = at.session_state['amrisk_export']
+    assert list(eksport['navn']) == ['Vei_7']
+    assert eksport['personer'][0] > 0
+
+
+def test_steg_med_cache_leser_ikke_okten():
+    # cachen deles av alle øktene, så hentere må sendes inn utenfra og ikke leses fra st.session_state
+    with open(APP, encoding='utf-8') as f:
+        tre = ast.parse(f.read())
+    cachet = [node for node in tre.body if isinstance(node, ast.FunctionDef)
+              and any('cache_' in ast.unparse(d) for d in node.decorator_list)]
+    assert {'_eksponerte_bygg', '_kart_html', 'hent_scenario'} <= {node.name for node in cachet}
+    for node in cachet:
+        navn = {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+        attributter = {n.attr for n in ast.walk(node) if isinstance(n, ast.Attribute)}
+        assert 'hentere' not in navn and 'session_state' not in attributter, node.name
@@ -0,0 +1,40 @@
+import get_matrikkel_data
+from bench_fixtures import StubServer, synthetic
+from tile_cache import TileCache
+from wfs_gml import antall_returnert
+
+
+def test_get_bbox_henter_flisene_bare_en_gang(tmp_path, monkeypatch):
+    fixtures = synthetic(200, 0)
+    with StubServer(fixtures) as server:
+        monkeypatch.setattr(get_matrikkel_data, 'WFS_URL', server.wfs_url)
+        cache = TileCache('matrikkel', get_matrikkel_data.fetch_matrikkel_bbox, id_column='gml_id',
+                          cache_dir=str(tmp_path))
+        bbox = fixtures.oesting - 1500, fixtures.nording - 1500, fixtures.oesting + 1500, fixtures.nording + 1500
+
+        forste = cache.get_bbox(*bbox)
+        kall = server.requests
+        assert kall > 0
+        andre = cache.get_bbox(*bbox)
+        assert server.requests == kall
+
+    assert len(forste) == len(andre) > 0
+    assert sorted(forste['gml_id']) == sorted(andre['gml_id'])
+    assert forste['gml_id'].is_unique
+
+
+def test_tom_featurecollection_med_gdal(tmp_path, monkeypatch):
+    fixtures = synthetic(20, 0)
+    with StubServer(fixtures) as server:
+        monkeypatch.setattr(get_matrikkel_data, 'WFS_URL', server.wfs_url)
+        monkeypatch.setattr(get_matrikkel_data, 'GML_PARSER', 'gdal')
+        gdf = get_matrikkel_data.fetch_matrikkel_bbox(0, 0, 10, 10)
+    assert gdf.empty
+
+
+def test_antall_returnert():
+    assert antall_returnert(b'<?xml version="1.0"?>\n<wfs:FeatureCollection xmlns:wfs="http://www.opengis.net/wfs/2.0"\n'
+                            b'  numberMatched="unknown"\n  numberReturned="0"/>') == 0
+    assert antall_returnert(b'<FeatureCollection numberReturned="12"><member/></FeatureCollection>') == 12
+    assert antall_returnert(b'<FeatureCollection numberReturned="unknown"/>') is None
+    assert antall_returnert(b'<FeatureCollection/>') is None
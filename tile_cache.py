@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+Lokal diskcache for geodata hentet per bounding box. Forespørsler snappes til et fast
+rutenett av UTM33-fliser, hver flis lagres som GeoParquet, og en liten SQLite-indeks
+holder styr på hentetidspunkt (TTL), sist brukt (LRU) og størrelse.
+"""
+
+import os
+import math
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+import shapely
+import pandas as pd
+import geopandas as gpd
+from http_fetch import map_concurrent, merge_frames
+from instrumentering import instrumentert
+
+CACHE_DIR = os.environ.get('TANGOS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'tangos'))
+TILE_SIZE = float(os.environ.get('TANGOS_TILE_SIZE', 1000))  # meter
+TTL = float(os.environ.get('TANGOS_CACHE_TTL', 7 * 24 * 3600))  # sekunder
+MAX_BYTES = int(os.environ.get('TANGOS_CACHE_MAX_BYTES', 500 * 1024**2))
+
+
+class TileCache:
+    """Flisbasert cache foran en hentefunksjon fetch_bbox(minx, miny, maxx, maxy) -> GeoDataFrame.
+
+    fetch_bbox skal kaste exception ved feil, slik at feil aldri caches som tomme fliser.
+    id_column brukes til å fjerne duplikater for objekter som ligger på flisgrensene.
+    """
+
+    def __init__(self, name, fetch_bbox, id_column=None, crs='EPSG:32633',
+                 tile_size=TILE_SIZE, ttl=TTL, max_bytes=MAX_BYTES, cache_dir=CACHE_DIR):
+        self.name = name
+        self.fetch_bbox = fetch_bbox
+        self.id_column = id_column
+        self.crs = crs
+        self.tile_size = tile_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.dir = os.path.join(cache_dir, name)
+        os.makedirs(self.dir, exist_ok=True)
+        with self._connect() as con:
+            con.execute('CREATE TABLE IF NOT EXISTS tiles (key TEXT PRIMARY KEY, fetched REAL, used REAL, nbytes INTEGER)')
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(os.path.join(self.dir, 'index.sqlite'), timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _key(self, i, j):
+        return f'{self.tile_size:g}_{i}_{j}'
+
+    def _path(self, key):
+        return os.path.join(self.dir, key + '.parquet')
+
+    def tiles_for_bbox(self, minx, miny, maxx, maxy):
+        """Flisindekser (i, j) som dekker bbox."""
+        s = self.tile_size
+        return [(i, j)
+                for i in range(math.floor(minx / s), math.floor(maxx / s) + 1)
+                for j in range(math.floor(miny / s), math.floor(maxy / s) + 1)]
+
+    def tile_bounds(self, i, j):
+        s = self.tile_size
+        return i * s, j * s, (i + 1) * s, (j + 1) * s
+
+    def missing_tiles(self, tiles):
+        """Fliser som ikke finnes i cachen eller er eldre enn TTL."""
+        now = time.time()
+        with self._connect() as con:
+            fresh = {key for key, fetched in con.execute('SELECT key, fetched FROM tiles')
+                     if now - fetched <= self.ttl}
+        return [t for t in tiles if self._key(*t) not in fresh or not os.path.exists(self._path(self._key(*t)))]
+
+    def put(self, i, j, gdf):
+        """Lagrer en hentet flis og kjører LRU-opprydding."""
+        if gdf.empty and 'geometry' not in gdf:
+            gdf = gpd.GeoDataFrame(geometry=[], crs=self.crs)
+        key = self._key(i, j)
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        gdf.to_parquet(tmp)
+        os.replace(tmp, path)
+        now = time.time()
+        with self._connect() as con:
+            con.execute('INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)', (key, now, now, os.path.getsize(path)))
+        self.evict()
+
+    def evict(self):
+        """Sletter minst nylig brukte fliser til cachen er under max_bytes."""
+        with self._connect() as con:
+            rows = con.execute('SELECT key, nbytes FROM tiles ORDER BY used DESC').fetchall()
+            total = 0
+            for key, nbytes in rows:
+                total += nbytes
+                if total > self.max_bytes:
+                    con.execute('DELETE FROM tiles WHERE key = ?', (key,))
+                    if os.path.exists(self._path(key)):
+                        os.remove(self._path(key))
+
+    def fetch_tiles(self, tiles):
+        """Henter fliser fra kilden parallelt og lagrer dem. Returnerer {(i, j): GeoDataFrame}."""
+        fetched = dict(zip(tiles, map_concurrent(self.fetch_bbox, [self.tile_bounds(i, j) for i, j in tiles])))
+        for (i, j), gdf in fetched.items():
+            self.put(i, j, gdf)
+        return fetched
+
+    def read_tile(self, i, j):
+        """Leser en cachet flis. Leses som vanlig parquet med WKB-geometri, siden
+        gpd.read_parquet tolker CRS på nytt for hver fil (~30 ms per flis)."""
+        path = self._path(self._key(i, j))
+        if not os.path.exists(path):  # kastet ut av LRU underveis
+            return self.fetch_tiles([(i, j)])[(i, j)]
+        df = pd.read_parquet(path)
+        df['geometry'] = shapely.from_wkb(df['geometry'].to_numpy())
+        return df
+
+    @instrumentert('flis-cache')
+    def get_bbox(self, minx, miny, maxx, maxy):
+        """Setter sammen bbox fra cachede fliser og henter bare de som mangler."""
+        tiles = self.tiles_for_bbox(minx, miny, maxx, maxy)
+        with self._connect() as con:
+            now = time.time()
+            con.executemany('UPDATE tiles SET used = ? WHERE key = ?', [(now, self._key(*t)) for t in tiles])
+        fetched = self.fetch_tiles(self.missing_tiles(tiles))
+
+        frames = [fetched[t] if t in fetched else self.read_tile(*t) for t in tiles]
+        gdf = merge_frames(frames, self.id_column, self.crs)
+        if gdf.empty:
+            return gdf
+        return gdf.cx[minx:maxx, miny:maxy].reset_index(drop=True)
+
+    def clear(self):
+        with self._connect() as con:
+            for (key,) in con.execute('SELECT key FROM tiles').fetchall():
+                if os.path.exists(self._path(key)):
+                    os.remove(self._path(key))
+            con.execute('DELETE FROM tiles')